@@ -0,0 +1,48 @@
+"""
+Measures the cold import time of :py:mod:`pow.ccurl_interface`.
+
+Usage::
+
+    python bench/bench_import.py --runs 20
+
+Every run imports the module in a fresh interpreter, the baseline is
+the startup time of an interpreter that imports nothing.
+"""
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import argparse
+import subprocess
+import sys
+import time
+
+def measure(statement, runs):
+    """
+    Returns the median wall time of running `statement` in a new
+    interpreter.
+    """
+    timings = []
+    for _ in range(runs):
+        start = time.time()
+        subprocess.check_call([sys.executable, '-c', statement])
+        timings.append(time.time() - start)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    startup = measure('pass', args.runs)
+    pyota = measure('import iota', args.runs)
+    module = measure('import pow.ccurl_interface', args.runs)
+
+    print('interpreter startup:       {0:7.1f} ms'.format(startup * 1000))
+    print('import iota:               {0:7.1f} ms'.format(
+        (pyota - startup) * 1000))
+    print('import pow.ccurl_interface: {0:6.1f} ms'.format(
+        (module - startup) * 1000))
+
+if __name__ == '__main__':
+    main()
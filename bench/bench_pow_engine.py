@@ -0,0 +1,67 @@
+"""
+Measures PoW throughput of :py:class:`pow.engine.PowEngine` for an
+increasing number of worker threads.
+
+Usage::
+
+    python bench/bench_pow_engine.py --mwm 12 --txs 32 --max-threads 8
+
+ccurl runs one search at a time, each on every core, so throughput
+should stay about level: more threads only hide the Python work between
+searches.
+"""
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import argparse
+import time
+from multiprocessing import cpu_count
+
+from pow.engine import PowEngine
+
+def make_trytes(count):
+    """
+    Returns `count` distinct transaction tryte strings.
+    """
+    alphabet = '9ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    result = []
+    for i in range(count):
+        tag = ''
+        n = i
+        while True:
+            tag += alphabet[n % 27]
+            n //= 27
+            if not n:
+                break
+        result.append(('9' * 2592) + tag.ljust(27, '9') + ('9' * 54))
+    return result
+
+def run(threads, trytes, mwm):
+    """
+    Returns transactions per second for the given number of threads.
+    """
+    with PowEngine(workers=threads) as engine:
+        start = time.time()
+        engine.map(trytes, mwm)
+        return len(trytes) / (time.time() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--mwm', type=int, default=12)
+    parser.add_argument('--txs', type=int, default=32)
+    parser.add_argument('--max-threads', type=int, default=cpu_count())
+    args = parser.parse_args()
+
+    trytes = make_trytes(args.txs)
+
+    baseline = None
+    threads = 1
+    print('threads  tx/s      speedup')
+    while threads <= args.max_threads:
+        tps = run(threads, trytes, args.mwm)
+        baseline = baseline or tps
+        print('{0:<8} {1:<9.2f} {2:.2f}x'.format(threads, tps, tps / baseline))
+        threads *= 2
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+"""
+Benchmark suite for PoW, hashing and attach throughput.
+
+Usage::
+
+    # Run and store results
+    python bench/run_benchmarks.py --output results.json
+
+    # Compare against a stored baseline, exit code 1 on regressions
+    python bench/run_benchmarks.py --baseline baseline.json --threshold 0.2
+
+    # Quick run, e.g. in CI
+    python bench/run_benchmarks.py --quick --baseline baseline.json
+
+Every benchmark records p50/p99 latency, the effective hash rate
+(expected 3^mwm hashes per nonce found, divided by time) and, for
+attach, the number of PoW retries. Results are keyed by name, so that
+a run can be compared against any earlier run on the same host, e.g.
+after swapping ``libccurl.so`` or upgrading PyOTA.
+
+``hash`` and ``pow_mwm*`` time ``get_hash_trytes`` and
+``get_powed_tx_trytes`` themselves. If the selected backend isn't
+``ccurl`` (e.g. ``cffi``, when it is built), its own numbers are
+recorded next to them, prefixed with its name. Attach always runs on the
+selected backend.
+"""
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import argparse
+import io
+import json
+import math
+import platform
+import sys
+import time
+
+from iota import Address, ProposedBundle, ProposedTransaction, Tag, \
+    TransactionHash
+
+from pow import ccurl_interface
+from pow.backends import PowBackend, available_backends, get_backend
+
+TRUNK = TransactionHash(b'TRUNKTXHASH9BENCHMARK')
+BRANCH = TransactionHash(b'BRANCHTXHASH9BENCHMARK')
+
+class CountingBackend(PowBackend):
+    """
+    Wraps a backend and counts the PoW calls, to measure retries.
+    """
+    name = 'counting'
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.pow_calls = 0
+
+    def pow(self, trytes, mwm):
+        self.pow_calls += 1
+        return self.backend.pow(trytes, mwm)
+
+    def digest(self, trytes):
+        return self.backend.digest(trytes)
+
+def _digits_to_trytes(digits):
+    return digits.translate({ord(d): 'ABCDEFGHIJ'[int(d)]
+        for d in '0123456789'}).encode('ascii')
+
+def make_bundle(size, seed):
+    """
+    Returns the trytes of a finalized bundle of `size` zero-value
+    transactions. `seed` makes bundles of different runs distinct.
+    """
+    bundle = ProposedBundle([
+        ProposedTransaction(
+            address=Address(b'BENCHMARK9' + (b'9' * 71)),
+            tag=Tag(_digits_to_trytes('{0}X{1}'.format(seed, i))),
+            value=0,
+        )
+        for i in range(size)
+    ])
+    bundle.finalize()
+    return bundle.as_tryte_strings()
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    ordered = sorted(values)
+    # Rank is ceil(fraction * n), 1-based. Rounded first, so that float
+    # noise (0.07 * 100 = 7.000000000000001) doesn't push it up a rank.
+    rank = int(math.ceil(round(fraction * len(ordered), 9)))
+    index = max(0, min(len(ordered) - 1, rank - 1))
+    return ordered[index]
+
+def summarize(timings, hashes=None, retries=None):
+    """
+    Builds the result record of one benchmark.
+    """
+    total = sum(timings)
+    result = {
+        'runs': len(timings),
+        'p50_ms': percentile(timings, 0.5) * 1000,
+        'p99_ms': percentile(timings, 0.99) * 1000,
+        'mean_ms': total / len(timings) * 1000,
+    }
+    if hashes is not None:
+        result['hashes_per_second'] = hashes * len(timings) / total
+    if retries is not None:
+        result['retries'] = retries
+    return result
+
+def bench_pow(pow_, mwm, runs):
+    """
+    :param pow_:
+        Callable taking the transaction trytes and the MWM, e.g.
+        :py:func:`pow.ccurl_interface.get_powed_tx_trytes`.
+    """
+    timings = []
+    for i in range(runs):
+        trytes = make_bundle(1, i)[0].__str__()
+        start = time.time()
+        pow_(trytes, mwm)
+        timings.append(time.time() - start)
+    return summarize(timings, hashes=3 ** mwm)
+
+def bench_hash(digest, runs):
+    """
+    :param digest:
+        Callable taking the transaction trytes, e.g.
+        :py:func:`pow.ccurl_interface.get_hash_trytes`.
+    """
+    trytes = make_bundle(1, 0)[0].__str__()
+    timings = []
+    for _ in range(runs):
+        start = time.time()
+        digest(trytes)
+        timings.append(time.time() - start)
+    return summarize(timings)
+
+def bench_attach(backend, mwm, size, runs):
+    counting = CountingBackend(backend)
+    timings = []
+    for i in range(runs):
+        bundle_trytes = make_bundle(size, i)
+        start = time.time()
+        ccurl_interface.attach_to_tangle(
+            bundle_trytes, TRUNK, BRANCH, mwm, backend=counting)
+        timings.append(time.time() - start)
+    return summarize(
+        timings,
+        hashes=size * 3 ** mwm,
+        retries=counting.pow_calls - size * runs,
+    )
+
+def run(args):
+    backend = get_backend(args.backend)
+    results = {}
+
+    def record(name, result):
+        results[name] = result
+        print('{0:<28} p50 {1:10.2f} ms  p99 {2:10.2f} ms{3}'.format(
+            name,
+            result['p50_ms'],
+            result['p99_ms'],
+            '  {0:12.0f} H/s'.format(result['hashes_per_second'])
+                if 'hashes_per_second' in result else '',
+        ))
+        sys.stdout.flush()
+
+    # The module functions, called through ctypes whatever the backend
+    if 'ccurl' in available_backends():
+        record('hash', bench_hash(
+            ccurl_interface.get_hash_trytes, args.runs * 10))
+
+        for mwm in args.mwm:
+            record('pow_mwm{0}'.format(mwm), bench_pow(
+                ccurl_interface.get_powed_tx_trytes, mwm, args.runs))
+
+    if backend.name != 'ccurl':
+        record('{0}_hash'.format(backend.name),
+            bench_hash(backend.digest, args.runs * 10))
+
+        for mwm in args.mwm:
+            record('{0}_pow_mwm{1}'.format(backend.name, mwm),
+                bench_pow(backend.pow, mwm, args.runs))
+
+    for mwm in args.mwm:
+        for size in args.sizes:
+            record(
+                'attach_mwm{0}_size{1}'.format(mwm, size),
+                bench_attach(backend, mwm, size, args.attach_runs),
+            )
+
+    return {
+        'backend': backend.name,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'timestamp': int(time.time()),
+        'results': results,
+    }
+
+def compare(current, baseline, threshold):
+    """
+    Returns a list of human readable regressions: p50 latency more than
+    `threshold` (fraction) above the baseline, or new PoW retries.
+    """
+    regressions = []
+    for name, result in sorted(current['results'].items()):
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+
+        limit = base['p50_ms'] * (1 + threshold)
+        if result['p50_ms'] > limit:
+            regressions.append(
+                '{0}: p50 {1:.2f} ms, baseline {2:.2f} ms (+{3:.0%})'.format(
+                    name,
+                    result['p50_ms'],
+                    base['p50_ms'],
+                    result['p50_ms'] / base['p50_ms'] - 1,
+                )
+            )
+
+        if result.get('retries', 0) > base.get('retries', 0):
+            regressions.append(
+                '{0}: {1} retries, baseline {2}'.format(
+                    name, result['retries'], base.get('retries', 0))
+            )
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--backend', default=None,
+        help='PoW backend name, default is the fastest available.')
+    parser.add_argument('--mwm', type=int, nargs='+',
+        default=[1, 5, 9, 14])
+    parser.add_argument('--sizes', type=int, nargs='+',
+        default=[1, 10, 100])
+    parser.add_argument('--runs', type=int, default=20,
+        help='Repetitions of PoW benchmarks (hashing does 10x as many).')
+    parser.add_argument('--attach-runs', type=int, default=3,
+        help='Repetitions of attach benchmarks.')
+    parser.add_argument('--quick', action='store_true',
+        help='Small matrix for CI: MWM 1 and 9, bundles of 1 and 10.')
+    parser.add_argument('--output', help='Write results to this JSON file.')
+    parser.add_argument('--baseline', help='Compare against this JSON file.')
+    parser.add_argument('--threshold', type=float, default=0.2,
+        help='Allowed slowdown vs. baseline, as a fraction (default 0.2).')
+    args = parser.parse_args()
+
+    if args.quick:
+        args.mwm = [1, 9]
+        args.sizes = [1, 10]
+        args.runs = min(args.runs, 10)
+        args.attach_runs = 1
+
+    current = run(args)
+
+    if args.output:
+        with io.open(args.output, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(current, indent=2, sort_keys=True))
+
+    if args.baseline:
+        with io.open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print('\nRegressions against {0}:'.format(args.baseline))
+            for line in regressions:
+                print('  - ' + line)
+            sys.exit(1)
+
+        print('\nNo regressions against {0}.'.format(args.baseline))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""
+Builds the optional cffi module ``pow._ccurl_cffi``, used by the
+``cffi`` PoW backend (see :py:mod:`pow.backends`).
+
+Run from the repository root::
+
+    python pow/_ccurl_cffi_build.py
+
+The module only holds the declarations below and links nothing. The
+backend opens the ccurl build that :py:mod:`pow.ccurl_interface` loaded
+and self-checked, so ``PYOTA_POW_LIBCCURL`` and
+``ccurl_interface.load_library()`` apply to it as well.
+"""
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import os
+
+from cffi import FFI
+
+POW_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Signatures as exported by ccurl. The result buffers are malloc'd by
+# ccurl, the caller frees them with libc's free.
+CDEF = """
+    char *ccurl_pow(char *trytes, int mwm);
+    char *ccurl_digest_transaction(char *trytes);
+    void free(void *ptr);
+"""
+
+ffibuilder = FFI()
+ffibuilder.cdef(CDEF)
+ffibuilder.set_source('pow._ccurl_cffi', None)
+
+if __name__ == '__main__':
+    ffibuilder.compile(tmpdir=os.path.dirname(POW_DIR), verbose=True)
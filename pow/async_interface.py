@@ -0,0 +1,116 @@
+"""
+asyncio front end to :py:func:`pow.ccurl_interface.attach_to_tangle`.
+
+Python 3.5+ only.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import cpu_count
+from threading import Lock
+
+from iota import TransactionTrytes
+
+from pow import ccurl_interface, transaction
+from pow.backends import get_backend
+from pow.cancel import CancelToken
+
+_default_executor = None
+_default_executor_lock = Lock()
+
+def get_default_executor():
+    """
+    Returns the executor shared by all
+    :py:func:`attach_to_tangle_async` calls that don't bring their own.
+
+    PoW is CPU bound, so it has one thread per CPU. Concurrent bundles
+    queue up on it one transaction at a time, which interleaves them
+    fairly instead of letting one long bundle hog every worker.
+    """
+    global _default_executor
+
+    with _default_executor_lock:
+        if _default_executor is None:
+            _default_executor = ThreadPoolExecutor(max_workers=cpu_count())
+        return _default_executor
+
+async def attach_to_tangle_async(bundle_trytes, # Iterable[TryteString]
+                                    trunk_transaction_hash, # TransactionHash
+                                    branch_transaction_hash, # TransactionHash
+                                    mwm=14, # Int
+                                    backend=None, # PowBackend or str
+                                    executor=None, # Executor
+                                    timeout=None): # Float
+    """
+    Coroutine version of :py:func:`pow.ccurl_interface.attach_to_tangle`.
+
+    Parsing the bundle and the PoW of every transaction run on an
+    executor, so the event loop stays responsive. Any number of bundles
+    can be awaited concurrently.
+
+    Cancelling the task (or hitting `timeout`) stops the bundle, and
+    interrupts the nonce search running for the current transaction if
+    the backend supports it (see :py:mod:`pow.cancel`). Otherwise that
+    search finishes in the background and its result is discarded.
+
+    :param executor:
+        :py:class:`concurrent.futures.Executor` to run the PoW on.
+        Defaults to :py:func:`get_default_executor`.
+
+    :param timeout:
+        Deadline for the whole bundle, in seconds.
+
+    :raises asyncio.TimeoutError:
+        If the bundle isn't done within `timeout` seconds.
+
+    :returns:
+        The bundle as a list of transaction trytes (TryteStrings).
+    """
+    coro = _attach(
+        bundle_trytes,
+        trunk_transaction_hash,
+        branch_transaction_hash,
+        mwm,
+        backend,
+        executor or get_default_executor(),
+    )
+
+    if timeout is None:
+        return await coro
+
+    return await asyncio.wait_for(coro, timeout)
+
+async def _attach(bundle_trytes, trunk_transaction_hash,
+                    branch_transaction_hash, mwm, backend, executor):
+    loop = asyncio.get_event_loop()
+
+    pow_backend = get_backend(backend)
+
+    # Raw trytes in one buffer, cheap enough to parse on the loop
+    bundle = transaction.BundleBuffer(bundle_trytes)
+
+    previoustx = None
+    token = CancelToken()
+
+    # Head transaction first
+    try:
+        for txn in bundle.head_first():
+            previoustx = await loop.run_in_executor(
+                executor,
+                ccurl_interface.attach_transaction_view,
+                txn,
+                previoustx,
+                trunk_transaction_hash,
+                branch_transaction_hash,
+                mwm,
+                pow_backend,
+                token,
+            )
+    except asyncio.CancelledError:
+        # Don't leave the worker searching for a nonce nobody wants
+        token.cancel()
+        raise
+
+    return [
+        TransactionTrytes(trytes) for trytes in bundle.as_tryte_strings()
+    ]
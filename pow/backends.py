@@ -0,0 +1,355 @@
+"""
+Registry of Proof-of-Work backends.
+
+A backend knows how to find a nonce for transaction trytes and how to
+hash them. :py:func:`pow.ccurl_interface.attach_to_tangle` takes a
+``backend`` argument, by default the fastest backend that works on this
+host is used:
+
+- ``cffi``: ccurl through cffi (lowest call overhead). Needs
+  ``python pow/_ccurl_cffi_build.py`` to have been run.
+- ``ccurl``: ccurl through ctypes, the classic path.
+- ``numpy``: bitsliced Curl-P-81 in NumPy. Much slower, but works
+  without any native library.
+
+Set ``PYOTA_POW_BACKEND`` to force a backend by name.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import os
+from threading import Lock
+
+from iota.exceptions import with_context
+
+BACKEND_ENV = 'PYOTA_POW_BACKEND'
+
+_registry = {}
+_instances = {}
+_lock = Lock()
+
+class PowBackend(object):
+    """
+    Base class for PoW backends.
+
+    Subclasses set `name` and `priority` (higher is faster) and
+    implement :py:meth:`pow` and :py:meth:`digest`.
+    """
+    name = None
+    priority = 0
+
+    @classmethod
+    def is_available(cls):
+        """
+        Returns whether the backend can be used on this host.
+        """
+        return True
+
+    def pow(self, trytes, mwm):
+        """
+        Finds the nonce for transaction trytes.
+
+        :param trytes:
+            Transaction trytes, unicode string (2673 trytes).
+
+        :param mwm:
+            Minimum Weight Magnitude.
+
+        :returns:
+            Transaction trytes with the nonce filled in, unicode string.
+        """
+        raise NotImplementedError(
+            'Not implemented in {cls}.'.format(cls=type(self).__name__),
+        )
+
+    def pow_partition(self, trytes, mwm, stop):
+        """
+        Like :py:meth:`pow`, for one partition of a search split across
+        workers (see :py:mod:`pow.parallel`). Gives up once `stop` is
+        set, as early as the backend allows.
+
+        The default runs :py:meth:`pow` to completion, unless `stop` is
+        already set when it starts.
+
+        :param stop:
+            :py:class:`threading.Event`, set when another partition won.
+
+        :returns:
+            Transaction trytes with the nonce filled in, or None if the
+            search was stopped.
+        """
+        if stop.is_set():
+            return None
+        result = self.pow(trytes, mwm)
+        return None if stop.is_set() else result
+
+    def interrupt(self, exclusive=False, stop=None):
+        """
+        Interrupts running searches that can't watch a stop event.
+
+        :param exclusive:
+            If True, the caller wants its own search stopped and nothing
+            else. Backends whose interrupt reaches every search in the
+            process (ccurl) only interrupt if no other search is
+            running.
+
+        :param stop:
+            The stop event the caller passed to :py:meth:`pow_partition`.
+            If given, only that search is interrupted, and nothing if it
+            isn't running (anymore).
+
+        :returns:
+            Whether the backend interrupted its searches.
+        """
+        return False
+
+    def digest(self, trytes):
+        """
+        Calculates the transaction hash.
+
+        :param trytes:
+            Transaction trytes, unicode string (2673 trytes).
+
+        :returns:
+            81 trytes long hash, unicode string.
+        """
+        raise NotImplementedError(
+            'Not implemented in {cls}.'.format(cls=type(self).__name__),
+        )
+
+def register_backend(backend_class):
+    """
+    Adds a backend to the registry. Can be used as a class decorator.
+    """
+    _registry[backend_class.name] = backend_class
+    return backend_class
+
+def available_backends():
+    """
+    Returns the names of the backends that work on this host, fastest
+    first.
+    """
+    return [
+        cls.name
+        for cls in sorted(
+            _registry.values(),
+            key=lambda c: c.priority,
+            reverse=True,
+        )
+        if cls.is_available()
+    ]
+
+def get_backend(backend=None):
+    """
+    Resolves a backend.
+
+    :param backend:
+        A :py:class:`PowBackend` instance (returned as-is), the name of
+        a registered backend, or None to pick the one named in
+        ``PYOTA_POW_BACKEND``, or else the fastest available one.
+
+    :raises ValueError:
+        If the backend is unknown or not available on this host.
+    """
+    if isinstance(backend, PowBackend):
+        return backend
+
+    name = backend or os.environ.get(BACKEND_ENV)
+
+    with _lock:
+        # Auto selection is cached under None
+        key = name
+        if key in _instances:
+            return _instances[key]
+
+        if name is None:
+            names = available_backends()
+            if not names:
+                raise with_context(
+                    exc=ValueError(
+                        'No PoW backend is available. Build libccurl.so '
+                        '(see init.sh) or install numpy.'
+                    ),
+
+                    context={
+                        'registered': sorted(_registry),
+                    },
+                )
+            name = names[0]
+
+        cls = _registry.get(name)
+        if cls is None or not cls.is_available():
+            raise with_context(
+                exc=ValueError(
+                    'PoW backend {name!r} is {problem}.'.format(
+                        name=name,
+                        problem='unknown' if cls is None else 'not available',
+                    )
+                ),
+
+                context={
+                    'available': available_backends(),
+                },
+            )
+
+        instance = _instances[key] = cls()
+        return instance
+
+
+@register_backend
+class CcurlBackend(PowBackend):
+    """
+    ccurl through ctypes.
+    """
+    name = 'ccurl'
+    priority = 20
+
+    @classmethod
+    def is_available(cls):
+        from pow import ccurl_interface
+        try:
+            ccurl_interface._get_libccurl()
+        except OSError:
+            return False
+        return True
+
+    def pow(self, trytes, mwm):
+        # Looked up on every call, so that the module level functions
+        # stay the one place to patch.
+        from pow import ccurl_interface
+        return ccurl_interface.get_powed_tx_trytes(trytes, mwm)
+
+    def pow_partition(self, trytes, mwm, stop):
+        from pow import ccurl_interface
+        ccurl_interface.check_tx_trytes_length(trytes)
+        ccurl_interface.ensure_pow_initialized()
+        # ccurl searches take turns, skipped if another partition won
+        # in the meantime
+        result = ccurl_interface._ccurl_pow(
+            trytes.encode('ascii'), mwm, stop=stop)
+        if result is None or stop.is_set():
+            return None
+        return result.decode('ascii')
+
+    def digest(self, trytes):
+        from pow import ccurl_interface
+        return ccurl_interface.get_hash_trytes(trytes)
+
+    def interrupt(self, exclusive=False, stop=None):
+        from pow import ccurl_interface
+        return ccurl_interface.interrupt_pow(exclusive, stop)
+
+
+@register_backend
+class CffiBackend(PowBackend):
+    """
+    ccurl through cffi. Lower per-call overhead than ctypes and
+    releases the GIL as well.
+
+    Opens the very library :py:mod:`pow.ccurl_interface` loaded, so the
+    path overrides and the self-check apply, and the ctypes handle
+    reaches the same interrupt and initialization state.
+    """
+    name = 'cffi'
+    priority = 30
+
+    @classmethod
+    def is_available(cls):
+        try:
+            from pow import _ccurl_cffi
+        except ImportError:
+            return False
+        return CcurlBackend.is_available()
+
+    def __init__(self):
+        from pow import _ccurl_cffi
+        self._ffi = _ccurl_cffi.ffi
+        # ccurl doesn't export a deallocator, its buffers come from libc
+        # malloc
+        self._libc = self._ffi.dlopen(None)
+        self._lib = None
+        self._path = None
+        self._lock = Lock()
+
+    def _get_lib(self):
+        from pow import ccurl_interface
+        ccurl_interface._get_libccurl()
+        path = ccurl_interface.loaded_path
+        with self._lock:
+            # Reopened when `load_library()` switched builds
+            if path != self._path:
+                self._lib = self._ffi.dlopen(path)
+                self._path = path
+            return self._lib
+
+    def _take(self, pointer, length):
+        if pointer == self._ffi.NULL:
+            raise ValueError('ccurl returned a NULL pointer.')
+        try:
+            return self._ffi.buffer(pointer, length)[:].decode('ascii')
+        finally:
+            self._libc.free(pointer)
+
+    def pow(self, trytes, mwm):
+        return self._pow(trytes, mwm)
+
+    def pow_partition(self, trytes, mwm, stop):
+        result = self._pow(trytes, mwm, stop)
+        return None if stop.is_set() else result
+
+    def _pow(self, trytes, mwm, stop=None):
+        from pow import ccurl_interface
+        ccurl_interface.check_tx_trytes_length(trytes)
+        lib = self._get_lib()
+        # Same shared object as the ctypes path, so it shares the
+        # one-time initialization and takes turns with it.
+        ccurl_interface.ensure_pow_initialized()
+        with ccurl_interface._native_search(stop):
+            if stop is not None and stop.is_set():
+                return None
+            pointer = lib.ccurl_pow(trytes.encode('ascii'), mwm)
+        return self._take(pointer, len(trytes))
+
+    def digest(self, trytes):
+        from pow import ccurl_interface
+        ccurl_interface.check_tx_trytes_length(trytes)
+        return self._take(
+            self._get_lib().ccurl_digest_transaction(trytes.encode('ascii')),
+            81,
+        )
+
+    def interrupt(self, exclusive=False, stop=None):
+        from pow import ccurl_interface
+        return ccurl_interface.interrupt_pow(exclusive, stop)
+
+
+@register_backend
+class NumpyBackend(PowBackend):
+    """
+    Bitsliced Curl-P-81 in NumPy, see :py:mod:`pow.curl`. Slow, but
+    has no native dependency besides NumPy itself.
+    """
+    name = 'numpy'
+    priority = 10
+
+    @classmethod
+    def is_available(cls):
+        try:
+            import numpy
+        except ImportError:
+            return False
+        return True
+
+    def pow(self, trytes, mwm):
+        from pow import curl
+        return curl.search_nonce(trytes, mwm).decode('ascii')
+
+    def pow_partition(self, trytes, mwm, stop):
+        from pow import curl
+        result = curl.search_nonce(trytes, mwm, stop=stop)
+        return None if result is None else result.decode('ascii')
+
+    def digest(self, trytes):
+        from pow import curl
+        return curl.digest_transaction(trytes).decode('ascii')
@@ -0,0 +1,280 @@
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import hashlib
+import io
+import os
+import time
+from collections import OrderedDict
+from threading import Lock, current_thread
+
+class PowCache(object):
+    """
+    Bounded cache of attached bundles, so that retried
+    :py:func:`pow.ccurl_interface.attach_to_tangle` calls with the very
+    same bundle trytes, trunk, branch and MWM don't redo the PoW.
+
+    Entries live in an in-memory LRU, bounded by number of entries
+    and/or total trytes. An optional on-disk tier keeps results across
+    restarts. It holds the same entries as the LRU, evicted entries are
+    deleted from disk too. Files left by an earlier run are taken into
+    the LRU on startup, newest first, the others are deleted.
+
+    A cached bundle carries the ``attachment_timestamp`` of the original
+    PoW. The timestamp can't be refreshed without redoing the PoW (it
+    is covered by the nonce), so `max_age` decides how long a result
+    may be reused as-is. Older hits count as misses and the bundle is
+    powed again, with a fresh timestamp.
+
+    Usage::
+
+        cache = PowCache(max_entries=1000)
+        trytes = attach_to_tangle(bundle, trunk, branch, 14, cache=cache)
+    """
+    def __init__(self, max_entries=1024, max_bytes=None, directory=None,
+                    max_age=None):
+        """
+        :param max_entries:
+            Maximum number of bundles kept in memory, or None.
+
+        :param max_bytes:
+            Maximum number of trytes kept in memory, or None.
+
+        :param directory:
+            Directory for the on-disk tier. Disabled if None.
+
+        :param max_age:
+            Seconds a result may be reused as-is, or None to reuse it
+            forever.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_age = max_age
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict() # key -> (created, trytes)
+        self._bytes = 0
+        self._lock = Lock()
+
+        if directory is not None:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            self._load()
+
+    @staticmethod
+    def make_key(bundle_trytes, trunk_transaction_hash,
+                    branch_transaction_hash, mwm):
+        """
+        Returns the cache key for the inputs of an attach call.
+        """
+        digest = hashlib.sha256()
+        for trytes in bundle_trytes:
+            digest.update('{0}'.format(trytes).encode('ascii'))
+            digest.update(b',')
+        digest.update('{0}'.format(trunk_transaction_hash).encode('ascii'))
+        digest.update(b',')
+        digest.update('{0}'.format(branch_transaction_hash).encode('ascii'))
+        digest.update(b',')
+        digest.update('{0}'.format(mwm).encode('ascii'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        Returns the cached bundle (list of unicode tryte strings) for
+        `key`, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                # Most recently used goes last
+                del self._entries[key]
+                self._entries[key] = entry
+
+        if entry is None:
+            # File I/O without holding the lock
+            entry = self._read(key)
+
+        removed = []
+        with self._lock:
+            if entry is not None and key not in self._entries:
+                removed = self._store(key, entry)
+
+            if entry is not None and self._expired(entry[0]):
+                self._remove(key)
+                removed.append(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        self._delete(removed)
+        return None if entry is None else list(entry[1])
+
+    def put(self, key, bundle_trytes):
+        """
+        Stores an attached bundle.
+        """
+        entry = (
+            time.time(),
+            ['{0}'.format(trytes) for trytes in bundle_trytes],
+        )
+
+        with self._lock:
+            self._remove(key)
+            evicted = self._store(key, entry)
+        self._delete(evicted)
+
+        if self.directory is None:
+            return
+
+        self._write(key, entry)
+        with self._lock:
+            # Evicted while it was being written
+            evicted = key not in self._entries
+        if evicted:
+            self._delete([key])
+
+    def clear(self):
+        """
+        Drops every entry, on disk too. Counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        self._delete(self._disk_keys())
+
+    def stats(self):
+        """
+        Returns hit/miss counters and the current size.
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _expired(self, created):
+        return self.max_age is not None and time.time() - created > self.max_age
+
+    def _size(self, entry):
+        return sum(len(trytes) for trytes in entry[1])
+
+    def _store(self, key, entry):
+        """
+        Adds an entry to the LRU, the caller holds the lock.
+
+        :returns:
+            Keys of the evicted entries. Their files are for the caller
+            to delete, after releasing the lock.
+        """
+        self._entries[key] = entry
+        self._bytes += self._size(entry)
+
+        # Evict least recently used entries, but always keep the new one
+        evicted = []
+        while len(self._entries) > 1 and (
+            (self.max_entries is not None
+                and len(self._entries) > self.max_entries)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            evicted.append(next(iter(self._entries)))
+            self._remove(evicted[-1])
+            self.evictions += 1
+        return evicted
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= self._size(entry)
+
+    def _load(self):
+        modified = []
+        for key in self._disk_keys():
+            try:
+                modified.append((os.path.getmtime(self._path(key)), key))
+            except OSError:
+                pass
+
+        # Newest files first, until the LRU is full. They are stored
+        # oldest first, so that the newest are the most recently used.
+        loaded = []
+        stale = []
+        for _, key in sorted(modified, reverse=True):
+            entry = None
+            if self.max_entries is None or len(loaded) < self.max_entries:
+                entry = self._read(key)
+            if entry is None or self._expired(entry[0]):
+                stale.append(key)
+            else:
+                loaded.append((key, entry))
+
+        for key, entry in reversed(loaded):
+            stale.extend(self._store(key, entry))
+        self.evictions = 0
+        self._delete(stale)
+
+    def _disk_keys(self):
+        if self.directory is None:
+            return []
+        return [
+            name[:-len('.trytes')]
+            for name in os.listdir(self.directory)
+            if name.endswith('.trytes')
+        ]
+
+    def _delete(self, keys):
+        if self.directory is None:
+            return
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.trytes')
+
+    def _read(self, key):
+        if self.directory is None:
+            return None
+        try:
+            with io.open(self._path(key), 'r', encoding='ascii') as f:
+                lines = f.read().split('\n')
+            entry = float(lines[0]), lines[1:]
+        except (IOError, OSError):
+            return None
+        except ValueError:
+            entry = None
+
+        if entry is None or not entry[1] or not all(entry[1]):
+            # Truncated or corrupt file, e.g. of a crashed process. It
+            # counts as a miss, the next put writes it again.
+            self._delete([key])
+            return None
+        return entry
+
+    def _write(self, key, entry):
+        if self.directory is None:
+            return
+        # Write to a temporary file first, readers never see half a file
+        path = self._path(key)
+        temp_path = '{path}.{pid}.{thread}.tmp'.format(
+            path=path,
+            pid=os.getpid(),
+            thread=current_thread().ident,
+        )
+        with io.open(temp_path, 'w', encoding='ascii') as f:
+            f.write('\n'.join([repr(entry[0])] + entry[1]))
+        os.rename(temp_path, path)
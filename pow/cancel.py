@@ -0,0 +1,192 @@
+"""
+Cancellation and deadlines for PoW.
+
+Pass a :py:class:`CancelToken` and/or a ``deadline`` to
+:py:func:`pow.ccurl_interface.attach_to_tangle`::
+
+    token = CancelToken()
+    # ... from another thread, e.g. when the client went away:
+    token.cancel()
+
+The nonce search running at that moment is stopped as well, as far as
+the backend allows (see :py:meth:`pow.backends.PowBackend.interrupt`),
+and :py:class:`PowInterrupted` is raised with the transactions that
+were finished. ccurl's interrupt stops whatever search runs in the
+process, so it is only used while the caller's own search runs;
+otherwise the search runs to its end and the token is checked after it.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import time
+from threading import Event, Lock, Timer
+
+class PowInterrupted(Exception):
+    """
+    Raised when PoW is cancelled or runs past its deadline.
+
+    `finished` maps the `current_index` of every transaction that was
+    already powed to its trytes. Transactions are powed head first, so
+    these are the highest indices of the bundle.
+    """
+    def __init__(self, message, deadline_exceeded=False, finished=None):
+        super(PowInterrupted, self).__init__(message)
+        self.deadline_exceeded = deadline_exceeded
+        self.finished = dict(finished or {})
+
+class CancelToken(object):
+    """
+    Cancels PoW from another thread, or when a deadline passes.
+    """
+    def __init__(self, deadline=None, parent=None):
+        """
+        :param deadline:
+            Point in time (as returned by :py:func:`time.time`) after
+            which the token counts as cancelled, or None.
+
+        :param parent:
+            Optional token this one follows: cancelling the parent
+            cancels this token too, and the earlier deadline counts.
+        """
+        self.deadline = deadline
+        self.parent = parent
+        self._cancelled = False
+        self._callbacks = []
+        self._lock = Lock()
+
+    @classmethod
+    def after(cls, seconds, parent=None):
+        """
+        Returns a token with a deadline `seconds` from now.
+        """
+        return cls(deadline=time.time() + seconds, parent=parent)
+
+    def cancel(self):
+        """
+        Cancels the token and interrupts searches watching it.
+        """
+        with self._lock:
+            self._cancelled = True
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback()
+
+    @property
+    def deadline_exceeded(self):
+        deadline = self.effective_deadline
+        return deadline is not None and time.time() >= deadline
+
+    @property
+    def cancelled(self):
+        return (
+            self._cancelled
+            or self.deadline_exceeded
+            or (self.parent is not None and self.parent.cancelled)
+        )
+
+    @property
+    def effective_deadline(self):
+        """
+        The earliest deadline of this token and its parents, or None.
+        """
+        deadlines = [
+            d for d in [
+                self.deadline,
+                self.parent.effective_deadline if self.parent else None,
+            ]
+            if d is not None
+        ]
+        return min(deadlines) if deadlines else None
+
+    def remaining(self):
+        """
+        Returns the seconds left until the deadline, or None.
+        """
+        deadline = self.effective_deadline
+        if deadline is None:
+            return None
+        return max(0.0, deadline - time.time())
+
+    def add_callback(self, callback):
+        """
+        Registers `callback` to be called on cancellation, right away if
+        the token is cancelled already.
+        """
+        with self._lock:
+            self._callbacks.append(callback)
+            cancelled = self._cancelled
+        if self.parent is not None:
+            self.parent.add_callback(callback)
+        if cancelled:
+            callback()
+
+    def remove_callback(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+        if self.parent is not None:
+            self.parent.remove_callback(callback)
+
+    def check(self):
+        """
+        Raises :py:class:`PowInterrupted` if the token is cancelled.
+        """
+        if self.cancelled:
+            raise PowInterrupted(
+                'PoW deadline exceeded.' if self.deadline_exceeded
+                    else 'PoW cancelled.',
+                deadline_exceeded=self.deadline_exceeded,
+            )
+
+def interruptible_pow(pow_backend, trytes, mwm, token):
+    """
+    Runs the nonce search of `pow_backend`, stopping it when `token`
+    is cancelled or its deadline passes.
+
+    Backends that can't be interrupted finish their search in the
+    calling thread, the result is thrown away. ccurl is only
+    interrupted while this search is the one running: its interrupt is
+    global to the process, and would stop another job's search too.
+
+    :raises PowInterrupted:
+        If the token was cancelled before or during the search.
+    """
+    token.check()
+
+    stop = Event()
+
+    def interrupt():
+        if not stop.is_set():
+            stop.set()
+            # Leave searches of other jobs alone, also when this one
+            # is over already. If the backend can't stop just this one
+            # the result is thrown away below.
+            pow_backend.interrupt(stop=stop)
+
+    token.add_callback(interrupt)
+
+    timer = None
+    remaining = token.remaining()
+    if remaining is not None:
+        timer = Timer(remaining, interrupt)
+        timer.daemon = True
+        timer.start()
+
+    try:
+        powed = pow_backend.pow_partition(trytes, mwm, stop)
+    except Exception:
+        # An interrupted native search may come back as an error
+        token.check()
+        raise
+    finally:
+        if timer is not None:
+            timer.cancel()
+        token.remove_callback(interrupt)
+
+    token.check()
+    if powed is None:
+        # Stopped, but the token doesn't say why. Can't happen unless
+        # the backend stops on its own.
+        raise PowInterrupted('PoW search was stopped.')
+    return powed
@@ -2,33 +2,174 @@ from __future__ import absolute_import, division, print_function, \
     unicode_literals
 
 from ctypes import *
-from iota import Bundle, TransactionTrytes, TransactionHash, TryteString, \
-    Transaction
-import math
+from ctypes.util import find_library
+from collections import namedtuple
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from iota import TransactionTrytes, TransactionHash
+import itertools
+import os
 import time
 from iota.exceptions import with_context
 import logging
-from sys import stderr
+from multiprocessing import cpu_count
+from threading import Lock
 
-from pkg_resources import resource_filename
-libccurl_path = resource_filename("pow","libccurl.so")
+from pow import transaction
+from pow.backends import get_backend
+from pow.cancel import CancelToken, PowInterrupted, interruptible_pow
+from pow.metrics import _observers as _metrics_observers, \
+    TransactionMetrics, notify as _notify_metrics
+from pow.parallel import seed_partition
+
+# Environment variable to point the interface to a different ccurl build
+LIBCCURL_PATH_ENV = 'PYOTA_POW_LIBCCURL'
+
+# The library shipped with the package
+libccurl_path = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    'libccurl.so',
+)
+
+# Known answer for the self-check of a freshly loaded build
+_SELF_CHECK_TRYTES = ('9ABCDEFGHIJKLMNOPQRSTUVWXYZ' * 99).encode('ascii')
+_SELF_CHECK_HASH = (
+    b'AHZJBPRUKRJJHSPELBUDHFBESKIAMBYXVRAKBXVTM9HNTEYIEXUJEBC9XSOFKEKAZWQQWQ'
+    b'XXXCLQWMIIV'
+)
 
 # Calculate time in milliseconds (for timestamp)
 get_current_ms = lambda : int(round(time.time() * 1000))
 
-# Load ccurl lib
-_libccurl = CDLL(libccurl_path)
+# ccurl lib, loaded on first use, see `load_library()`
+_libccurl = None
+_libc = None
+_load_lock = Lock()
+
+# Path of the loaded ccurl build, None until it is loaded
+loaded_path = None
 
-# Return and argument types for our c functions
-_libccurl.ccurl_pow.restype = POINTER(c_char)
-_libccurl.ccurl_pow.argtypes = [c_char_p, c_int]
+# ccurl sets up its global PoW state on first use, guarded by nothing but
+# a static flag. Make sure only one thread ever goes through that.
+_pow_init_lock = Lock()
+_pow_initialized = False
 
-_libccurl.ccurl_digest_transaction.restype = POINTER(c_char)
-_libccurl.ccurl_digest_transaction.argtypes = [c_char_p]
+# ccurl keeps the state of its nonce search in globals, so `ccurl_pow`
+# calls take turns. Each one already runs on every core.
+_pow_lock = Lock()
+
+# Number of `ccurl_pow` calls running or waiting for their turn, and the
+# owner of the running one, see `interrupt_pow()`
+_searches_lock = Lock()
+_running_searches = 0
+_running_owner = None
+
+# Upper bound of the attachment timestamp, (3^27 - 1) / 2, encoded
+_ATTACHMENT_TIMESTAMP_UPPER_BOUND = b'MMMMMMMMM'
 
 # Create a logger
 logger = logging.getLogger(__name__)
-logging.basicConfig(stream=stderr, level=logging.INFO)
+
+def _open_library(path):
+    """
+    Opens ccurl at `path`, declares the signatures we use and checks
+    that it hashes correctly. Doesn't touch the loaded library.
+    """
+    global _libc
+
+    lib = CDLL(path)
+
+    # Return and argument types for our c functions
+    # Both return a malloc'd buffer that we own and have to free. We take
+    # the raw address (c_void_p), as c_char_p would copy the string and
+    # lose the pointer.
+    lib.ccurl_pow.restype = c_void_p
+    lib.ccurl_pow.argtypes = [c_char_p, c_int]
+
+    lib.ccurl_digest_transaction.restype = c_void_p
+    lib.ccurl_digest_transaction.argtypes = [c_char_p]
+
+    # Optional, not exported by older builds
+    if hasattr(lib, 'ccurl_pow_interrupt'):
+        lib.ccurl_pow_interrupt.restype = None
+        lib.ccurl_pow_interrupt.argtypes = []
+
+    if _libc is None:
+        # ccurl doesn't export a deallocator, its buffers come from libc
+        # malloc
+        libc = CDLL(find_library('c'))
+        libc.free.restype = None
+        libc.free.argtypes = [c_void_p]
+        _libc = libc
+
+    # A broken build would give wrong hashes and nonces that nodes
+    # reject
+    digest = _take_result(
+        lib.ccurl_digest_transaction(_SELF_CHECK_TRYTES),
+        TransactionHash.LEN,
+    )
+    if digest != _SELF_CHECK_HASH:
+        raise with_context(
+            exc=OSError('ccurl at {path} failed the self-check.'.format(
+                path=path,
+            )),
+
+            context={
+                'path': path,
+                'expected': _SELF_CHECK_HASH,
+                'digest': digest,
+            },
+        )
+
+    return lib
+
+def _load(path):
+    """
+    Loads ccurl from `path`. Caller must hold `_load_lock`.
+    """
+    global _libccurl, _pow_initialized, loaded_path
+
+    lib = _open_library(path)
+
+    _libccurl = lib
+    _pow_initialized = False
+    loaded_path = path
+    logger.debug('Loaded ccurl from {path}'.format(path=path))
+    return lib
+
+def load_library(path=None):
+    """
+    Loads the ccurl shared library. This happens automatically on the
+    first PoW or hashing call, use this function to load it eagerly
+    or to use a different build.
+
+    The library is looked up in this order:
+
+    - `path` argument,
+    - ``PYOTA_POW_LIBCCURL`` environment variable,
+    - ``libccurl.so`` shipped in the ``pow`` package.
+
+    Every build hashes a known test vector when loaded.
+
+    :raises OSError:
+        If the library can't be loaded or fails the self-check.
+    """
+    with _load_lock:
+        return _load(
+            path or os.environ.get(LIBCCURL_PATH_ENV) or libccurl_path
+        )
+
+def _get_libccurl():
+    """
+    Returns the loaded ccurl library, loading it if necessary.
+    """
+    lib = _libccurl
+    if lib is None:
+        with _load_lock:
+            lib = _libccurl
+            if lib is None:
+                lib = _load(os.environ.get(LIBCCURL_PATH_ENV) or libccurl_path)
+    return lib
 
 def check_tx_trytes_length(trytes):
     """
@@ -45,6 +186,185 @@ def check_tx_trytes_length(trytes):
             },
         )
 
+def _take_result(pointer, length, target=None):
+    """
+    Copies `length` bytes out of a buffer returned by ccurl and frees
+    the native buffer.
+
+    :param target:
+        Optional ctypes array to copy into. If omitted, the result is
+        returned as ``bytes``.
+    """
+    if not pointer:
+        raise ValueError('ccurl returned a NULL pointer.')
+
+    try:
+        if target is None:
+            return string_at(pointer, length)
+        memmove(target, pointer, length)
+    finally:
+        _libc.free(pointer)
+
+@contextmanager
+def _native_search(owner=None):
+    """
+    Runs a `ccurl_pow` call once no other one is running. Counts it as
+    running while it waits, see :py:func:`interrupt_pow`.
+
+    :param owner:
+        Optional object identifying the search while it runs, e.g. its
+        stop event. Only callers passing the same object to
+        :py:func:`interrupt_pow` can interrupt it.
+    """
+    global _running_searches, _running_owner
+
+    with _searches_lock:
+        _running_searches += 1
+    try:
+        with _pow_lock:
+            with _searches_lock:
+                _running_owner = owner
+            try:
+                yield
+            finally:
+                # Before the next search gets its turn
+                with _searches_lock:
+                    _running_owner = None
+    finally:
+        with _searches_lock:
+            _running_searches -= 1
+
+def _ccurl_pow(trytes, mwm, target=None, stop=None):
+    """
+    Calls `ccurl_pow` and takes ownership of the result.
+
+    :param stop:
+        Optional :py:class:`threading.Event`. If it is set once this
+        search gets its turn, ccurl isn't called and None is returned.
+    """
+    lib = _get_libccurl()
+    with _native_search(stop):
+        if stop is not None and stop.is_set():
+            return None
+        pointer = lib.ccurl_pow(trytes, mwm)
+    return _take_result(pointer, TransactionTrytes.LEN, target)
+
+def _ccurl_digest(trytes, target=None):
+    """
+    Calls `ccurl_digest_transaction` and takes ownership of the result.
+    """
+    return _take_result(
+        _get_libccurl().ccurl_digest_transaction(trytes),
+        TransactionHash.LEN,
+        target,
+    )
+
+def ensure_pow_initialized():
+    """
+    Initializes the global PoW state of ccurl exactly once, so that
+    concurrent callers of :py:func:`get_powed_tx_trytes` don't race on
+    it. Cheap no-op after the first call.
+    """
+    global _pow_initialized
+
+    if _pow_initialized:
+        return
+
+    with _pow_init_lock:
+        if _pow_initialized:
+            return
+
+        lib = _get_libccurl()
+        if hasattr(lib, 'ccurl_pow_init'):
+            lib.ccurl_pow_init()
+        else:
+            # Older builds don't export the init function, the first
+            # `ccurl_pow` call does the setup. Run a trivial one while
+            # holding the lock.
+            _ccurl_pow(b'9' * TransactionTrytes.LEN, 1)
+
+        _pow_initialized = True
+
+def interrupt_pow(exclusive=False, owner=None):
+    """
+    Asks ccurl to stop its running nonce searches early.
+
+    The interrupt flag is global to the library: it stops the
+    `ccurl_pow` call running in the process at that moment, whoever
+    started it. Interrupted calls return trytes without a valid nonce,
+    which the hash check in :py:func:`attach_transaction_view` catches.
+
+    :param exclusive:
+        If True, only interrupt when exactly one search is running or
+        waiting for its turn.
+
+    :param owner:
+        If given, only interrupt the running search if it was started
+        with this owner (see :py:func:`_native_search`). Use this to
+        stop one search without disturbing unrelated ones, even if it
+        already finished and another one runs by now.
+
+    :returns:
+        Whether ccurl was interrupted: False if the loaded build
+        doesn't support interrupts, if `exclusive` is set and other
+        searches are running, or if the running search isn't `owner`'s.
+    """
+    lib = _get_libccurl()
+    if not hasattr(lib, 'ccurl_pow_interrupt'):
+        return False
+
+    # Held while interrupting, so no search starts in between
+    with _searches_lock:
+        if exclusive and _running_searches != 1:
+            return False
+        if owner is not None and _running_owner is not owner:
+            return False
+        lib.ccurl_pow_interrupt()
+    return True
+
+TRYTE_ALPHABET = '9ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+def _trailing_zero_trits_table():
+    """
+    Builds a lookup table with the number of trailing zero trits in
+    the balanced ternary representation of each tryte.
+    """
+    table = {}
+    for index, tryte in enumerate(TRYTE_ALPHABET):
+        # '9' is 0, 'A'-'M' are 1..13, 'N'-'Z' are -13..-1
+        value = index if index <= 13 else index - 27
+        trits = []
+        for _ in range(3):
+            trit = ((value + 1) % 3) - 1
+            trits.append(trit)
+            value = (value - trit) // 3
+
+        zeros = 0
+        for trit in reversed(trits):
+            if trit:
+                break
+            zeros += 1
+        # Keyed by ordinal as well, for hashes given as bytes
+        table[tryte] = table[ord(tryte)] = zeros
+    return table
+
+_TRAILING_ZERO_TRITS = _trailing_zero_trits_table()
+
+def count_trailing_zero_trits(hash_trytes):
+    """
+    Returns the number of trailing zero trits of a hash, working
+    directly on its trytes (unicode string or ASCII bytes). A
+    transaction hash satisfies the Minimum Weight Magnitude `mwm` if
+    this is at least `mwm`.
+    """
+    count = 0
+    for tryte in reversed(hash_trytes):
+        zeros = _TRAILING_ZERO_TRITS[tryte]
+        count += zeros
+        if zeros != 3:
+            break
+    return count
+
 # calling function in libccurl to calculate nonce
 # based on transaction trytes
 def get_powed_tx_trytes( trytes, mwm ):
@@ -56,13 +376,10 @@ def get_powed_tx_trytes( trytes, mwm ):
     """
     # Make sure we supply the right size of tx trytes to ccurl
     check_tx_trytes_length(trytes)
-    # Call of external C function
-    powed_trytes = _libccurl.ccurl_pow(trytes.encode('utf-8'), mwm)
-    # Return value is a c_char pointer,pointing
-    # to the first character
-    # (c_char_p return value doesn't work for 3.7, hence this tweak)
-    # We know the length of the bytearray (c char array)
-    powed_trytes_bytes = powed_trytes[:2673]
+    ensure_pow_initialized()
+    # Call of external C function, copies the result and frees the
+    # native buffer
+    powed_trytes_bytes = _ccurl_pow(trytes.encode('utf-8'), mwm)
     # Let's decode into unicode
     powed_trytes_unicode = powed_trytes_bytes.decode('utf-8')
     return powed_trytes_unicode
@@ -77,18 +394,125 @@ def get_hash_trytes(trytes):
     """
     # Make sure we supply the right size of tx trytes to ccurl
     check_tx_trytes_length(trytes)
-    # Call of external C function
-    hash_pointer = _libccurl.ccurl_digest_transaction(trytes.encode('utf-8'))
-    # We know the length of the bytearray (c char array)
-    hash_bytes = hash_pointer[:81]
+    # Call of external C function, copies the result and frees the
+    # native buffer
+    hash_bytes = _ccurl_digest(trytes.encode('utf-8'))
     hash_unicode = hash_bytes.decode('utf-8')
     return hash_unicode
 
+def _as_c_buffer(trytes):
+    """
+    Returns something ctypes can pass as a `char *` to ccurl, without
+    copying `trytes` if at all possible.
+
+    ``bytes`` are passed as they are, writable contiguous buffers
+    (``bytearray``, ``memoryview`` of a ``bytearray``, ...) are
+    wrapped in place. Read-only memoryviews have to be copied.
+    """
+    if isinstance(trytes, bytes):
+        return trytes
+
+    try:
+        return (c_char * len(trytes)).from_buffer(trytes)
+    except (TypeError, ValueError):
+        # Read-only or non-contiguous buffer
+        return bytes(bytearray(trytes))
+
+def _as_out_buffer(out, offset, length):
+    """
+    Returns a ctypes array that shares memory with
+    ``out[offset:offset + length]``.
+    """
+    try:
+        return (c_char * length).from_buffer(out, offset)
+    except (TypeError, ValueError) as e:
+        raise with_context(
+            exc=ValueError(
+                'Output must be a writable buffer with at least {len} bytes'
+                ' after offset {offset}: {error}'.format(
+                    len=length,
+                    offset=offset,
+                    error=e,
+                )
+            ),
+
+            context={
+                'out': out,
+                'offset': offset,
+            },
+        )
+
+def pow_trytes_into(trytes, mwm, out, offset=0):
+    """
+    Low-level, allocation-free variant of :py:func:`get_powed_tx_trytes`.
+
+    Calls `ccurl_pow` on ASCII transaction trytes and writes the powed
+    trytes straight into `out`, e.g. a preallocated buffer that holds a
+    whole bundle. `out` may be the very buffer `trytes` is a view of,
+    the result then replaces the input in place.
+
+    :param trytes:
+        ``bytes``, ``bytearray`` or ``memoryview`` holding exactly 2673
+        ASCII trytes.
+
+    :param mwm:
+        Minimum Weight Magnitude to be used during the PoW.
+
+    :param out:
+        Writable buffer (``bytearray``, writable ``memoryview``, ctypes
+        array, ...) receiving the powed trytes.
+
+    :param offset:
+        Position in `out` where the 2673 powed trytes are written.
+
+    :returns:
+        Number of bytes written.
+    """
+    check_tx_trytes_length(trytes)
+    target = _as_out_buffer(out, offset, TransactionTrytes.LEN)
+    ensure_pow_initialized()
+    _ccurl_pow(_as_c_buffer(trytes), mwm, target)
+    return TransactionTrytes.LEN
+
+def pow_trytes(trytes, mwm):
+    """
+    Same as :py:func:`pow_trytes_into`, but returns the powed trytes as
+    a new ``bytes`` object.
+    """
+    check_tx_trytes_length(trytes)
+    ensure_pow_initialized()
+    return _ccurl_pow(_as_c_buffer(trytes), mwm)
+
+def hash_trytes_into(trytes, out, offset=0):
+    """
+    Low-level, allocation-free variant of :py:func:`get_hash_trytes`.
+    Writes the 81 ASCII hash trytes into ``out[offset:offset + 81]``.
+
+    :returns:
+        Number of bytes written.
+    """
+    check_tx_trytes_length(trytes)
+    target = _as_out_buffer(out, offset, TransactionHash.LEN)
+    _ccurl_digest(_as_c_buffer(trytes), target)
+    return TransactionHash.LEN
+
+def hash_trytes(trytes):
+    """
+    Same as :py:func:`hash_trytes_into`, but returns the hash as a new
+    ``bytes`` object.
+    """
+    check_tx_trytes_length(trytes)
+    return _ccurl_digest(_as_c_buffer(trytes))
+
 # Takes a bundle object, calculates the pow, attaches tx hash
 def attach_to_tangle(bundle_trytes, # Iterable[TryteString]
                         trunk_transaction_hash, # TransactionHash
                         branch_transaction_hash, # TransactionHash
-                        mwm=14):  # Int
+                        mwm=14, # Int
+                        backend=None, # PowBackend or str
+                        cache=None, # PowCache
+                        deadline=None, # Float
+                        cancel_token=None): # CancelToken
     """
     Attaches the bundle to the Tangle by doing Proof-of-Work
     locally. No connection to the Tangle is needed in this step.
@@ -108,86 +532,594 @@ def attach_to_tangle(bundle_trytes, # Iterable[TryteString]
         Minimum Weight Magnitude to be used during the PoW.
         Number of trailing zero trits in transaction hash.
 
+    :param backend:
+        PoW backend to use, name or instance, see
+        :py:mod:`pow.backends`. Defaults to the fastest one available.
+
+    :param cache:
+        Optional :py:class:`pow.cache.PowCache`. If the same bundle was
+        attached to the same tips with the same MWM before, the cached
+        result is returned without doing any PoW.
+
+    :param deadline:
+        Point in time (as returned by :py:func:`time.time`) by which
+        the PoW has to be done, or None.
+
+    :param cancel_token:
+        Optional :py:class:`pow.cancel.CancelToken` to cancel the PoW
+        from another thread.
+
+    :raises pow.cancel.PowInterrupted:
+        If cancelled or past the deadline. The nonce search running at
+        that moment is interrupted, if the backend can do so without
+        disturbing other searches (see :py:mod:`pow.cancel`). The
+        exception tells which transactions were finished.
+
     :returns:
-        The bundle as a list of transaction trytes (TryteStrings).
-        Attachment timestamp and nonce included.
+        The bundle as a list of transaction trytes (TryteStrings),
+        head (highest `current_index`) first, like PyOTA's
+        ``Bundle.as_tryte_strings()``. Attachment timestamp and nonce
+        included.
     """
+    if cache is not None:
+        bundle_trytes = list(bundle_trytes)
+        cache_key = cache.make_key(
+            bundle_trytes,
+            trunk_transaction_hash,
+            branch_transaction_hash,
+            mwm,
+        )
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return [TransactionTrytes(trytes) for trytes in cached]
+
+    pow_backend = get_backend(backend)
+
     previoustx = None
 
-    # Construct bundle object
-    bundle = Bundle.from_tryte_strings(bundle_trytes)
-
-    # Used for checking hash
-    trailing_zeros = [0] * mwm
-
-    # reversed, beause pyota bundles look like [tx0,tx1,...]
-    # and we need the head (last) tx first
-    for txn in reversed(bundle.transactions):
-        # Ccurl lib sometimes needs a kick to return the correct powed trytes.
-        # We can check the correctness by examining trailing zeros of the
-        # transaction hash. If that fails, we try calculating the pow again.
-        # Use `max_iter` to prevent infinite loop. Calculation error appears
-        # rarely, and usually the second try yields correct result. If we reach
-        # `max_iter`, we raise a ValueError.
-        max_iter = 5
-        i = 0
-
-        # If calculation is successful, we break out from the while loop.
-        while i != max_iter:
-            # Fill timestamps
-            txn.attachment_timestamp = get_current_ms()
-            txn.attachment_timestamp_upper_bound = (math.pow(3,27) - 1) // 2
-
-            # Determine correct trunk and branch transaction
-            if (not previoustx): # this is the head transaction
-                if txn.current_index == txn.last_index:
-                    txn.branch_transaction_hash = branch_transaction_hash
-                    txn.trunk_transaction_hash = trunk_transaction_hash
-                else:
-                    raise ValueError('Head transaction is inconsistent in bundle')
-
-            else: # It is not the head transaction
-                txn.branch_transaction_hash = trunk_transaction_hash
-                txn.trunk_transaction_hash = previoustx # the previous transaction
-
-            # Let's do the pow locally
-            txn_string = txn.as_tryte_string().__str__()
-            # returns a python unicode string
-            powed_txn_string = get_powed_tx_trytes(txn_string, mwm)
-            # construct trytestring from python string
-            powed_txn_trytes = TryteString(powed_txn_string)
-
-            # Create powed txn object
-            # This method calculates the hash for the transaction
-            powed_txn = Transaction.from_tryte_string(
-                trytes=powed_txn_trytes
+    # All transactions in one buffer, indexed by `current_index`. The
+    # powed trytes are written back into their slot.
+    bundle = transaction.BundleBuffer(bundle_trytes)
+    finished = []
+
+    token = _make_cancel_token(deadline, cancel_token)
+
+    # Head (last) transaction first
+    try:
+        for txn in bundle.head_first():
+            previoustx = attach_transaction_view(
+                txn,
+                previoustx,
+                trunk_transaction_hash,
+                branch_transaction_hash,
+                mwm,
+                pow_backend,
+                token,
             )
-            previoustx = powed_txn.hash
-            # put that back in the bundle
-            bundle.transactions[txn.current_index] = powed_txn
-
-            # Check for inconsistency in hash
-            hash_trits = powed_txn.hash.as_trits()
-            if hash_trits[-mwm:] == trailing_zeros:
-                # We are good to go, exit from while loop
-                break
-            else:
-                i = i + 1
-                logger.info('Ooops, wrong hash detected in try'
-                    ' #{rounds}. Recalculating pow... '.format(rounds= i))
+            finished.append(txn)
+    except PowInterrupted as e:
+        e.finished = {
+            txn.current_index: TransactionTrytes(txn.trytes)
+            for txn in finished
+        }
+        raise
+
+    powed_trytes = bundle.as_tryte_strings()
+
+    if cache is not None:
+        cache.put(cache_key, powed_trytes)
+
+    # Head first, the order PyOTA's `Bundle.as_tryte_strings()` returns
+    return [TransactionTrytes(trytes) for trytes in powed_trytes]
+
+# A transaction yielded by `iter_attach_to_tangle()`
+AttachedTransaction = namedtuple(
+    'AttachedTransaction',
+    ['current_index', 'trytes', 'hash', 'seconds'],
+)
+
+def iter_attach_to_tangle(bundle_trytes, # Iterable[TryteString]
+                            trunk_transaction_hash, # TransactionHash
+                            branch_transaction_hash, # TransactionHash
+                            mwm=14, # Int
+                            backend=None, # PowBackend or str
+                            deadline=None, # Float
+                            cancel_token=None): # CancelToken
+    """
+    Streaming version of :py:func:`attach_to_tangle`. Yields every
+    transaction as soon as its PoW is done, head first.
+
+    `bundle_trytes` may be any iterable, it is consumed lazily. If it
+    yields the transactions head first (highest `current_index`
+    first), every transaction is powed as soon as it comes in and
+    nothing is buffered. Transactions that arrive out of order wait
+    until all higher indices are done.
+
+    The trytes are patched in place, no PyOTA Bundle is built.
+
+    :param deadline:
+        Point in time (as returned by :py:func:`time.time`) by which
+        the PoW has to be done, or None.
+
+    :param cancel_token:
+        Optional :py:class:`pow.cancel.CancelToken`.
+
+    :raises ValueError:
+        If the bundle is incomplete, or has duplicate or inconsistent
+        indices. Transactions yielded up to that point are unaffected.
 
-        # Something really bad happened
-        if i == max_iter:
+    :raises pow.cancel.PowInterrupted:
+        If cancelled or past the deadline. Its `finished` has the
+        indices of the transactions already yielded, their trytes
+        aren't kept (values are None).
+
+    :returns:
+        Generator of :py:class:`AttachedTransaction` tuples:
+        `current_index`, `trytes` (TransactionTrytes), `hash`
+        (TransactionHash) and `seconds` spent on this transaction.
+    """
+    pow_backend = get_backend(backend)
+    token = _make_cancel_token(deadline, cancel_token)
+
+    # Transactions that came in before their turn, by index
+    pending = {}
+    last_index = None
+    expected = None
+    previoustx = None
+
+    for trytes in bundle_trytes:
+        trytes = '{0}'.format(trytes)
+        check_tx_trytes_length(trytes)
+
+        current_index = transaction.get_int_field(
+            trytes, transaction.CURRENT_INDEX)
+        txn_last_index = transaction.get_int_field(
+            trytes, transaction.LAST_INDEX)
+
+        if last_index is None:
+            last_index = expected = txn_last_index
+
+        if (txn_last_index != last_index
+                or not 0 <= current_index <= expected
+                or current_index in pending):
             raise with_context(
-                exc=ValueError('PoW calculation failed for {max_iter} times.'
-                    ' Make sure that the transaction is valid: {tx}'.format(
-                    max_iter=max_iter,
-                    tx=powed_txn.as_json_compatible()
-                    )
-                ),
+                exc=ValueError('Transaction index is inconsistent in bundle.'),
+
                 context={
-                    'original': txn,
+                    'current_index': current_index,
+                    'last_index': txn_last_index,
+                    'expected_last_index': last_index,
                 },
             )
 
-    return bundle.as_tryte_strings()
+        pending[current_index] = trytes
+
+        while expected in pending:
+            started = time.time()
+            try:
+                powed_txn_string, previoustx = attach_transaction_trytes(
+                    pending.pop(expected),
+                    previoustx,
+                    trunk_transaction_hash,
+                    branch_transaction_hash,
+                    mwm,
+                    pow_backend,
+                    token,
+                )
+            except PowInterrupted as e:
+                e.finished = dict.fromkeys(range(expected + 1, last_index + 1))
+                raise
+            yield AttachedTransaction(
+                expected,
+                TransactionTrytes(powed_txn_string),
+                previoustx,
+                time.time() - started,
+            )
+            expected -= 1
+
+    if expected is not None and expected >= 0:
+        raise with_context(
+            exc=ValueError('Bundle is incomplete.'),
+
+            context={
+                'last_index': last_index,
+                'missing': [
+                    i for i in range(expected + 1) if i not in pending
+                ],
+            },
+        )
+
+def attach_transaction_trytes(trytes, # unicode string
+                                previoustx, # TransactionHash or None
+                                trunk_transaction_hash, # TransactionHash
+                                branch_transaction_hash, # TransactionHash
+                                mwm, # Int
+                                pow_backend, # PowBackend
+                                cancel_token=None): # CancelToken
+    """
+    Same as :py:func:`attach_transaction_view`, for raw transaction
+    trytes. No PyOTA Transaction is built.
+
+    :returns:
+        Tuple of the powed transaction trytes (unicode string) and its
+        hash (TransactionHash).
+    """
+    check_tx_trytes_length(trytes)
+    view = transaction.TransactionView(
+        bytearray('{0}'.format(trytes).encode('ascii')))
+
+    hash_ = attach_transaction_view(
+        view,
+        previoustx,
+        trunk_transaction_hash,
+        branch_transaction_hash,
+        mwm,
+        pow_backend,
+        cancel_token,
+    )
+    return view.trytes, hash_
+
+def attach_transaction_view(view, # TransactionView
+                                previoustx, # TransactionHash or None
+                                trunk_transaction_hash, # TransactionHash
+                                branch_transaction_hash, # TransactionHash
+                                mwm, # Int
+                                pow_backend, # PowBackend
+                                cancel_token=None): # CancelToken
+    """
+    Fills in the attachment fields of a single transaction of a bundle
+    and does its PoW. This is one step of :py:func:`attach_to_tangle`,
+    transactions have to be processed head first.
+
+    :param view:
+        :py:class:`pow.transaction.TransactionView`, e.g. a slot of a
+        :py:class:`pow.transaction.BundleBuffer`. Patched in place.
+
+    :param previoustx:
+        Hash of the previously attached transaction of the bundle, or
+        None for the head transaction.
+
+    :param cancel_token:
+        Optional :py:class:`pow.cancel.CancelToken`.
+
+    Trunk, branch and the timestamp upper bound are written into the
+    buffer once. Every try only overwrites the attachment timestamp,
+    and the powed trytes are written back on success.
+
+    :returns:
+        The hash of the powed transaction (TransactionHash).
+    """
+    current_index = view.current_index
+
+    # Determine correct trunk and branch transaction
+    if not previoustx: # this is the head transaction
+        if current_index != view.last_index:
+            raise ValueError('Head transaction is inconsistent in bundle')
+        trunk, branch = trunk_transaction_hash, branch_transaction_hash
+    else:
+        trunk, branch = previoustx, trunk_transaction_hash
+
+    view.set_field(
+        transaction.TRUNK_TRANSACTION_HASH, _hash_ascii(trunk))
+    view.set_field(
+        transaction.BRANCH_TRANSACTION_HASH, _hash_ascii(branch))
+    view.set_field(
+        transaction.ATTACHMENT_TIMESTAMP_UPPER_BOUND,
+        _ATTACHMENT_TIMESTAMP_UPPER_BOUND,
+    )
+
+    def prepare():
+        # Fresh timestamp on every try
+        view.set_field(
+            transaction.ATTACHMENT_TIMESTAMP,
+            transaction.int_to_trytes(get_current_ms(), 9),
+        )
+        return view.trytes
+
+    powed_txn_string, hash_string, max_iter = _pow_until_valid(
+        prepare,
+        current_index,
+        mwm,
+        pow_backend,
+        cancel_token,
+    )
+
+    if max_iter is None:
+        view.trytes = powed_txn_string
+        return TransactionHash(hash_string)
+
+    raise with_context(
+        exc=ValueError(
+            'PoW calculation failed for {max_iter} times.'
+            ' Make sure that the transaction is valid.'.format(
+                max_iter=max_iter,
+            )
+        ),
+        context={
+            'original': view.trytes,
+            'powed_trytes': powed_txn_string,
+            'hash': hash_string,
+        },
+    )
+
+def _hash_ascii(hash_):
+    """
+    Returns a transaction hash as ASCII bytes, padded like
+    :py:class:`TransactionHash` does.
+    """
+    if not isinstance(hash_, TransactionHash):
+        hash_ = TransactionHash(hash_)
+    return '{0}'.format(hash_).encode('ascii')
+
+def _make_cancel_token(deadline, cancel_token):
+    """
+    Combines the `deadline` and `cancel_token` arguments into one
+    token, or None if there is neither.
+    """
+    if deadline is None:
+        return cancel_token
+    return CancelToken(deadline=deadline, parent=cancel_token)
+
+def _pow_until_valid(prepare, current_index, mwm, pow_backend,
+                        cancel_token=None):
+    """
+    Retry loop of :py:func:`attach_transaction_view`.
+
+    :param prepare:
+        Callable returning the transaction trytes to pow, with fresh
+        attachment fields. Called before every try.
+
+    :param cancel_token:
+        Optional :py:class:`pow.cancel.CancelToken`, checked before
+        every try and interrupting the nonce search.
+
+    :returns:
+        Tuple of the powed trytes, the hash trytes and None. If every
+        try failed, the last ones and the number of tries instead.
+    """
+    # Ccurl lib sometimes needs a kick to return the correct powed trytes.
+    # We can check the correctness by examining trailing zeros of the
+    # transaction hash. If that fails, we try calculating the pow again.
+    # Use `max_iter` to prevent infinite loop. Calculation error appears
+    # rarely, and usually the second try yields correct result. If we reach
+    # `max_iter`, the caller raises a ValueError.
+    max_iter = 5
+    i = 0
+
+    # Only measure if somebody listens
+    observed = bool(_metrics_observers)
+    if observed:
+        started = time.time()
+        pow_seconds = hash_seconds = 0.0
+
+    # If calculation is successful, we return from the while loop.
+    while i != max_iter:
+        # Let's do the pow locally
+        txn_string = prepare()
+        # returns a python unicode string
+        if observed:
+            pow_started = time.time()
+        if cancel_token is None:
+            powed_txn_string = pow_backend.pow(txn_string, mwm)
+        else:
+            powed_txn_string = interruptible_pow(
+                pow_backend, txn_string, mwm, cancel_token)
+
+        # Hash natively and check the trailing zeros on the hash trytes,
+        # no need to go through PyOTA's Curl and trit conversion.
+        if observed:
+            hash_started = time.time()
+            pow_seconds += hash_started - pow_started
+        hash_string = pow_backend.digest(powed_txn_string)
+        if observed:
+            hash_seconds += time.time() - hash_started
+
+        valid = count_trailing_zero_trits(hash_string) >= mwm
+        if not valid:
+            i = i + 1
+            logger.info('Ooops, wrong hash detected in try'
+                ' #{rounds}. Recalculating pow... '.format(rounds= i))
+
+        if observed and (valid or i == max_iter):
+            _notify_metrics(TransactionMetrics(
+                backend=pow_backend.name,
+                mwm=mwm,
+                current_index=current_index,
+                retries=i,
+                pow_seconds=pow_seconds,
+                hash_seconds=hash_seconds,
+                overhead_seconds=max(0.0,
+                    time.time() - started - pow_seconds - hash_seconds),
+            ))
+
+        if valid:
+            return powed_txn_string, hash_string, None
+
+    return powed_txn_string, hash_string, max_iter
+
+def _pow_transaction(trytes, mwm, pow_backend):
+    """
+    Does the PoW of a single transaction, as it is, checking the hash
+    like :py:func:`attach_transaction_view` does.
+
+    :returns:
+        The powed transaction trytes.
+
+    :raises ValueError:
+        If no valid nonce was found.
+    """
+    tries = itertools.count()
+
+    def prepare():
+        # ccurl misses the nonce of some transactions, every time.
+        # Seeding another part of the nonce gives it a new start.
+        attempt = next(tries)
+        return seed_partition(trytes, attempt) if attempt else trytes
+
+    powed_txn_string, hash_string, max_iter = _pow_until_valid(
+        prepare,
+        transaction.get_int_field(trytes, transaction.CURRENT_INDEX),
+        mwm,
+        pow_backend,
+    )
+
+    if max_iter is None:
+        return powed_txn_string
+
+    raise with_context(
+        exc=ValueError(
+            'PoW calculation failed for {max_iter} times.'
+            ' Make sure that the transaction is valid.'.format(
+                max_iter=max_iter,
+            )
+        ),
+        context={
+            'original': trytes,
+            'powed_trytes': powed_txn_string,
+            'hash': hash_string,
+        },
+    )
+
+# Attaches several independent bundles concurrently
+def attach_bundles_to_tangle(bundles, # Iterable[Iterable[TryteString]]
+                                tips, # Tuple or List[Tuple]
+                                mwm=14, # Int
+                                workers=None, # Int
+                                executor=None, # Executor
+                                ordered=True, # Bool
+                                backend=None): # PowBackend or str
+    """
+    Attaches multiple independent bundles to the Tangle, doing the
+    Proof-of-Work of different bundles in parallel.
+
+    Transactions inside one bundle are still powed one after the
+    other (each trunk is the hash of the previous transaction), but
+    separate bundles don't depend on each other. ccurl searches take
+    turns, each one on every core, so with ccurl the gain is in the
+    hashing and bookkeeping between searches; backends without global
+    state (e.g. ``numpy``) search in parallel. `ccurl_pow` is called
+    through ctypes, which releases the GIL for the duration of the
+    native call, so a thread pool is enough and ``libccurl.so`` is only
+    loaded once.
+
+    :param bundles:
+        Iterable of bundles, each one a list of TryteString(s) as
+        accepted by :py:func:`attach_to_tangle`.
+
+    :param tips:
+        Either a single ``(trunk, branch)`` tuple that is used for
+        every bundle, or a list of ``(trunk, branch)`` tuples, one per
+        bundle.
+
+    :param mwm:
+        Minimum Weight Magnitude to be used during the PoW.
+
+    :param workers:
+        Number of worker threads. Defaults to the number of CPUs.
+        Ignored if `executor` is supplied.
+
+    :param executor:
+        Optional :py:class:`concurrent.futures.Executor` to run the
+        bundles on, e.g. a long-lived ``ProcessPoolExecutor``.
+
+    :param ordered:
+        If True, returns the results in input order. If False, returns
+        an iterator of ``(index, bundle_trytes)`` tuples, yielded as
+        each bundle is finished.
+
+    :param backend:
+        PoW backend to use, see :py:func:`attach_to_tangle`.
+
+    :returns:
+        List of attached bundles (each a list of TryteStrings), or an
+        iterator of ``(index, bundle_trytes)`` if `ordered` is False.
+    """
+    bundles = list(bundles)
+
+    if isinstance(tips, tuple):
+        tips = [tips] * len(bundles)
+    else:
+        tips = list(tips)
+
+    if len(tips) != len(bundles):
+        raise with_context(
+            exc=ValueError('Expected {expected} tip pairs, got {actual}.'.format(
+                expected=len(bundles),
+                actual=len(tips),
+            )),
+
+            context={
+                'tips': tips,
+            },
+        )
+
+    return run_jobs(
+        [
+            (attach_to_tangle, (bundle_trytes, trunk, branch, mwm, backend))
+            for bundle_trytes, (trunk, branch) in zip(bundles, tips)
+        ],
+        workers,
+        executor,
+        ordered,
+    )
+
+def run_jobs(jobs, # Iterable[Tuple[Callable, Tuple]]
+                workers=None, # Int
+                executor=None, # Executor
+                ordered=True): # Bool
+    """
+    Runs independent ``(callable, args)`` jobs on a pool of worker
+    threads. This is how :py:func:`attach_bundles_to_tangle` and
+    :py:mod:`pow.reattach` spread bundles over workers.
+
+    :param workers:
+        Number of worker threads. Defaults to the number of CPUs.
+        Ignored if `executor` is supplied.
+
+    :param executor:
+        Optional :py:class:`concurrent.futures.Executor` to run the
+        jobs on. It is left running, an own pool is shut down once the
+        results are collected.
+
+    :param ordered:
+        If True, returns the results in input order, and cancels the
+        jobs not started yet if one fails. If False, returns an
+        iterator of ``(index, result)`` tuples, yielded as each job is
+        finished.
+
+    :returns:
+        List of results, or an iterator of ``(index, result)`` if
+        `ordered` is False.
+    """
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=workers or cpu_count())
+
+    futures = [executor.submit(fn, *args) for fn, args in jobs]
+
+    if ordered:
+        try:
+            return [f.result() for f in futures]
+        except Exception:
+            # Don't burn CPU on jobs nobody will collect
+            for f in futures:
+                f.cancel()
+            raise
+        finally:
+            if own_executor:
+                executor.shutdown(wait=False)
+
+    return _iter_completed(futures, executor if own_executor else None)
+
+def _iter_completed(futures, executor):
+    """
+    Yields ``(index, result)`` tuples as the futures complete.
+    Shuts down `executor` (if any) when exhausted.
+    """
+    indices = dict((f, i) for i, f in enumerate(futures))
+    try:
+        for f in as_completed(futures):
+            yield indices[f], f.result()
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False)
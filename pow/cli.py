@@ -0,0 +1,410 @@
+"""
+``pyota-pow`` command line tool, for PoW on files of bundles.
+
+Input files hold one bundle per line, its transaction trytes separated
+by commas. The file is memory-mapped and read one record at a time, so
+its size doesn't matter::
+
+    pyota-pow run bundles.txt attached.txt --trunk TRUNK --branch BRANCH
+
+Attached bundles are written as they are finished, one per line,
+prefixed with the line number of the input record and a tab. A
+checkpoint file (``attached.txt.checkpoint`` by default) is updated
+every few seconds; running the same command again after a crash
+continues where the last checkpoint left off.
+
+``pyota-pow verify attached.txt --mwm 14`` checks the hashes and the
+trunk chain of attached bundles, ``pyota-pow bench`` measures the hash
+rate of the backends.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import argparse
+import io
+import json
+import logging
+import mmap
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from multiprocessing import cpu_count
+
+from iota import TransactionHash
+from iota.exceptions import with_context
+
+from pow import ccurl_interface, estimate, transaction
+from pow.backends import available_backends, get_backend
+
+logger = logging.getLogger(__name__)
+
+def iter_records(path):
+    """
+    Yields ``(line_number, record)`` for every non-empty line of a
+    file, `record` being the line as ASCII bytes.
+
+    The file is memory-mapped, only the current line is copied.
+    """
+    with io.open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            position = 0
+            line_number = 0
+            while position < len(data):
+                end = data.find(b'\n', position)
+                if end == -1:
+                    end = len(data)
+                record = data[position:end].strip()
+                if record:
+                    yield line_number, record
+                position = end + 1
+                line_number += 1
+        finally:
+            data.close()
+
+def parse_record(record):
+    """
+    Returns the transaction trytes (unicode strings) of a record.
+    The line number prefix of output files is skipped.
+    """
+    if b'\t' in record:
+        record = record.split(b'\t', 1)[1]
+    return [trytes.decode('ascii') for trytes in record.split(b',')]
+
+def format_record(line_number, bundle_trytes):
+    """
+    Returns an output line, as ASCII bytes.
+    """
+    return '{0}\t{1}\n'.format(
+        line_number,
+        ','.join('{0}'.format(trytes) for trytes in bundle_trytes),
+    ).encode('ascii')
+
+def _to_ranges(numbers):
+    """
+    Compresses a set of ints into sorted ``[first, last]`` ranges.
+    """
+    ranges = []
+    for number in sorted(numbers):
+        if ranges and ranges[-1][1] == number - 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+    return ranges
+
+def _from_ranges(ranges):
+    return set(
+        number
+        for first, last in ranges
+        for number in range(first, last + 1)
+    )
+
+class Checkpoint(object):
+    """
+    Progress of a :py:func:`run_file` job: the input records done, and
+    the size of the output file that holds exactly their results.
+    """
+    def __init__(self, path, input_size):
+        self.path = path
+        self.input_size = input_size
+        self.output_size = 0
+        self.done = set()
+
+    @classmethod
+    def load(cls, path, input_size):
+        """
+        Loads the checkpoint at `path`, or returns an empty one if there
+        is none.
+
+        :raises ValueError:
+            If the checkpoint was written for an input of another size.
+        """
+        checkpoint = cls(path, input_size)
+        if not os.path.exists(path):
+            return checkpoint
+
+        with io.open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+
+        if state['input_size'] != input_size:
+            raise with_context(
+                exc=ValueError(
+                    'Checkpoint {path} belongs to a different input file.'
+                    .format(path=path)
+                ),
+
+                context={
+                    'input_size': input_size,
+                    'checkpoint_input_size': state['input_size'],
+                },
+            )
+
+        checkpoint.output_size = state['output_size']
+        checkpoint.done = _from_ranges(state['done'])
+        return checkpoint
+
+    def save(self):
+        # Write to a temporary file first, a crash never leaves half a
+        # checkpoint behind
+        temp_path = '{path}.{pid}.tmp'.format(path=self.path, pid=os.getpid())
+        with io.open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({
+                'input_size': self.input_size,
+                'output_size': self.output_size,
+                'done': _to_ranges(self.done),
+            }))
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(self.path):
+            # `os.rename` doesn't replace files on every platform
+            os.remove(self.path)
+        os.rename(temp_path, self.path)
+
+def _run_records(records, fn, workers):
+    """
+    Runs ``fn(record)`` on a thread pool and yields
+    ``(line_number, result, exception)`` as records finish.
+
+    Only ``2 * workers`` records are read ahead, so memory use doesn't
+    grow with the input.
+    """
+    workers = workers or cpu_count()
+    pending = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        records = iter(records)
+        exhausted = False
+
+        while pending or not exhausted:
+            while not exhausted and len(pending) < 2 * workers:
+                try:
+                    line_number, record = next(records)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending[executor.submit(fn, record)] = line_number
+
+            if not pending:
+                break
+
+            finished, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in finished:
+                line_number = pending.pop(future)
+                error = future.exception()
+                yield (
+                    line_number,
+                    None if error else future.result(),
+                    error,
+                )
+
+def run_file(input_path, # str
+                output_path, # str
+                trunk_transaction_hash, # TransactionHash
+                branch_transaction_hash, # TransactionHash
+                mwm=14, # Int
+                workers=None, # Int
+                backend=None, # PowBackend or str
+                checkpoint_path=None, # str
+                checkpoint_interval=10.0): # Float
+    """
+    Attaches every bundle of `input_path` and writes the results to
+    `output_path`, resuming from the checkpoint if there is one.
+
+    :param checkpoint_path:
+        Defaults to `output_path` + ``.checkpoint``.
+
+    :param checkpoint_interval:
+        Seconds between checkpoints. Bundles finished after the last
+        checkpoint are powed again after a crash.
+
+    :returns:
+        Tuple of the number of bundles attached in this run and the
+        line numbers of the records that failed.
+    """
+    pow_backend = get_backend(backend)
+    trunk = TransactionHash(trunk_transaction_hash)
+    branch = TransactionHash(branch_transaction_hash)
+    checkpoint = Checkpoint.load(
+        checkpoint_path or output_path + '.checkpoint',
+        os.path.getsize(input_path),
+    )
+
+    if checkpoint.done:
+        logger.info('Resuming, {0} bundles done already.'.format(
+            len(checkpoint.done)))
+        output = io.open(output_path, 'r+b')
+        # Results written after the checkpoint are powed again
+        output.truncate(checkpoint.output_size)
+        output.seek(checkpoint.output_size)
+    else:
+        output = io.open(output_path, 'wb')
+
+    def attach(record):
+        return ccurl_interface.attach_to_tangle(
+            parse_record(record), trunk, branch, mwm, pow_backend)
+
+    records = (
+        (line_number, record)
+        for line_number, record in iter_records(input_path)
+        if line_number not in checkpoint.done
+    )
+
+    attached = 0
+    failed = []
+    last_checkpoint = time.time()
+    try:
+        for line_number, result, error in _run_records(
+                records, attach, workers):
+            if error is not None:
+                logger.error('Record {0} failed: {1}'.format(line_number, error))
+                failed.append(line_number)
+                continue
+
+            output.write(format_record(line_number, result))
+            checkpoint.done.add(line_number)
+            attached += 1
+
+            if time.time() - last_checkpoint >= checkpoint_interval:
+                _save_checkpoint(checkpoint, output)
+                last_checkpoint = time.time()
+    finally:
+        _save_checkpoint(checkpoint, output)
+        output.close()
+
+    return attached, sorted(failed)
+
+def _save_checkpoint(checkpoint, output):
+    # Results first, so the checkpoint never points past them
+    output.flush()
+    os.fsync(output.fileno())
+    checkpoint.output_size = output.tell()
+    checkpoint.save()
+
+def verify_bundle(bundle_trytes, mwm, backend=None):
+    """
+    Checks an attached bundle: every transaction hash satisfies `mwm`,
+    and every transaction but the head has the next one as trunk.
+
+    :returns:
+        List of problems, empty if the bundle is fine.
+    """
+    pow_backend = get_backend(backend)
+    bundle = transaction.BundleBuffer(bundle_trytes)
+
+    problems = []
+    next_hash = None
+    for txn in bundle.head_first():
+        hash_ = pow_backend.digest(txn.trytes)
+        if ccurl_interface.count_trailing_zero_trits(hash_) < mwm:
+            problems.append(
+                'Transaction {0} does not satisfy MWM {1}.'.format(
+                    txn.current_index, mwm))
+        if (next_hash is not None
+                and txn.trunk_transaction_hash != next_hash):
+            problems.append(
+                'Transaction {0} does not approve transaction {1}.'.format(
+                    txn.current_index, txn.current_index + 1))
+        next_hash = hash_
+    return problems
+
+def _run(args):
+    attached, failed = run_file(
+        args.input,
+        args.output,
+        args.trunk,
+        args.branch,
+        mwm=args.mwm,
+        workers=args.workers,
+        backend=args.backend,
+        checkpoint_path=args.checkpoint,
+        checkpoint_interval=args.checkpoint_interval,
+    )
+    print('Attached {0} bundles, {1} failed.'.format(attached, len(failed)))
+    return 1 if failed else 0
+
+def _verify(args):
+    pow_backend = get_backend(args.backend)
+
+    def verify(record):
+        return verify_bundle(parse_record(record), args.mwm, pow_backend)
+
+    checked = invalid = 0
+    for line_number, problems, error in _run_records(
+            iter_records(args.input), verify, args.workers):
+        checked += 1
+        if error is not None:
+            problems = ['{0}'.format(error)]
+        if problems:
+            invalid += 1
+            for problem in problems:
+                print('Record {0}: {1}'.format(line_number, problem))
+
+    print('Checked {0} bundles, {1} invalid.'.format(checked, invalid))
+    return 1 if invalid else 0
+
+def _bench(args):
+    names = [args.backend] if args.backend else available_backends()
+    for name in names:
+        rate = estimate.calibrate(name, mwm=args.mwm, samples=args.samples)
+        print('{name}: {rate:.0f} hashes/s, {seconds:.2f} s per transaction'
+            ' at MWM 14'.format(
+                name=name,
+                rate=rate,
+                seconds=3 ** 14 / rate,
+            ))
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='pyota-pow',
+        description='PoW for files of IOTA bundles.',
+    )
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    run = subparsers.add_parser('run',
+        help='Attach every bundle of a file.')
+    run.add_argument('input',
+        help='One bundle per line, transaction trytes separated by commas.')
+    run.add_argument('output')
+    run.add_argument('--trunk', required=True)
+    run.add_argument('--branch', required=True)
+    run.add_argument('--mwm', type=int, default=14)
+    run.add_argument('--checkpoint', default=None,
+        help='Checkpoint file, default is OUTPUT.checkpoint.')
+    run.add_argument('--checkpoint-interval', type=float, default=10.0,
+        help='Seconds between checkpoints (default 10).')
+    run.set_defaults(handler=_run)
+
+    verify = subparsers.add_parser('verify',
+        help='Check the PoW of attached bundles.')
+    verify.add_argument('input')
+    verify.add_argument('--mwm', type=int, default=14)
+    verify.set_defaults(handler=_verify)
+
+    bench = subparsers.add_parser('bench',
+        help='Measure the hash rate of the PoW backends.')
+    bench.add_argument('--mwm', type=int, default=9)
+    bench.add_argument('--samples', type=int, default=8)
+    bench.set_defaults(handler=_bench)
+
+    for subparser in [run, verify, bench]:
+        subparser.add_argument('--backend', default=None,
+            help='PoW backend name, default is the fastest available.')
+    for subparser in [run, verify]:
+        subparser.add_argument('--workers', type=int, default=None,
+            help='Worker threads, default is the number of CPUs.')
+
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    return args.handler(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,494 @@
+"""
+Curl-P-81 implemented with NumPy.
+
+The sponge state is kept bitsliced: every trit is stored in two bit
+planes (`low`, `high`), and every bit position of the 64 bit words is
+an independent lane. One transform call therefore advances 64 sponges
+per word of the planes at once, which is what makes a Python nonce
+search bearable. This is the same representation the Pearl Diver in
+ccurl uses.
+
+Trit encoding in the planes::
+
+    trit   low  high
+     0      1    1
+     1      0    1
+    -1      1    0
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+
+HASH_LENGTH = 243
+"""
+Number of trits in a hash (and in one absorbed block).
+"""
+
+STATE_LENGTH = 3 * HASH_LENGTH
+"""
+Number of trits in the sponge state.
+"""
+
+NUMBER_OF_ROUNDS = 81
+"""
+Number of rounds of one transform.
+"""
+
+TRANSACTION_LENGTH = 8019
+"""
+Number of trits in a transaction.
+"""
+
+NONCE_LENGTH = 81
+"""
+Number of trits of the nonce, at the very end of the transaction.
+"""
+
+SIGNATURE_LENGTH = 6561
+"""
+Number of trits of the signature / message fragment, at the start of
+the transaction. It is absorbed in 27 whole blocks.
+"""
+
+TRYTE_ALPHABET = b'9ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+# State positions read by a transform, in order. Position `i` of the new
+# state is computed from positions `_INDICES[i]` and `_INDICES[i + 1]`
+# of the old one.
+_INDICES = (np.arange(STATE_LENGTH + 1) * 364) % STATE_LENGTH
+
+# ASCII code -> trits of that tryte, little endian
+_TRYTE_TO_TRITS = np.zeros((256, 3), dtype=np.int8)
+# Tryte value + 13 -> ASCII code
+_VALUE_TO_TRYTE = np.zeros(27, dtype=np.uint8)
+
+def _build_tables():
+    for index, code in enumerate(bytearray(TRYTE_ALPHABET)):
+        value = index if index <= 13 else index - 27
+        _VALUE_TO_TRYTE[value + 13] = code
+        for i in range(3):
+            trit = ((value + 1) % 3) - 1
+            _TRYTE_TO_TRITS[code, i] = trit
+            value = (value - trit) // 3
+
+_build_tables()
+
+ALL_ONES = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+def as_tryte_array(trytes):
+    """
+    Converts trytes to a ``uint8`` array of ASCII codes.
+
+    :param trytes:
+        Unicode string, ``bytes``, ``bytearray``, buffer, or an
+        existing ``uint8`` array. A sequence of those gives a 2D array
+        with one row per item (all items must be of equal length).
+    """
+    if isinstance(trytes, np.ndarray):
+        return trytes.astype(np.uint8, copy=False)
+
+    if isinstance(trytes, (list, tuple)):
+        return np.vstack([as_tryte_array(t) for t in trytes])
+
+    if not isinstance(trytes, (bytes, bytearray, memoryview)):
+        trytes = str(trytes).encode('ascii')
+
+    return np.frombuffer(trytes, dtype=np.uint8)
+
+def trytes_to_trits(trytes):
+    """
+    Converts an array of ASCII tryte codes with shape ``(..., n)`` to
+    an ``int8`` trit array with shape ``(..., 3n)``.
+    """
+    trytes = as_tryte_array(trytes)
+    trits = _TRYTE_TO_TRITS[trytes]
+    return trits.reshape(trytes.shape[:-1] + (trytes.shape[-1] * 3,))
+
+def trits_to_trytes(trits):
+    """
+    Converts an ``int8`` trit array with shape ``(..., 3n)`` to an
+    array of ASCII tryte codes with shape ``(..., n)``.
+    """
+    trits = np.asarray(trits, dtype=np.int8)
+    grouped = trits.reshape(trits.shape[:-1] + (-1, 3)).astype(np.int16)
+    values = grouped[..., 0] + 3 * grouped[..., 1] + 9 * grouped[..., 2]
+    return _VALUE_TO_TRYTE[values + 13]
+
+def to_planes(trits):
+    """
+    Bitslices trits.
+
+    :param trits:
+        ``int8`` array with shape ``(lanes, length)``.
+
+    :returns:
+        ``(low, high)`` ``uint64`` arrays with shape
+        ``(length, ceil(lanes / 64))``. Padding lanes hold zero trits.
+    """
+    trits = np.asarray(trits, dtype=np.int8)
+    lanes, length = trits.shape
+    words = -(-lanes // 64)
+
+    padded = np.zeros((length, words * 64), dtype=np.int8)
+    padded[:, :lanes] = trits.T
+
+    low = np.packbits(padded != 1, axis=1, bitorder='little')
+    high = np.packbits(padded != -1, axis=1, bitorder='little')
+    return (
+        np.ascontiguousarray(low).view('<u8'),
+        np.ascontiguousarray(high).view('<u8'),
+    )
+
+def from_planes(low, high, lanes):
+    """
+    Reverse of :py:func:`to_planes`, returns an ``int8`` array with
+    shape ``(lanes, length)``.
+    """
+    low_bits = np.unpackbits(
+        np.ascontiguousarray(low).view(np.uint8), axis=1, bitorder='little')
+    high_bits = np.unpackbits(
+        np.ascontiguousarray(high).view(np.uint8), axis=1, bitorder='little')
+    trits = high_bits.astype(np.int8) - low_bits.astype(np.int8)
+    return trits[:, :lanes].T
+
+def broadcast_planes(trits, words):
+    """
+    Bitslices a single trit vector into every lane of `words` words.
+    """
+    trits = np.asarray(trits, dtype=np.int8)
+    low = np.where(trits != 1, ALL_ONES, np.uint64(0))
+    high = np.where(trits != -1, ALL_ONES, np.uint64(0))
+    return (
+        np.repeat(low[:, np.newaxis], words, axis=1),
+        np.repeat(high[:, np.newaxis], words, axis=1),
+    )
+
+def new_state(words=1):
+    """
+    Returns the planes of an all-zero sponge state.
+    """
+    return (
+        np.full((STATE_LENGTH, words), ALL_ONES, dtype=np.uint64),
+        np.full((STATE_LENGTH, words), ALL_ONES, dtype=np.uint64),
+    )
+
+def transform(low, high):
+    """
+    Applies the 81 rounds of Curl-P-81 to a bitsliced state.
+
+    :returns:
+        New ``(low, high)`` planes.
+    """
+    indices = _INDICES
+    for _ in range(NUMBER_OF_ROUNDS):
+        low_in = low[indices]
+        high_in = high[indices]
+        alpha = low_in[:-1]
+        beta = high_in[:-1]
+        gamma = high_in[1:]
+        delta = (alpha | ~gamma) & (low_in[1:] ^ beta)
+        low = ~delta
+        high = (alpha ^ gamma) | delta
+    return low, high
+
+def absorb(low, high, block_low, block_high):
+    """
+    Absorbs bitsliced trits (a multiple of 243 of them) into the state.
+
+    :returns:
+        New ``(low, high)`` planes.
+    """
+    for start in range(0, block_low.shape[0], HASH_LENGTH):
+        low = low.copy()
+        high = high.copy()
+        low[:HASH_LENGTH] = block_low[start:start + HASH_LENGTH]
+        high[:HASH_LENGTH] = block_high[start:start + HASH_LENGTH]
+        low, high = transform(low, high)
+    return low, high
+
+class MidstateCache(object):
+    """
+    LRU cache of the sponge state after absorbing the signature /
+    message fragment of a transaction, keyed by a digest of that
+    fragment.
+
+    Reattaching a bundle only changes trunk, branch, timestamps and
+    nonce, all in the last 6 of the 33 blocks. With the midstate cached,
+    hashing a reattached transaction takes 6 transforms instead of 33.
+    """
+    def __init__(self, max_entries=4096):
+        """
+        :param max_entries:
+            Number of states kept, about 1.5 kB each.
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            state = self._entries.pop(key, None)
+            if state is None:
+                self.misses += 1
+                return None
+            # Most recently used goes last
+            self._entries[key] = state
+            self.hits += 1
+            return state
+
+    def put(self, key, state):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = state
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+midstate_cache = MidstateCache()
+"""
+Cache used by :py:func:`digest_transaction` and :py:func:`search_nonce`.
+Replace it to change its size, or with ``MidstateCache(0)`` to disable
+caching.
+"""
+
+def signature_midstate(tryte_array, trits):
+    """
+    Returns the sponge state (trits) after absorbing the signature /
+    message fragment of one transaction, from :py:data:`midstate_cache`
+    if possible.
+
+    :param tryte_array:
+        The transaction as ASCII codes, see :py:func:`as_tryte_array`.
+
+    :param trits:
+        The same transaction as trits.
+    """
+    cache = midstate_cache
+    key = hashlib.sha256(
+        tryte_array[:SIGNATURE_LENGTH // 3].tobytes()).digest()
+
+    state = cache.get(key)
+    if state is None:
+        low, high = new_state()
+        low, high = absorb(
+            low,
+            high,
+            *to_planes(trits[np.newaxis, :SIGNATURE_LENGTH])
+        )
+        state = from_planes(low, high, 1)[0]
+        state.setflags(write=False)
+        cache.put(key, state)
+
+    return state
+
+def _absorb_after_signature(tryte_array, trits, length):
+    """
+    Returns the planes of the state after absorbing the first `length`
+    trits of a transaction, using the cached signature midstate.
+    """
+    low, high = broadcast_planes(signature_midstate(tryte_array, trits), 1)
+    return absorb(
+        low,
+        high,
+        *to_planes(trits[np.newaxis, SIGNATURE_LENGTH:length])
+    )
+
+def _hash_chunk(trytes, mwm):
+    """
+    Hashes up to a few thousand transactions at once, one per lane.
+    """
+    lanes = trytes.shape[0]
+    block_low, block_high = to_planes(trytes_to_trits(trytes))
+
+    low, high = new_state(block_low.shape[1])
+    low, high = absorb(low, high, block_low, block_high)
+
+    hashes = trits_to_trytes(
+        from_planes(low[:HASH_LENGTH], high[:HASH_LENGTH], lanes)
+    )
+
+    # Zero trits have both bits set
+    zeros = np.bitwise_and.reduce(
+        low[HASH_LENGTH - mwm:HASH_LENGTH] & high[HASH_LENGTH - mwm:HASH_LENGTH],
+        axis=0,
+    )
+    mask = np.unpackbits(
+        zeros.view(np.uint8),
+        bitorder='little',
+    )[:lanes].astype(bool)
+
+    return hashes, mask
+
+def verify_mwm(batch, mwm, chunk_size=4096):
+    """
+    Hashes a batch of transactions with vectorized Curl-P-81 and checks
+    their Minimum Weight Magnitude.
+
+    :param batch:
+        Transaction trytes, as an ``(N, 2673)`` ``uint8`` array of ASCII
+        codes, or a sequence of tryte strings / ``bytes``.
+
+    :param mwm:
+        Minimum Weight Magnitude to check.
+
+    :param chunk_size:
+        Number of transactions hashed together. Bounds memory use, about
+        8 kB per transaction.
+
+    :returns:
+        ``(hashes, mask)`` tuple. `hashes` is an ``(N, 81)`` ``uint8``
+        array of ASCII codes, `mask` a boolean array that is True where
+        the hash has at least `mwm` trailing zero trits.
+    """
+    batch = as_tryte_array(batch)
+    if batch.ndim == 1:
+        batch = batch.reshape(1, -1)
+
+    if batch.shape[1] * 3 != TRANSACTION_LENGTH:
+        raise ValueError(
+            'Transactions must be {len} trytes long.'.format(
+                len=TRANSACTION_LENGTH // 3,
+            ),
+        )
+
+    # Round down to whole words
+    chunk_size = max(64, chunk_size - chunk_size % 64)
+
+    hashes = np.empty((batch.shape[0], HASH_LENGTH // 3), dtype=np.uint8)
+    mask = np.empty(batch.shape[0], dtype=bool)
+    for start in range(0, batch.shape[0], chunk_size):
+        stop = start + chunk_size
+        hashes[start:stop], mask[start:stop] = \
+            _hash_chunk(batch[start:stop], mwm)
+
+    return hashes, mask
+
+def hash_transactions(batch, chunk_size=4096):
+    """
+    Hashes a batch of transactions with vectorized Curl-P-81.
+
+    :param batch:
+        See :py:func:`verify_mwm`.
+
+    :returns:
+        ``(N, 81)`` ``uint8`` array of ASCII codes. Use
+        ``hashes.tobytes()`` or ``hashes[i].tobytes()`` to get
+        ``bytes``.
+    """
+    return verify_mwm(batch, 0, chunk_size)[0]
+
+def digest_transaction(trytes):
+    """
+    Returns the hash of one transaction, as ASCII ``bytes``. Uses
+    :py:data:`midstate_cache`.
+    """
+    tryte_array = as_tryte_array(trytes).reshape(-1)
+    if tryte_array.shape[0] * 3 != TRANSACTION_LENGTH:
+        raise ValueError(
+            'Transactions must be {len} trytes long.'.format(
+                len=TRANSACTION_LENGTH // 3,
+            ),
+        )
+
+    trits = trytes_to_trits(tryte_array)
+    low, high = _absorb_after_signature(tryte_array, trits, TRANSACTION_LENGTH)
+    return trits_to_trytes(
+        from_planes(low[:HASH_LENGTH], high[:HASH_LENGTH], 1)[0]
+    ).tobytes()
+
+def _counter_trits(start, count, length):
+    """
+    Returns the balanced ternary digits of ``start .. start + count``,
+    as an ``int8`` array with shape ``(count, length)``.
+    """
+    values = np.arange(start, start + count, dtype=np.int64)
+    trits = np.empty((count, length), dtype=np.int8)
+    for i in range(length):
+        trit = ((values + 1) % 3) - 1
+        trits[:, i] = trit
+        values = (values - trit) // 3
+    return trits
+
+def search_nonce(trytes, mwm, words=64, stop=None):
+    """
+    Finds a nonce for transaction trytes so that the transaction hash
+    ends with `mwm` zero trits.
+
+    The first 32 blocks of the transaction don't depend on the nonce,
+    they are absorbed once, the signature / message fragment only if it
+    isn't in :py:data:`midstate_cache`. The last block is then tried with
+    ``64 * words`` different nonces per transform. Only the last 27
+    nonce trits are searched, the others are kept as given, so that
+    callers can split the search by seeding them (see
+    :py:mod:`pow.parallel`).
+
+    :param stop:
+        Optional :py:class:`threading.Event`. The search gives up once
+        it is set.
+
+    :returns:
+        The transaction trytes with the nonce filled in, as ASCII
+        ``bytes``, or None if stopped.
+    """
+    tryte_array = as_tryte_array(trytes).reshape(-1)
+    trits = trytes_to_trits(tryte_array).copy()
+    prefix_length = TRANSACTION_LENGTH - HASH_LENGTH
+
+    # State after absorbing everything but the last block
+    low, high = _absorb_after_signature(tryte_array, trits, prefix_length)
+    midstate = from_planes(low, high, 1)[0]
+
+    # The last block, in every lane
+    block = trits[prefix_length:]
+    lanes = 64 * words
+    counter_length = 27
+    nonce_start = HASH_LENGTH - counter_length
+
+    offset = 0
+    while stop is None or not stop.is_set():
+        block_low, block_high = broadcast_planes(block, words)
+        candidates = _counter_trits(offset, lanes, counter_length)
+        nonce_low, nonce_high = to_planes(candidates)
+        block_low[nonce_start:nonce_start + counter_length] = nonce_low
+        block_high[nonce_start:nonce_start + counter_length] = nonce_high
+
+        low, high = broadcast_planes(midstate, words)
+        low[:HASH_LENGTH] = block_low
+        high[:HASH_LENGTH] = block_high
+        low, high = transform(low, high)
+
+        # Zero trits have both bits set. A lane is a hit if the last
+        # `mwm` trits of its hash are all zero.
+        zeros = np.bitwise_and.reduce(
+            low[HASH_LENGTH - mwm:HASH_LENGTH]
+            & high[HASH_LENGTH - mwm:HASH_LENGTH],
+            axis=0,
+        )
+
+        hits = np.nonzero(zeros)[0]
+        if hits.size:
+            word = hits[0]
+            bits = int(zeros[word])
+            lane = word * 64 + ((bits & -bits).bit_length() - 1)
+            trits[prefix_length + nonce_start:
+                  prefix_length + nonce_start + counter_length] = \
+                candidates[lane]
+            return trits_to_trytes(trits).tobytes()
+
+        offset += lanes
+
+    return None
@@ -0,0 +1,911 @@
+"""
+PoW spread over several hosts: a coordinator hands out work to workers
+connected over TCP.
+
+Start a coordinator in the process that has the bundles, and any number
+of workers, on this or other hosts::
+
+    python -m pow.distributed coordinator.example.org:14266
+
+    with PowCoordinator(host='0.0.0.0', port=14266) as coordinator:
+        trytes = coordinator.attach_to_tangle(bundle_trytes, trunk, branch, 14)
+
+Workers run :py:func:`pow.ccurl_interface.attach_to_tangle` on whole
+bundles. The nonce search of a single transaction
+(:py:meth:`PowCoordinator.submit_transaction`) is split into slices
+instead (see :py:func:`pow.parallel.seed_partition`), and every idle
+worker joins it until a nonce is found.
+
+Workers ask for work when they have room, plus a little prefetch. An
+idle worker takes over tasks another worker has queued but not started
+yet. Workers that stop sending heartbeats, or disconnect, are dropped
+and their tasks go to the others. Results are checked with
+:py:func:`pow.ccurl_interface.get_hash_trytes` before they are accepted.
+
+The protocol is one JSON object per line. Messages are not
+authenticated: only expose the coordinator to hosts you trust.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import socket
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from multiprocessing import cpu_count
+from threading import Condition, Event, Lock, Thread
+
+from iota import TransactionHash, TransactionTrytes
+from iota.exceptions import with_context
+
+from pow import ccurl_interface, transaction
+from pow.backends import get_backend
+from pow.parallel import seed_partition
+
+DEFAULT_PORT = 14266
+
+logger = logging.getLogger(__name__)
+
+def _send(sock, lock, message):
+    """
+    Sends one message, a JSON object on its own line.
+    """
+    data = (json.dumps(message) + '\n').encode('utf-8')
+    with lock:
+        sock.sendall(data)
+
+def _read_messages(sock):
+    """
+    Yields the messages coming in on `sock` until it is closed.
+    """
+    stream = sock.makefile('rb')
+    try:
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield json.loads(line.decode('utf-8'))
+    except (IOError, OSError, ValueError):
+        # Connection reset, or garbage on the line: the peer is gone
+        return
+    finally:
+        stream.close()
+
+class _Task(object):
+    def __init__(self, task_id, kind, message, future, search=None):
+        self.id = task_id
+        self.kind = kind
+        self.message = message
+        self.future = future
+        self.search = search
+        self.worker = None
+        self.started = False
+        self.attempts = 0
+
+    @property
+    def done(self):
+        return self.future.done()
+
+class _Search(object):
+    """
+    Nonce search of one transaction, split into slices.
+    """
+    def __init__(self, trytes, mwm, future):
+        self.trytes = trytes
+        self.mwm = mwm
+        self.future = future
+        self.partitions = itertools.count()
+        self.tasks = set()
+        # Failed or invalid slice results
+        self.failures = 0
+
+class _WorkerConnection(object):
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.name = '{0}:{1}'.format(*address[:2])
+        self.capacity = 1
+        self.wanted = 0
+        # Assigned tasks, oldest first
+        self.tasks = OrderedDict()
+        self.last_seen = time.time()
+        self.alive = True
+        self.completed = 0
+        self._send_lock = Lock()
+
+    def send(self, message):
+        try:
+            _send(self.sock, self._send_lock, message)
+        except (IOError, OSError):
+            # The reader thread notices and drops the worker
+            self.close()
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except (IOError, OSError):
+            pass
+        self.sock.close()
+
+class PowCoordinator(object):
+    """
+    Hands out bundles and nonce slices to :py:class:`PowWorker`
+    processes and collects their results.
+    """
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT,
+                    heartbeat_timeout=10.0, max_attempts=3, digest=None):
+        """
+        :param host:
+            Address to listen on for workers.
+
+        :param port:
+            Port to listen on, 0 picks a free one (see `address`).
+
+        :param heartbeat_timeout:
+            Seconds without a message after which a worker counts as
+            dead and its tasks are handed to others.
+
+        :param max_attempts:
+            A bundle, or the nonce search of a transaction, fails after
+            this many failed or invalid results.
+
+        :param digest:
+            Function hashing transaction trytes to check results.
+            Defaults to :py:func:`pow.ccurl_interface.get_hash_trytes`.
+        """
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_attempts = max_attempts
+        self.digest = digest or ccurl_interface.get_hash_trytes
+
+        self._lock = Lock()
+        self._queue = deque()
+        self._tasks = {}
+        self._searches = []
+        self._workers = []
+        self._ids = itertools.count()
+        self._closed = Event()
+        self._threads = []
+
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind((host, port))
+        self._listener.listen(64)
+
+    @property
+    def address(self):
+        """
+        ``(host, port)`` the coordinator listens on.
+        """
+        return self._listener.getsockname()[:2]
+
+    def start(self):
+        """
+        Starts accepting workers, in background threads.
+        """
+        for target in [self._accept_loop, self._monitor_loop]:
+            thread = Thread(target=target)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def shutdown(self):
+        """
+        Disconnects the workers. Unfinished futures fail.
+        """
+        self._closed.set()
+        try:
+            # Wakes up the thread blocked in `accept()`
+            self._listener.shutdown(socket.SHUT_RDWR)
+        except (IOError, OSError):
+            pass
+        self._listener.close()
+
+        with self._lock:
+            workers = list(self._workers)
+            tasks = list(self._tasks.values())
+            searches = list(self._searches)
+            self._workers = []
+            self._tasks = {}
+            self._searches = []
+            self._queue.clear()
+
+            futures = [t.future for t in tasks] + [s.future for s in searches]
+            for future in futures:
+                if not future.done():
+                    future.set_exception(
+                        RuntimeError('Coordinator shut down.'))
+
+        for worker in workers:
+            worker.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+    def workers(self):
+        """
+        Returns the state of the connected workers, a list of dicts.
+        """
+        with self._lock:
+            return [
+                {
+                    'name': worker.name,
+                    'capacity': worker.capacity,
+                    'assigned': len(worker.tasks),
+                    'completed': worker.completed,
+                }
+                for worker in self._workers
+            ]
+
+    def submit_bundle(self, bundle_trytes, trunk_transaction_hash,
+                        branch_transaction_hash, mwm=14):
+        """
+        Schedules a bundle to be attached by one of the workers.
+
+        :returns:
+            :py:class:`concurrent.futures.Future` resolving to the
+            attached bundle, like
+            :py:func:`pow.ccurl_interface.attach_to_tangle` returns it.
+        """
+        bundle = transaction.BundleBuffer(bundle_trytes)
+        future = Future()
+
+        with self._lock:
+            task = _Task(next(self._ids), 'bundle', {
+                'kind': 'bundle',
+                'trytes': bundle.as_tryte_strings(),
+                'trunk': '{0}'.format(TransactionHash(trunk_transaction_hash)),
+                'branch': '{0}'.format(
+                    TransactionHash(branch_transaction_hash)),
+                'mwm': mwm,
+            }, future)
+            self._tasks[task.id] = task
+            self._queue.append(task)
+            outbox = self._dispatch()
+
+        self._flush(outbox)
+        return future
+
+    def submit_transaction(self, trytes, mwm=14):
+        """
+        Searches the nonce of a single transaction, whose attachment
+        fields are filled in already, with every idle worker.
+
+        :returns:
+            :py:class:`concurrent.futures.Future` resolving to the
+            powed transaction trytes.
+        """
+        trytes = '{0}'.format(trytes)
+        ccurl_interface.check_tx_trytes_length(trytes)
+        future = Future()
+
+        with self._lock:
+            search = _Search(trytes, mwm, future)
+            self._searches.append(search)
+            self._queue.append(self._new_slice(search))
+            outbox = self._dispatch()
+
+        self._flush(outbox)
+        return future
+
+    def attach_to_tangle(self, bundle_trytes, trunk_transaction_hash,
+                            branch_transaction_hash, mwm=14, timeout=None):
+        """
+        Blocking version of :py:meth:`submit_bundle`.
+        """
+        return self.submit_bundle(
+            bundle_trytes,
+            trunk_transaction_hash,
+            branch_transaction_hash,
+            mwm,
+        ).result(timeout)
+
+    def _new_slice(self, search):
+        # Caller holds the lock
+        task = _Task(next(self._ids), 'slice', {
+            'kind': 'slice',
+            'trytes': seed_partition(search.trytes, next(search.partitions)),
+            'mwm': search.mwm,
+        }, search.future, search)
+        search.tasks.add(task)
+        self._tasks[task.id] = task
+        return task
+
+    def _next_task(self, worker):
+        """
+        Picks a task for `worker`: the oldest queued one, else a new
+        slice of a running search, else a task stolen from a busy
+        worker. Caller holds the lock.
+
+        :returns:
+            Tuple of the task (or None) and a message for the worker it
+            was stolen from (or None).
+        """
+        while self._queue:
+            task = self._queue.popleft()
+            if not task.done:
+                return task, None
+
+        for search in self._searches:
+            if not search.future.done():
+                return self._new_slice(search), None
+
+        victims = [
+            other for other in self._workers
+            if other is not worker
+                and any(t.started for t in other.tasks.values())
+                and any(
+                    not t.started and t.kind == 'bundle'
+                    for t in other.tasks.values()
+                )
+        ]
+        if victims:
+            victim = max(victims, key=lambda w: len(w.tasks))
+            task = [
+                t for t in victim.tasks.values()
+                if not t.started and t.kind == 'bundle'
+            ][-1]
+            del victim.tasks[task.id]
+            logger.info('Worker {0} takes task {1} from {2}.'.format(
+                worker.name, task.id, victim.name))
+            return task, (victim, {'type': 'cancel', 'task': task.id})
+
+        return None, None
+
+    def _dispatch(self):
+        """
+        Assigns work to workers asking for it. Caller holds the lock.
+
+        :returns:
+            List of ``(worker, message)`` to send once the lock is
+            released.
+        """
+        outbox = []
+        for worker in self._workers:
+            while worker.wanted > 0:
+                task, steal_message = self._next_task(worker)
+                if task is None:
+                    break
+                if steal_message is not None:
+                    outbox.append(steal_message)
+
+                task.worker = worker
+                task.started = False
+                worker.tasks[task.id] = task
+                worker.wanted -= 1
+
+                message = dict(task.message)
+                message.update({'type': 'task', 'task': task.id})
+                outbox.append((worker, message))
+        return outbox
+
+    def _flush(self, outbox):
+        for worker, message in outbox:
+            worker.send(message)
+
+    def _accept_loop(self):
+        while not self._closed.is_set():
+            try:
+                sock, address = self._listener.accept()
+            except (IOError, OSError):
+                # Listener closed
+                return
+
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            worker = _WorkerConnection(sock, address)
+            with self._lock:
+                self._workers.append(worker)
+
+            thread = Thread(target=self._serve_worker, args=(worker,))
+            thread.daemon = True
+            thread.start()
+
+    def _monitor_loop(self):
+        while not self._closed.wait(self.heartbeat_timeout / 4):
+            now = time.time()
+            with self._lock:
+                dead = [
+                    worker for worker in self._workers
+                    if now - worker.last_seen > self.heartbeat_timeout
+                ]
+            for worker in dead:
+                logger.warning('Worker {0} missed its heartbeats.'.format(
+                    worker.name))
+                self._drop_worker(worker)
+
+    def _serve_worker(self, worker):
+        try:
+            for message in _read_messages(worker.sock):
+                worker.last_seen = time.time()
+                self._handle(worker, message)
+                if not worker.alive:
+                    break
+        finally:
+            self._drop_worker(worker)
+
+    def _handle(self, worker, message):
+        kind = message.get('type')
+
+        if kind == 'result':
+            self._handle_result(worker, message)
+            return
+
+        with self._lock:
+            if kind == 'hello':
+                worker.name = message.get('name') or worker.name
+                worker.capacity = message.get('capacity', 1)
+                logger.info('Worker {0} connected, capacity {1}.'.format(
+                    worker.name, worker.capacity))
+            elif kind == 'request':
+                worker.wanted += message.get('count', 1)
+            elif kind == 'started':
+                task = worker.tasks.get(message.get('task'))
+                if task is not None:
+                    task.started = True
+            outbox = self._dispatch()
+
+        self._flush(outbox)
+
+    def _handle_result(self, worker, message):
+        with self._lock:
+            task = self._tasks.get(message.get('task'))
+            worker.tasks.pop(message.get('task'), None)
+
+        if task is None or task.done:
+            # Late result of a task someone else finished
+            return
+
+        error = message.get('error')
+        if error is None:
+            # Check outside the lock, hashing a bundle takes a while
+            if task.kind == 'bundle':
+                valid = self._valid_bundle(task, message.get('trytes'))
+            else:
+                valid = self._valid_slice(task, message.get('trytes'))
+            if not valid:
+                error = 'Invalid result.'
+                logger.warning('Worker {0} sent an invalid result for'
+                    ' task {1}.'.format(worker.name, task.id))
+
+        with self._lock:
+            if task.done:
+                outbox = []
+            elif error is None:
+                outbox = self._complete(task, worker, message['trytes'])
+            else:
+                outbox = self._fail(task, worker, error)
+            outbox.extend(self._dispatch())
+
+        self._flush(outbox)
+
+    def _complete(self, task, worker, trytes):
+        # Caller holds the lock
+        worker.completed += 1
+
+        if task.kind == 'bundle':
+            others = [task]
+            result = [TransactionTrytes(t) for t in trytes]
+        else:
+            search = task.search
+            others = list(search.tasks)
+            if search in self._searches:
+                self._searches.remove(search)
+            result = TransactionTrytes(trytes)
+
+        outbox = self._forget(others, worker)
+        if not task.future.done():
+            task.future.set_result(result)
+        return outbox
+
+    def _forget(self, tasks, worker):
+        """
+        Drops finished tasks, and cancels them on other workers. Caller
+        holds the lock.
+        """
+        outbox = []
+        for other in tasks:
+            self._tasks.pop(other.id, None)
+            if other.worker is not None and other.worker is not worker:
+                # Stolen, or another slice of the search
+                if other.worker.tasks.pop(other.id, None) is not None:
+                    outbox.append(
+                        (other.worker, {'type': 'cancel', 'task': other.id}))
+        return outbox
+
+    def _fail(self, task, worker, error):
+        # Caller holds the lock
+        if task.worker is not worker:
+            # Someone else has the task by now
+            return []
+
+        if task.kind == 'slice':
+            search = task.search
+            search.tasks.discard(task)
+            self._tasks.pop(task.id, None)
+            search.failures += 1
+            if search.failures < self.max_attempts:
+                if not search.tasks:
+                    self._queue.appendleft(self._new_slice(search))
+                return []
+
+            if search in self._searches:
+                self._searches.remove(search)
+            outbox = self._forget(list(search.tasks), worker)
+            search.future.set_exception(with_context(
+                exc=ValueError(
+                    'Nonce search failed {attempts} times: {error}'.format(
+                        attempts=search.failures,
+                        error=error,
+                    )
+                ),
+
+                context={
+                    'trytes': search.trytes,
+                    'mwm': search.mwm,
+                },
+            ))
+            return outbox
+
+        task.attempts += 1
+        task.worker = None
+        if task.attempts >= self.max_attempts:
+            self._tasks.pop(task.id, None)
+            task.future.set_exception(with_context(
+                exc=ValueError(
+                    'Bundle failed {attempts} times: {error}'.format(
+                        attempts=task.attempts,
+                        error=error,
+                    )
+                ),
+
+                context={
+                    'task': task.message,
+                },
+            ))
+        else:
+            self._queue.appendleft(task)
+        return []
+
+    def _drop_worker(self, worker):
+        """
+        Forgets a dead or disconnected worker and requeues its tasks.
+        """
+        with self._lock:
+            if not worker.alive:
+                return
+            worker.alive = False
+            if worker in self._workers:
+                self._workers.remove(worker)
+
+            tasks = list(worker.tasks.values())
+            worker.tasks.clear()
+            for task in reversed(tasks):
+                if task.done:
+                    continue
+                task.worker = None
+                if task.kind == 'slice':
+                    task.search.tasks.discard(task)
+                    self._tasks.pop(task.id, None)
+                    if not task.search.tasks:
+                        self._queue.appendleft(self._new_slice(task.search))
+                else:
+                    self._queue.appendleft(task)
+
+            if tasks:
+                logger.warning('Worker {0} dropped, {1} tasks requeued.'
+                    .format(worker.name, len(tasks)))
+            outbox = self._dispatch()
+
+        worker.close()
+        self._flush(outbox)
+
+    def _valid_hash(self, trytes, mwm):
+        return ccurl_interface.count_trailing_zero_trits(
+            '{0}'.format(self.digest(trytes))) >= mwm
+
+    def _valid_bundle(self, task, trytes):
+        """
+        Checks that a bundle result kept the content of the bundle, is
+        attached to the requested tips, and that every transaction
+        satisfies the MWM.
+        """
+        original = task.message['trytes']
+        if not isinstance(trytes, list) or len(trytes) != len(original):
+            return False
+
+        trunk_offset = transaction.TRUNK_TRANSACTION_HASH[0]
+        mwm = task.message['mwm']
+        next_hash = None
+        # Both head first, as `attach_to_tangle` returns them
+        for index, powed in enumerate(trytes):
+            if (len(powed) != transaction.TRANSACTION_LENGTH
+                    or powed[:trunk_offset] != original[index][:trunk_offset]
+                    or transaction.get_field(powed, transaction.TAG)
+                        != transaction.get_field(
+                            original[index], transaction.TAG)):
+                return False
+
+            if next_hash is None:
+                tips = (task.message['trunk'], task.message['branch'])
+            else:
+                tips = (next_hash, task.message['trunk'])
+            if (transaction.get_field(
+                    powed, transaction.TRUNK_TRANSACTION_HASH),
+                    transaction.get_field(
+                    powed, transaction.BRANCH_TRANSACTION_HASH)) != tips:
+                return False
+
+            next_hash = '{0}'.format(self.digest(powed))
+            if ccurl_interface.count_trailing_zero_trits(next_hash) < mwm:
+                return False
+        return True
+
+    def _valid_slice(self, task, trytes):
+        """
+        Checks that only the nonce changed, and that it satisfies the
+        MWM.
+        """
+        nonce_offset = transaction.NONCE[0]
+        return (
+            isinstance(trytes, type(''))
+            and len(trytes) == transaction.TRANSACTION_LENGTH
+            and trytes[:nonce_offset] == task.search.trytes[:nonce_offset]
+            and self._valid_hash(trytes, task.search.mwm)
+        )
+
+class PowWorker(object):
+    """
+    Connects to a :py:class:`PowCoordinator` and does the PoW it hands
+    out.
+    """
+    def __init__(self, host, port=DEFAULT_PORT, capacity=None, prefetch=1,
+                    backend=None, heartbeat_interval=2.0, name=None,
+                    interrupt_native=None):
+        """
+        :param capacity:
+            Number of tasks worked on at once. Defaults to 1 for the
+            ccurl backends, whose searches take turns on every core
+            anyway, and to the number of CPUs otherwise. A worker never
+            asks for more than it can start.
+
+        :param prefetch:
+            Number of tasks queued on top of `capacity`, so there is no
+            round trip between tasks. Queued tasks can be taken over by
+            idle workers.
+
+        :param backend:
+            PoW backend to use, name or instance, see
+            :py:mod:`pow.backends`.
+
+        :param heartbeat_interval:
+            Seconds between heartbeats. Keep it well below the
+            coordinator's `heartbeat_timeout`.
+
+        :param interrupt_native:
+            Interrupt a running native search when its slice is won by
+            another worker. The interrupt is global to the process, so
+            this defaults to True only for a `capacity` of 1.
+        """
+        self.host = host
+        self.port = port
+        self.backend = get_backend(backend)
+        if not capacity:
+            # More tasks than ccurl runs at once would only wait on this
+            # host, where no idle worker can take them over.
+            capacity = (
+                1 if self.backend.name in ('ccurl', 'cffi')
+                    else cpu_count()
+            )
+        self.capacity = capacity
+        self.prefetch = prefetch
+        self.heartbeat_interval = heartbeat_interval
+        self.name = name or '{0}-{1}'.format(socket.gethostname(), os.getpid())
+        self.interrupt_native = (
+            self.capacity == 1 if interrupt_native is None
+                else interrupt_native
+        )
+
+        self._sock = None
+        self._send_lock = Lock()
+        self._condition = Condition()
+        self._queue = deque()
+        self._running = {}
+        self._stopped = Event()
+        self._thread = None
+
+    def run(self):
+        """
+        Connects and works until the coordinator goes away or
+        :py:meth:`stop` is called.
+        """
+        self._stopped.clear()
+        self._sock = socket.create_connection((self.host, self.port))
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        threads = [Thread(target=self._heartbeat_loop)] + [
+            Thread(target=self._work_loop) for _ in range(self.capacity)
+        ]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        try:
+            self._send({
+                'type': 'hello',
+                'name': self.name,
+                'capacity': self.capacity,
+            })
+            self._send({
+                'type': 'request',
+                'count': self.capacity + self.prefetch,
+            })
+
+            for message in _read_messages(self._sock):
+                if message.get('type') == 'task':
+                    with self._condition:
+                        self._queue.append(message)
+                        self._condition.notify()
+                elif message.get('type') == 'cancel':
+                    self._cancel(message['task'])
+        except (IOError, OSError):
+            pass
+        finally:
+            self._shutdown()
+            for thread in threads:
+                thread.join()
+
+    def start(self):
+        """
+        Runs the worker in a background thread.
+        """
+        self._thread = Thread(target=self.run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Disconnects. Results of running tasks are thrown away.
+        """
+        self._shutdown()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _shutdown(self):
+        with self._condition:
+            self._stopped.set()
+            self._queue.clear()
+            for stop in self._running.values():
+                stop.set()
+            self._condition.notify_all()
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except (IOError, OSError):
+                pass
+            self._sock.close()
+
+    def _send(self, message):
+        try:
+            _send(self._sock, self._send_lock, message)
+        except (IOError, OSError):
+            self._shutdown()
+
+    def _heartbeat_loop(self):
+        while not self._stopped.wait(self.heartbeat_interval):
+            self._send({'type': 'heartbeat'})
+
+    def _cancel(self, task_id):
+        with self._condition:
+            queued = [m for m in self._queue if m['task'] == task_id]
+            for message in queued:
+                self._queue.remove(message)
+            stop = self._running.get(task_id)
+            if stop is not None:
+                stop.set()
+
+        if queued:
+            # Room for another task
+            self._send({'type': 'request', 'count': 1})
+        elif stop is not None and self.interrupt_native:
+            self.backend.interrupt(stop=stop)
+
+    def _work_loop(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._stopped.is_set():
+                    self._condition.wait()
+                if self._stopped.is_set():
+                    return
+                message = self._queue.popleft()
+                stop = Event()
+                self._running[message['task']] = stop
+
+            self._send({'type': 'started', 'task': message['task']})
+
+            reply = {'type': 'result', 'task': message['task']}
+            try:
+                result = self._execute(message, stop)
+                if result is not None:
+                    reply['trytes'] = result
+            except Exception as e:
+                logger.exception('Task {0} failed.'.format(message['task']))
+                reply['error'] = '{0}'.format(e)
+            finally:
+                with self._condition:
+                    self._running.pop(message['task'], None)
+
+            if stop.is_set():
+                # Cancelled, or shutting down: nobody wants the result
+                if self._stopped.is_set():
+                    return
+            else:
+                if 'trytes' not in reply and 'error' not in reply:
+                    reply['error'] = 'Search stopped.'
+                self._send(reply)
+            self._send({'type': 'request', 'count': 1})
+
+    def _execute(self, message, stop):
+        if message['kind'] == 'bundle':
+            return [
+                '{0}'.format(trytes)
+                for trytes in ccurl_interface.attach_to_tangle(
+                    message['trytes'],
+                    message['trunk'],
+                    message['branch'],
+                    message['mwm'],
+                    self.backend,
+                )
+            ]
+        return self.backend.pow_partition(
+            message['trytes'], message['mwm'], stop)
+
+def _parse_address(value):
+    host, _, port = value.rpartition(':')
+    return host or '127.0.0.1', int(port) if port else DEFAULT_PORT
+
+def main():
+    parser = argparse.ArgumentParser(description='PyOTA-PoW worker.')
+    parser.add_argument('coordinator', type=_parse_address,
+        help='HOST:PORT of the coordinator.')
+    parser.add_argument('--capacity', type=int, default=None)
+    parser.add_argument('--prefetch', type=int, default=1)
+    parser.add_argument('--backend', default=None)
+    parser.add_argument('--heartbeat-interval', type=float, default=2.0)
+    parser.add_argument('--retry-interval', type=float, default=5.0,
+        help='Seconds to wait before reconnecting.')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    host, port = args.coordinator
+    worker = PowWorker(
+        host,
+        port,
+        capacity=args.capacity,
+        prefetch=args.prefetch,
+        backend=args.backend,
+        heartbeat_interval=args.heartbeat_interval,
+    )
+    try:
+        while True:
+            try:
+                worker.run()
+                logger.info('Coordinator went away.')
+            except (IOError, OSError) as e:
+                logger.warning('Cannot reach coordinator: {0}'.format(e))
+            time.sleep(args.retry_interval)
+    except KeyboardInterrupt:
+        worker.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import cpu_count
+
+from pow import ccurl_interface
+from pow.backends import get_backend
+
+class PowEngine(object):
+    """
+    Thread-safe Proof-of-Work engine backed by a
+    :py:class:`concurrent.futures.ThreadPoolExecutor`.
+
+    Any number of application threads can submit work concurrently.
+    ctypes releases the GIL while `ccurl_pow` runs, so Python keeps
+    running during a search. ccurl keeps its search state in globals,
+    so its searches take turns, each one on every core. Bundles
+    submitted with another backend (e.g. ``numpy``) run in parallel. The
+    one-time global setup of ccurl is serialized before any worker
+    touches the library, see
+    :py:func:`pow.ccurl_interface.ensure_pow_initialized`.
+
+    Usage::
+
+        with PowEngine(workers=4) as engine:
+            future = engine.submit(tx_trytes, mwm=14)
+            powed_trytes = future.result()
+    """
+    def __init__(self, workers=None, backend=None):
+        """
+        :param workers:
+            Number of worker threads. Defaults to the number of CPUs.
+
+        :param backend:
+            PoW backend to use, name or instance, see
+            :py:mod:`pow.backends`. Defaults to the fastest available
+            one.
+        """
+        self.workers = workers or cpu_count()
+        self.backend = get_backend(backend)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+
+        # Do the ccurl setup now, in the constructing thread, rather
+        # than on the first (latency sensitive) request. Other backends
+        # don't touch the library at all.
+        if self.backend.name in ('ccurl', 'cffi'):
+            ccurl_interface.ensure_pow_initialized()
+
+    def submit(self, trytes, mwm):
+        """
+        Schedules the PoW of a single transaction.
+
+        :param trytes:
+            Transaction trytes (unicode string, 2673 trytes long).
+
+        :param mwm:
+            Minimum Weight Magnitude to be used during the PoW.
+
+        :returns:
+            :py:class:`concurrent.futures.Future` resolving to the
+            powed transaction trytes. Its hash is checked against the
+            MWM, like :py:func:`pow.ccurl_interface.attach_to_tangle`
+            does.
+        """
+        return self._executor.submit(self._pow, trytes, mwm)
+
+    def _pow(self, trytes, mwm):
+        return ccurl_interface._pow_transaction(trytes, mwm, self.backend)
+
+    def submit_bundle(self, bundle_trytes, trunk_transaction_hash,
+                        branch_transaction_hash, mwm=14, backend=None):
+        """
+        Schedules :py:func:`pow.ccurl_interface.attach_to_tangle` for a
+        whole bundle.
+
+        :param backend:
+            PoW backend to use, name or instance, see
+            :py:mod:`pow.backends`. Defaults to the engine's.
+
+        :returns:
+            :py:class:`concurrent.futures.Future` resolving to the
+            attached bundle trytes.
+        """
+        return self._executor.submit(
+            ccurl_interface.attach_to_tangle,
+            bundle_trytes,
+            trunk_transaction_hash,
+            branch_transaction_hash,
+            mwm,
+            backend or self.backend,
+        )
+
+    def map(self, trytes_list, mwm):
+        """
+        Does the PoW of independent transactions on the worker threads.
+
+        :returns:
+            List of powed transaction trytes, in input order.
+        """
+        futures = [self.submit(trytes, mwm) for trytes in trytes_list]
+        return [f.result() for f in futures]
+
+    def shutdown(self, wait=True):
+        """
+        Stops accepting work and releases the worker threads.
+        """
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
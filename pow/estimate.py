@@ -0,0 +1,115 @@
+"""
+PoW time estimates from a calibrated local hash rate.
+
+Finding a nonce for MWM ``m`` takes ``3^m`` hashes on average, so the
+expected time for a bundle is ``n_txs * 3^m / hash_rate``::
+
+    from pow.estimate import estimate_pow_time
+
+    if estimate_pow_time(len(bundle_trytes), 14) > time_left:
+        reject()
+
+The hash rate of each backend is measured the first time it is needed
+(see :py:func:`calibrate`), which takes a fraction of a second.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import time
+from threading import Lock
+
+from pow import transaction
+from pow.backends import get_backend
+
+class HashRateEstimator(object):
+    """
+    Moving average of the hash rate of one worker, used to turn the
+    expected number of hashes of a job into seconds.
+    """
+    def __init__(self, initial_rate=500000, smoothing=0.2):
+        """
+        :param initial_rate:
+            Hashes per second assumed until the first measurement.
+
+        :param smoothing:
+            Weight of a new measurement in the moving average.
+        """
+        self.rate = float(initial_rate)
+        self.smoothing = smoothing
+        self._lock = Lock()
+
+    def update(self, hashes, seconds):
+        """
+        Adds a measurement: `hashes` expected hashes done in `seconds`.
+        """
+        if seconds <= 0:
+            return
+        with self._lock:
+            self.rate += self.smoothing * (hashes / seconds - self.rate)
+
+    def estimate(self, n_txs, mwm, workers=1):
+        """
+        Returns the expected number of seconds to pow `n_txs`
+        transactions at `mwm`.
+        """
+        return n_txs * (3 ** mwm) / (self.rate * workers)
+
+# Calibrated estimators, by backend name
+_estimators = {}
+_lock = Lock()
+
+def calibrate(backend=None, mwm=9, samples=8):
+    """
+    Measures the hash rate of a backend by powing `samples` dummy
+    transactions, and stores it for :py:func:`estimate_pow_time`.
+
+    Nonce search times vary a lot, the average over several samples
+    at a low MWM is a good compromise between accuracy and calibration
+    time.
+
+    :returns:
+        The measured hash rate, in hashes per second.
+    """
+    pow_backend = get_backend(backend)
+
+    started = time.time()
+    for i in range(samples):
+        # A distinct transaction per sample, so nonces differ too
+        pow_backend.pow(
+            transaction.set_fields(
+                '9' * transaction.TRANSACTION_LENGTH,
+                {transaction.TAG: transaction.int_to_trytes(i, 27)},
+            ),
+            mwm,
+        )
+    seconds = max(time.time() - started, 1e-6)
+
+    rate = samples * (3 ** mwm) / seconds
+    with _lock:
+        _estimators[pow_backend.name] = HashRateEstimator(initial_rate=rate)
+    return rate
+
+def get_estimator(backend=None):
+    """
+    Returns the :py:class:`HashRateEstimator` of a backend, calibrating
+    it first if needed.
+    """
+    pow_backend = get_backend(backend)
+    estimator = _estimators.get(pow_backend.name)
+    if estimator is None:
+        calibrate(pow_backend)
+        estimator = _estimators[pow_backend.name]
+    return estimator
+
+def estimate_pow_time(n_txs, mwm, backend=None):
+    """
+    Returns the expected number of seconds to pow `n_txs` transactions
+    at `mwm`, one after the other.
+
+    This is an average. The time of a single nonce search is roughly
+    exponentially distributed, so a one transaction bundle takes more
+    than three times the estimate about 5% of the time. The longer the
+    bundle, the closer it gets to the estimate.
+    """
+    return get_estimator(backend).estimate(n_txs, mwm)
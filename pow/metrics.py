@@ -0,0 +1,237 @@
+"""
+Instrumentation hooks for the attach path.
+
+Register an observer to get a :py:class:`TransactionMetrics` record for
+every transaction :py:func:`pow.ccurl_interface.attach_to_tangle` (and
+friends) powed::
+
+    from pow import metrics
+
+    aggregator = metrics.MetricsAggregator()
+    metrics.register_observer(aggregator)
+    ...
+    print(aggregator.to_prometheus())
+
+With no observer registered the attach path doesn't even read the
+clock, the only cost is one truthiness check per transaction.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import logging
+from threading import Lock
+
+# Registered observers. Mutated in place only, so that modules holding
+# a reference to the list always see the current observers.
+_observers = []
+_observers_lock = Lock()
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the PoW duration histogram, in seconds
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class TransactionMetrics(object):
+    """
+    Measurements of one powed transaction.
+
+    The native PoW call and its FFI round trip (argument conversion,
+    copying and freeing the result) can't be told apart from Python,
+    both are in `pow_seconds`. `hash_seconds` is almost nothing but FFI
+    round trip, as hashing a single transaction takes microseconds
+    natively, so it is a good measure of the per-call FFI overhead.
+    `overhead_seconds` is what is left: setting the attachment fields,
+    serializing the transaction and checking the hash, in Python.
+    """
+    __slots__ = (
+        'backend',
+        'mwm',
+        'current_index',
+        'retries',
+        'pow_seconds',
+        'hash_seconds',
+        'overhead_seconds',
+    )
+
+    def __init__(self, backend, mwm, current_index, retries, pow_seconds,
+                    hash_seconds, overhead_seconds):
+        self.backend = backend
+        self.mwm = mwm
+        self.current_index = current_index
+        self.retries = retries
+        self.pow_seconds = pow_seconds
+        self.hash_seconds = hash_seconds
+        self.overhead_seconds = overhead_seconds
+
+    @property
+    def total_seconds(self):
+        return self.pow_seconds + self.hash_seconds + self.overhead_seconds
+
+    @property
+    def hash_rate(self):
+        """
+        Effective hash rate, in hashes per second. Finding a nonce takes
+        3^mwm attempts on average, so this is noisy for single
+        transactions but accurate on aggregate.
+        """
+        if self.pow_seconds <= 0:
+            return 0.0
+        return (3 ** self.mwm) * (self.retries + 1) / self.pow_seconds
+
+    def as_json_compatible(self):
+        result = {name: getattr(self, name) for name in self.__slots__}
+        result['hash_rate'] = self.hash_rate
+        return result
+
+def register_observer(observer):
+    """
+    Registers a callable that gets a :py:class:`TransactionMetrics`
+    for every powed transaction.
+
+    Observers are called from the thread that did the PoW, possibly
+    from several threads at once, and should return quickly. Exceptions
+    raised by observers are logged and swallowed.
+    """
+    with _observers_lock:
+        if observer not in _observers:
+            _observers.append(observer)
+    return observer
+
+def unregister_observer(observer):
+    """
+    Removes an observer added with :py:func:`register_observer`.
+    """
+    with _observers_lock:
+        if observer in _observers:
+            _observers.remove(observer)
+
+def notify(record):
+    """
+    Hands `record` to every registered observer.
+    """
+    for observer in list(_observers):
+        try:
+            observer(record)
+        except Exception:
+            logger.exception('PoW metrics observer failed')
+
+class MetricsAggregator(object):
+    """
+    In-process observer that aggregates :py:class:`TransactionMetrics`
+    per backend and MWM, and exports them in the Prometheus text
+    format.
+    """
+    def __init__(self, prefix='pyota_pow'):
+        self.prefix = prefix
+        self._lock = Lock()
+        # (backend, mwm) -> dict of counters
+        self._series = {}
+
+    def __call__(self, record):
+        key = (record.backend, record.mwm)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    'transactions': 0,
+                    'retries': 0,
+                    'pow_seconds': 0.0,
+                    'hash_seconds': 0.0,
+                    'overhead_seconds': 0.0,
+                    'buckets': [0] * len(DURATION_BUCKETS),
+                }
+
+            series['transactions'] += 1
+            series['retries'] += record.retries
+            series['pow_seconds'] += record.pow_seconds
+            series['hash_seconds'] += record.hash_seconds
+            series['overhead_seconds'] += record.overhead_seconds
+
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if record.pow_seconds <= bound:
+                    series['buckets'][i] += 1
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self):
+        """
+        Returns the aggregated values, keyed by ``(backend, mwm)``.
+        The hash rate is the total expected number of hashes over the
+        total PoW time.
+        """
+        with self._lock:
+            result = {}
+            for (backend, mwm), series in self._series.items():
+                values = dict(series)
+                values['buckets'] = list(series['buckets'])
+                values['hash_rate'] = (
+                    (3 ** mwm)
+                    * (series['transactions'] + series['retries'])
+                    / series['pow_seconds']
+                    if series['pow_seconds'] > 0 else 0.0
+                )
+                result[(backend, mwm)] = values
+            return result
+
+    def to_prometheus(self):
+        """
+        Returns the metrics in the Prometheus text exposition format.
+        """
+        snapshot = sorted(self.snapshot().items())
+        lines = []
+
+        def metric(name, type_, help_, samples):
+            name = '{prefix}_{name}'.format(prefix=self.prefix, name=name)
+            lines.append('# HELP {0} {1}'.format(name, help_))
+            lines.append('# TYPE {0} {1}'.format(name, type_))
+            for suffix, labels, value in samples:
+                lines.append('{name}{suffix}{{{labels}}} {value}'.format(
+                    name=name,
+                    suffix=suffix,
+                    labels=','.join(
+                        '{0}="{1}"'.format(k, v) for k, v in labels
+                    ),
+                    value=repr(float(value)) if isinstance(value, float)
+                        else value,
+                ))
+
+        def labels(key):
+            return [('backend', key[0]), ('mwm', key[1])]
+
+        for name, field, help_ in (
+            ('transactions_total', 'transactions',
+                'Transactions powed.'),
+            ('retries_total', 'retries',
+                'PoW attempts that produced a wrong hash.'),
+            ('hash_seconds_total', 'hash_seconds',
+                'Time spent hashing powed transactions.'),
+            ('overhead_seconds_total', 'overhead_seconds',
+                'Python time spent around PoW and hashing.'),
+        ):
+            metric(name, 'counter', help_, [
+                ('', labels(key), values[field])
+                for key, values in snapshot
+            ])
+
+        metric('hash_rate', 'gauge',
+            'Effective hash rate, hashes per second.', [
+                ('', labels(key), values['hash_rate'])
+                for key, values in snapshot
+            ])
+
+        samples = []
+        for key, values in snapshot:
+            for bound, count in zip(DURATION_BUCKETS, values['buckets']):
+                samples.append(
+                    ('_bucket', labels(key) + [('le', bound)], count))
+            samples.append(('_bucket', labels(key) + [('le', '+Inf')],
+                values['transactions']))
+            samples.append(('_sum', labels(key), values['pow_seconds']))
+            samples.append(('_count', labels(key), values['transactions']))
+        metric('duration_seconds', 'histogram',
+            'Duration of the PoW call, including FFI overhead.', samples)
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,155 @@
+"""
+Splits the nonce search of a single transaction across workers.
+
+Transactions of a bundle have to be powed one after the other, each
+one's trunk is the previous one's hash. Running bundles in parallel
+doesn't make a single bundle any faster, but searching the nonce of
+each transaction with all cores does::
+
+    from pow.parallel import PartitionedBackend
+
+    with PartitionedBackend('numpy', workers=8) as backend:
+        trytes = attach_to_tangle(bundle, trunk, branch, 14,
+            backend=backend)
+
+Every worker gets the same transaction with a distinct seed in the
+middle of the nonce (:py:func:`seed_partition`). Backends only search
+the other nonce trits, so workers never try the same nonce. The first
+valid nonce wins, the other workers are stopped.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from multiprocessing import cpu_count
+from threading import Event
+
+from iota.exceptions import with_context
+
+from pow.backends import PowBackend, get_backend
+
+# Nonce trytes that carry the partition seed: nonce trits 6..27. Ccurl
+# increments the first 4 and the last 54 nonce trits, the NumPy search
+# counts in the last 27, so neither touches these.
+SEED_START = 2646 + 2
+SEED_LENGTH = 7
+
+_ALPHABET = '9ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+def seed_partition(trytes, partition):
+    """
+    Returns transaction trytes with `partition` written into the seed
+    trytes of the nonce.
+    """
+    if not 0 <= partition < 27 ** SEED_LENGTH:
+        raise with_context(
+            exc=ValueError('Partition out of range.'),
+
+            context={
+                'partition': partition,
+            },
+        )
+
+    seed = []
+    for _ in range(SEED_LENGTH):
+        partition, digit = divmod(partition, 27)
+        seed.append(_ALPHABET[digit])
+
+    return (
+        trytes[:SEED_START]
+        + ''.join(seed)
+        + trytes[SEED_START + SEED_LENGTH:]
+    )
+
+class PartitionedBackend(PowBackend):
+    """
+    Wraps a backend and runs each nonce search on `workers` threads,
+    each on its own partition of the nonce space.
+
+    How fast the losing workers stop depends on the wrapped backend:
+
+    - ``numpy`` checks a stop event between transforms.
+    - ``ccurl`` and ``cffi`` are interrupted with ``ccurl_pow_interrupt``
+      if the build exports it, see `interrupt_native`. Otherwise the
+      losers run until they find their own nonce, which takes about as
+      long as the winner did.
+
+    ccurl searches take turns and each one already runs on every core,
+    so partitioning ccurl gains nothing. Partitions that get their turn
+    after another one won are skipped.
+    """
+    def __init__(self, backend=None, workers=None, interrupt_native=True):
+        """
+        :param backend:
+            Backend to wrap, name or instance, see :py:mod:`pow.backends`.
+
+        :param workers:
+            Number of partitions searched at once. Defaults to the
+            number of CPUs.
+
+        :param interrupt_native:
+            Whether to interrupt the losing native searches. The ccurl
+            interrupt is global, it also cuts short unrelated searches
+            running in the same process at that moment. They come back
+            without a valid nonce and are redone by the retry loop of
+            :py:func:`pow.ccurl_interface.attach_transaction_view`. Turn
+            this off if other code runs ccurl PoW concurrently.
+        """
+        self.backend = get_backend(backend)
+        self.workers = workers or cpu_count()
+        self.interrupt_native = interrupt_native
+        self.name = '{0}-partitioned'.format(self.backend.name)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+
+    def pow(self, trytes, mwm):
+        stop = Event()
+
+        futures = [
+            self._executor.submit(
+                self.backend.pow_partition,
+                seed_partition(trytes, partition),
+                mwm,
+                stop,
+            )
+            for partition in range(self.workers)
+        ]
+
+        error = None
+        try:
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+
+                if result is not None:
+                    return result
+        finally:
+            stop.set()
+            for future in futures:
+                future.cancel()
+            if self.interrupt_native:
+                self.backend.interrupt()
+
+        raise with_context(
+            exc=ValueError('Every partition of the nonce search failed.'),
+
+            context={
+                'backend': self.backend.name,
+                'error': error,
+            },
+        )
+
+    def digest(self, trytes):
+        return self.backend.digest(trytes)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
@@ -0,0 +1,300 @@
+"""
+Bulk reattachment and promotion of stuck bundles.
+
+After a congestion event thousands of bundles may need new tips. Calling
+:py:func:`pow.ccurl_interface.attach_to_tangle` for each one parses
+every bundle with PyOTA again and does the PoW one bundle after the
+other. Here bundles are parsed once into :py:class:`PreparedBundle`
+objects, which can be kept and passed in again on the next attempt,
+and the PoW is spread over a pool of worker threads::
+
+    prepared = prepare_bundles(stuck_bundles)
+
+    attached = reattach_bundles(
+        prepared,
+        lambda: api.get_transactions_to_approve(depth=3),
+        mwm=14,
+        share_tips=10,
+    )
+
+Zero-value promotion transactions are built by :py:func:`promote`.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from threading import Lock
+
+from iota import Address, ProposedBundle, ProposedTransaction, Tag, \
+    TransactionHash, TransactionTrytes
+from iota.exceptions import with_context
+
+from pow import transaction
+from pow.backends import get_backend
+from pow.ccurl_interface import attach_transaction_view, run_jobs
+
+class PreparedBundle(object):
+    """
+    A bundle parsed once for (re)attachment, kept in a
+    :py:class:`pow.transaction.BundleBuffer`.
+    """
+    __slots__ = ('buffer',)
+
+    def __init__(self, bundle_trytes):
+        """
+        :param bundle_trytes:
+            The transaction trytes of one bundle, in any order.
+
+        :raises ValueError:
+            If the bundle is empty, incomplete or mixes bundles.
+        """
+        self.buffer = transaction.BundleBuffer(bundle_trytes)
+
+    def __len__(self):
+        return len(self.buffer)
+
+    @property
+    def transactions(self):
+        """
+        The transaction trytes, head first.
+        """
+        return tuple(txn.trytes for txn in self.buffer.head_first())
+
+    @property
+    def bundle_hash(self):
+        return self.buffer[0].bundle_hash
+
+    def attach(self, trunk_transaction_hash, branch_transaction_hash,
+                mwm=14, backend=None, cancel_token=None):
+        """
+        Does the PoW of the bundle for the given tips. The prepared
+        bundle itself is not modified.
+
+        :returns:
+            The attached bundle as a list of TransactionTrytes, head
+            (highest `current_index`) first, like
+            :py:func:`attach_to_tangle` returns.
+        """
+        pow_backend = get_backend(backend)
+
+        bundle = self.buffer.copy()
+        previoustx = None
+        for txn in bundle.head_first():
+            previoustx = attach_transaction_view(
+                txn,
+                previoustx,
+                trunk_transaction_hash,
+                branch_transaction_hash,
+                mwm,
+                pow_backend,
+                cancel_token,
+            )
+
+        return [
+            TransactionTrytes(trytes) for trytes in bundle.as_tryte_strings()
+        ]
+
+def prepare_bundles(bundles):
+    """
+    Parses bundles into :py:class:`PreparedBundle` objects. Bundles
+    that are prepared already are passed through.
+    """
+    return [
+        bundle if isinstance(bundle, PreparedBundle)
+            else PreparedBundle(bundle)
+        for bundle in bundles
+    ]
+
+def promotion_bundle(address=None, tag=None):
+    """
+    Builds a zero-value, single transaction bundle to promote with.
+
+    Its content doesn't depend on the promoted transaction (that is
+    only referenced as trunk at attachment), so one bundle can be used
+    for any number of promotions.
+    """
+    bundle = ProposedBundle([
+        ProposedTransaction(
+            address=Address(address or b''),
+            tag=Tag(tag or b''),
+            value=0,
+        ),
+    ])
+    bundle.finalize()
+    return PreparedBundle(bundle.as_tryte_strings())
+
+def _as_tip_pair(tips):
+    """
+    Accepts a ``(trunk, branch)`` tuple, or the response of PyOTA's
+    ``get_transactions_to_approve``.
+    """
+    if isinstance(tips, dict):
+        return tips['trunkTransaction'], tips['branchTransaction']
+    trunk, branch = tips
+    return trunk, branch
+
+class _SharedTips(object):
+    """
+    Hands out tip pairs from `tip_provider`, each one to `share`
+    bundles. The provider is called from the worker threads right
+    before the PoW, so tips are as fresh as they can be.
+    """
+    def __init__(self, tip_provider, share):
+        if share < 1:
+            raise with_context(
+                exc=ValueError('share_tips must be at least 1.'),
+
+                context={
+                    'share_tips': share,
+                },
+            )
+
+        if callable(tip_provider):
+            self.provider = tip_provider
+        else:
+            # Fixed tips for every bundle
+            tips = _as_tip_pair(tip_provider)
+            self.provider = lambda: tips
+
+        self.share = share
+        self.tips = None
+        self.uses = 0
+        self._lock = Lock()
+
+    def get(self):
+        with self._lock:
+            if self.uses == 0:
+                self.tips = _as_tip_pair(self.provider())
+            self.uses = (self.uses + 1) % self.share
+            return self.tips
+
+def _reattach(prepared, tips, mwm, pow_backend, cancel_token):
+    trunk, branch = tips.get()
+    return prepared.attach(trunk, branch, mwm, pow_backend, cancel_token)
+
+def reattach_bundles(bundles, # Iterable of bundles or PreparedBundles
+                        tip_provider, # Callable or Tuple
+                        mwm=14, # Int
+                        share_tips=1, # Int
+                        workers=None, # Int
+                        executor=None, # Executor
+                        ordered=True, # Bool
+                        backend=None, # PowBackend or str
+                        cancel_token=None): # CancelToken
+    """
+    Reattaches many bundles to new tips, on a pool of worker threads.
+
+    :param bundles:
+        Iterable of bundles, each one either a list of transaction
+        trytes or a :py:class:`PreparedBundle`. Pass the prepared
+        bundles in again for the next attempt to skip parsing.
+
+    :param tip_provider:
+        Callable returning a ``(trunk, branch)`` tuple or a
+        ``get_transactions_to_approve`` response, e.g.
+        ``lambda: api.get_transactions_to_approve(depth=3)``. It is
+        called from the worker threads, one call at a time. A plain
+        tuple attaches every bundle to the same tips.
+
+    :param mwm:
+        Minimum Weight Magnitude to be used during the PoW.
+
+    :param share_tips:
+        Number of bundles attached to each tip pair, to save calls to
+        the node.
+
+    :param workers:
+        Number of worker threads. Defaults to the number of CPUs.
+        Ignored if `executor` is supplied.
+
+    :param executor:
+        Optional thread based :py:class:`concurrent.futures.Executor`.
+
+    :param ordered:
+        If True, returns the results in input order. If False, returns
+        an iterator of ``(index, bundle_trytes)`` tuples, yielded as
+        each bundle is finished.
+
+    :param backend:
+        PoW backend to use, name or instance, see
+        :py:mod:`pow.backends`.
+
+    :param cancel_token:
+        Optional :py:class:`pow.cancel.CancelToken`, stopping every
+        bundle not finished yet.
+
+    :raises ValueError:
+        If a bundle is inconsistent. All bundles are checked before any
+        PoW is done.
+
+    :returns:
+        List of attached bundles (each a list of TransactionTrytes), or
+        an iterator of ``(index, bundle_trytes)`` if `ordered` is False.
+    """
+    prepared = prepare_bundles(bundles)
+    tips = _SharedTips(tip_provider, share_tips)
+    pow_backend = get_backend(backend)
+
+    return run_jobs(
+        [
+            (_reattach, (bundle, tips, mwm, pow_backend, cancel_token))
+            for bundle in prepared
+        ],
+        workers,
+        executor,
+        ordered,
+    )
+
+def _promote(tail_hash, bundle, tips, mwm, pow_backend, cancel_token):
+    _, branch = tips.get()
+    return bundle.attach(tail_hash, branch, mwm, pow_backend, cancel_token)
+
+def promote(tail_hashes, # Iterable[TransactionHash]
+            tip_provider, # Callable or Tuple
+            mwm=14, # Int
+            share_tips=1, # Int
+            address=None, # Address
+            tag=None, # Tag
+            workers=None, # Int
+            executor=None, # Executor
+            ordered=True, # Bool
+            backend=None, # PowBackend or str
+            cancel_token=None): # CancelToken
+    """
+    Promotes many transactions: attaches a zero-value transaction for
+    every tail, with the tail as trunk and the branch of a tip pair
+    from `tip_provider`.
+
+    The promotion bundle is built once and reused for every tail.
+
+    :param tail_hashes:
+        Hashes of the tail transactions to promote.
+
+    :param address:
+        Address of the promotion transactions, all 9s by default.
+
+    :param tag:
+        Tag of the promotion transactions, empty by default.
+
+    The other parameters are the same as for
+    :py:func:`reattach_bundles`.
+
+    :returns:
+        List of promotion bundles (each a one element list of
+        TransactionTrytes), or an iterator of ``(index, bundle_trytes)``
+        if `ordered` is False.
+    """
+    tail_hashes = [TransactionHash(tail) for tail in tail_hashes]
+    bundle = promotion_bundle(address, tag)
+    tips = _SharedTips(tip_provider, share_tips)
+    pow_backend = get_backend(backend)
+
+    return run_jobs(
+        [
+            (_promote, (tail, bundle, tips, mwm, pow_backend, cancel_token))
+            for tail in tail_hashes
+        ],
+        workers,
+        executor,
+        ordered,
+    )
@@ -0,0 +1,315 @@
+"""
+PoW job scheduler for hosts shared by many callers.
+
+Jobs are split into steps at transaction boundaries. Workers pick the
+next step every time, so a small urgent payment waits for at most one
+transaction of a large bulk bundle, not for the whole bundle::
+
+    with PowScheduler(workers=4, tenant_weights={'wallet': 3}) as scheduler:
+        future = scheduler.submit(
+            bundle_trytes, trunk, branch, 14,
+            priority=PRIORITY_INTERACTIVE,
+            tenant='wallet',
+        )
+        trytes = future.result()
+
+Steps are picked by priority class first. Within a class, tenants share
+the workers in proportion to their weights (weighted fair queuing on the
+expected number of hashes, ``3^mwm`` per transaction).
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import time
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing import cpu_count
+from threading import Condition, Thread
+
+from iota import TransactionTrytes
+from iota.exceptions import with_context
+
+from pow import ccurl_interface, transaction
+from pow.backends import get_backend
+from pow.estimate import HashRateEstimator
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2
+
+class SchedulerFull(ValueError):
+    """
+    Raised by :py:meth:`PowScheduler.submit` when admitting the job
+    would push the estimated backlog over the limit.
+    """
+
+class _Job(object):
+    def __init__(self, future, steps, n_txs, mwm, priority, tenant):
+        self.future = future
+        self.steps = steps
+        self.mwm = mwm
+        self.priority = priority
+        self.tenant = tenant
+        self.remaining = n_txs * (3 ** mwm)
+        self.running = False
+        self.result = None
+
+class PowScheduler(object):
+    """
+    Runs PoW jobs on a pool of worker threads, with priority classes,
+    weighted fair sharing between tenants and admission control.
+    """
+    def __init__(self, workers=None, backend=None, tenant_weights=None,
+                    max_backlog_seconds=None, estimator=None):
+        """
+        :param workers:
+            Number of worker threads. Defaults to the number of CPUs.
+
+        :param backend:
+            PoW backend to use, name or instance, see
+            :py:mod:`pow.backends`.
+
+        :param tenant_weights:
+            Dict of tenant name to weight. Tenants not listed weigh 1.
+
+        :param max_backlog_seconds:
+            Jobs are rejected with :py:class:`SchedulerFull` if the
+            estimated time to finish them, together with every queued
+            job of the same or a higher priority, exceeds this. None
+            admits everything.
+
+        :param estimator:
+            :py:class:`HashRateEstimator` to use, e.g. one shared by
+            several schedulers.
+        """
+        self.workers = workers or cpu_count()
+        self.backend = get_backend(backend)
+        self.tenant_weights = dict(tenant_weights or {})
+        self.max_backlog_seconds = max_backlog_seconds
+        self.estimator = estimator or HashRateEstimator()
+
+        self._condition = Condition()
+        # priority -> tenant -> deque of jobs
+        self._queues = {}
+        # tenant -> virtual time, i.e. hashes served divided by weight.
+        # Only tenants with queued jobs have an entry.
+        self._virtual_time = {}
+        # Virtual time of the step started last. Tenants start from here
+        # when they (re)appear.
+        self._virtual_clock = 0
+        self._shutdown = False
+
+        self._threads = []
+        for _ in range(self.workers):
+            thread = Thread(target=self._work)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, bundle_trytes, trunk_transaction_hash,
+                branch_transaction_hash, mwm=14,
+                priority=PRIORITY_NORMAL, tenant='default'):
+        """
+        Schedules :py:func:`pow.ccurl_interface.attach_to_tangle` of a
+        bundle.
+
+        :raises SchedulerFull:
+            If the job isn't admitted.
+
+        :returns:
+            :py:class:`concurrent.futures.Future` resolving to the
+            attached bundle trytes.
+        """
+        bundle_trytes = list(bundle_trytes)
+        future = Future()
+        job = _Job(future, None, len(bundle_trytes), mwm, priority, tenant)
+        job.steps = self._bundle_steps(
+            job,
+            bundle_trytes,
+            trunk_transaction_hash,
+            branch_transaction_hash,
+            mwm,
+        )
+        self._enqueue(job)
+        return future
+
+    def submit_transaction(self, trytes, mwm=14, priority=PRIORITY_NORMAL,
+                            tenant='default'):
+        """
+        Schedules the PoW of a single transaction, like
+        :py:func:`pow.ccurl_interface.get_powed_tx_trytes`.
+
+        :returns:
+            :py:class:`concurrent.futures.Future` resolving to the
+            powed transaction trytes.
+        """
+        future = Future()
+        job = _Job(future, None, 1, mwm, priority, tenant)
+        job.steps = self._transaction_steps(job, trytes, mwm)
+        self._enqueue(job)
+        return future
+
+    def backlog_seconds(self, priority=PRIORITY_BULK):
+        """
+        Returns the estimated time to finish every queued job of
+        `priority` or higher.
+        """
+        with self._condition:
+            return self._backlog_seconds(priority)
+
+    def shutdown(self, wait=True):
+        """
+        Stops accepting jobs. Queued jobs are still finished.
+        """
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+    def _bundle_steps(self, job, bundle_trytes, trunk_transaction_hash,
+                        branch_transaction_hash, mwm):
+        bundle = transaction.BundleBuffer(bundle_trytes)
+
+        previoustx = None
+
+        # Head transaction first, one step per transaction. The result
+        # is set in the last step.
+        for txn in bundle.head_first():
+            previoustx = ccurl_interface.attach_transaction_view(
+                txn,
+                previoustx,
+                trunk_transaction_hash,
+                branch_transaction_hash,
+                mwm,
+                self.backend,
+            )
+            if txn.current_index == 0:
+                job.result = [
+                    TransactionTrytes(trytes)
+                    for trytes in bundle.as_tryte_strings()
+                ]
+            yield
+
+    def _transaction_steps(self, job, trytes, mwm):
+        job.result = ccurl_interface._pow_transaction(
+            trytes, mwm, self.backend)
+        yield
+
+    def _backlog_seconds(self, priority):
+        hashes = sum(
+            job.remaining
+            for job_priority, tenants in self._queues.items()
+            if job_priority <= priority
+            for jobs in tenants.values()
+            for job in jobs
+        )
+        return hashes / (self.estimator.rate * self.workers)
+
+    def _enqueue(self, job):
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError('Scheduler has been shut down.')
+
+            if self.max_backlog_seconds is not None:
+                backlog = self._backlog_seconds(job.priority)
+                cost = job.remaining / (self.estimator.rate * self.workers)
+                if backlog + cost > self.max_backlog_seconds:
+                    raise with_context(
+                        exc=SchedulerFull(
+                            'PoW backlog would exceed {limit} seconds.'.format(
+                                limit=self.max_backlog_seconds,
+                            ),
+                        ),
+
+                        context={
+                            'backlog_seconds': backlog,
+                            'job_seconds': cost,
+                        },
+                    )
+
+            if job.tenant not in self._virtual_time:
+                # A tenant coming back doesn't get credit for the time
+                # it was idle.
+                self._virtual_time[job.tenant] = self._virtual_clock
+
+            tenants = self._queues.setdefault(job.priority, {})
+            tenants.setdefault(job.tenant, deque()).append(job)
+            self._condition.notify()
+
+    def _next_job(self):
+        """
+        Picks the job to run a step of. Caller holds the condition.
+        """
+        for priority in sorted(self._queues):
+            candidates = [
+                (self._virtual_time[tenant], tenant, job)
+                for tenant, jobs in self._queues[priority].items()
+                for job in [next((j for j in jobs if not j.running), None)]
+                if job is not None
+            ]
+            if candidates:
+                return min(candidates, key=lambda c: c[0])[2]
+        return None
+
+    def _remove(self, job):
+        jobs = self._queues[job.priority][job.tenant]
+        jobs.remove(job)
+        if not jobs:
+            del self._queues[job.priority][job.tenant]
+        if not self._queues[job.priority]:
+            del self._queues[job.priority]
+        if not any(
+                job.tenant in tenants for tenants in self._queues.values()):
+            # Idle tenants are forgotten, they restart from the clock
+            del self._virtual_time[job.tenant]
+
+    def _work(self):
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None:
+                    if self._shutdown and not self._queues:
+                        self._condition.notify_all()
+                        return
+                    self._condition.wait()
+                    job = self._next_job()
+
+                job.running = True
+                self._virtual_clock = max(
+                    self._virtual_clock, self._virtual_time[job.tenant])
+
+            if job.future.running() or job.future.set_running_or_notify_cancel():
+                step_cost = 3 ** job.mwm
+                started = time.time()
+                try:
+                    next(job.steps)
+                except Exception as e:
+                    done = True
+                    job.future.set_exception(e)
+                else:
+                    self.estimator.update(step_cost, time.time() - started)
+                    done = job.result is not None
+                    if done:
+                        job.future.set_result(job.result)
+            else:
+                # Cancelled before it started
+                step_cost = 0
+                done = True
+
+            with self._condition:
+                job.running = False
+                job.remaining = max(0, job.remaining - step_cost)
+                self._virtual_time[job.tenant] += (
+                    step_cost / self.tenant_weights.get(job.tenant, 1))
+                if done:
+                    self._remove(job)
+                self._condition.notify_all()
@@ -0,0 +1,339 @@
+"""
+Local PoW server speaking the ``attachToTangle`` command of the node
+API.
+
+Start it with::
+
+    python -m pow.server --port 14265 --workers 4
+
+and send ``attachToTangle`` to it, e.g. from PyOTA::
+
+    from iota import Iota
+    from iota.adapter.wrappers import RoutingWrapper
+
+    api = Iota(
+        RoutingWrapper('https://nodes.example.org:443')
+            .add_route('attachToTangle', 'http://localhost:14265'),
+    )
+
+Besides ``POST /`` the server answers ``GET /health`` (JSON) and
+``GET /metrics`` (Prometheus text format).
+
+Requests run on a :py:class:`pow.engine.PowEngine`, set up before the
+first request comes in. At most ``workers + max_queue`` bundles are
+accepted at once, any more are rejected right away with status 503, so
+that clients can retry against another server instead of piling up.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import argparse
+import json
+import logging
+import time
+from threading import Lock, Thread
+
+from iota import TransactionHash
+from six.moves import BaseHTTPServer, socketserver
+
+from pow import metrics
+from pow.engine import PowEngine
+
+# Largest request body accepted, in bytes. A bundle of 1000
+# transactions is about 2.7 MB.
+MAX_BODY_SIZE = 8 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+class PowServer(object):
+    """
+    Threaded HTTP server in front of a :py:class:`pow.engine.PowEngine`.
+
+    Usage::
+
+        with PowServer(port=14265, workers=4) as server:
+            server.serve_forever()
+    """
+    def __init__(self, host='127.0.0.1', port=14265, workers=None,
+                    max_queue=None, backend=None, max_mwm=None):
+        """
+        :param host:
+            Address to listen on.
+
+        :param port:
+            Port to listen on, 0 picks a free one (see `address`).
+
+        :param workers:
+            Number of bundles powed at once. Defaults to the number of
+            CPUs.
+
+        :param max_queue:
+            Number of bundles waiting for a worker before requests are
+            rejected with 503. Defaults to ``4 * workers``.
+
+        :param backend:
+            PoW backend to use, name or instance, see
+            :py:mod:`pow.backends`.
+
+        :param max_mwm:
+            Highest Minimum Weight Magnitude accepted, or None.
+        """
+        self.engine = PowEngine(workers, backend)
+        self.backend = self.engine.backend
+        self.max_mwm = max_mwm
+        self.max_pending = self.engine.workers + (
+            4 * self.engine.workers if max_queue is None else max_queue
+        )
+
+        self.metrics = metrics.MetricsAggregator()
+        metrics.register_observer(self.metrics)
+
+        self._lock = Lock()
+        self._pending = 0
+        self._counters = {
+            'completed': 0,
+            'failed': 0,
+            'rejected': 0,
+        }
+        self._thread = None
+
+        self.httpd = _HTTPServer((host, port), _RequestHandler)
+        self.httpd.pow_server = self
+
+    @property
+    def address(self):
+        """
+        ``(host, port)`` the server listens on.
+        """
+        return self.httpd.server_address
+
+    def serve_forever(self):
+        """
+        Handles requests until :py:meth:`shutdown` is called.
+        """
+        self.httpd.serve_forever()
+
+    def start(self):
+        """
+        Handles requests in a background thread.
+        """
+        self._thread = Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def shutdown(self):
+        """
+        Stops the server. Bundles already being powed are finished.
+        """
+        if self._thread is not None:
+            self.httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.httpd.server_close()
+        self.engine.shutdown()
+        metrics.unregister_observer(self.metrics)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+    def health(self):
+        """
+        Returns the state of the server, as served on ``/health``.
+        """
+        with self._lock:
+            result = dict(self._counters)
+            result.update({
+                'status': 'ok',
+                'workers': self.engine.workers,
+                'pending': self._pending,
+                'max_pending': self.max_pending,
+            })
+            return result
+
+    def prometheus(self):
+        """
+        Returns the metrics served on ``/metrics``.
+        """
+        health = self.health()
+        lines = []
+        for name, type_, help_, value in (
+            ('requests_completed_total', 'counter',
+                'Bundles attached.', health['completed']),
+            ('requests_failed_total', 'counter',
+                'Requests that failed.', health['failed']),
+            ('requests_rejected_total', 'counter',
+                'Requests rejected because the queue was full.',
+                health['rejected']),
+            ('requests_pending', 'gauge',
+                'Bundles being powed or waiting for a worker.',
+                health['pending']),
+        ):
+            name = 'pyota_pow_server_' + name
+            lines.append('# HELP {0} {1}'.format(name, help_))
+            lines.append('# TYPE {0} {1}'.format(name, type_))
+            lines.append('{0} {1}'.format(name, value))
+
+        return '\n'.join(lines) + '\n' + self.metrics.to_prometheus()
+
+    def handle_command(self, payload):
+        """
+        Executes an API command.
+
+        :returns:
+            Tuple of HTTP status and response body (dict).
+        """
+        command = payload.get('command')
+        if command != 'attachToTangle':
+            return 400, {
+                'error': 'Command [{0}] is unknown'.format(command),
+            }
+
+        try:
+            trunk = TransactionHash(payload['trunkTransaction'])
+            branch = TransactionHash(payload['branchTransaction'])
+            mwm = payload['minWeightMagnitude']
+            bundle_trytes = payload['trytes']
+        except KeyError as e:
+            return 400, {'error': 'Missing parameter {0}.'.format(e)}
+        except ValueError as e:
+            return 400, {'error': 'Invalid parameter: {0}'.format(e)}
+
+        if (not isinstance(mwm, int) or isinstance(mwm, bool) or mwm < 1
+                or (self.max_mwm is not None and mwm > self.max_mwm)):
+            return 400, {'error': 'Invalid minWeightMagnitude.'}
+
+        if not isinstance(bundle_trytes, list) or not bundle_trytes:
+            return 400, {'error': 'Invalid trytes.'}
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._counters['rejected'] += 1
+                return 503, {'error': 'PoW queue is full, retry later.'}
+            self._pending += 1
+
+        try:
+            future = self.engine.submit_bundle(
+                bundle_trytes,
+                trunk,
+                branch,
+                mwm,
+                self.backend,
+            )
+            powed = future.result()
+        except ValueError as e:
+            status, body = 400, {'error': '{0}'.format(e)}
+        except Exception as e:
+            logger.exception('attachToTangle failed')
+            status, body = 500, {'error': '{0}'.format(e)}
+        else:
+            status, body = 200, {
+                'trytes': ['{0}'.format(trytes) for trytes in powed],
+            }
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+        with self._lock:
+            self._counters['completed' if status == 200 else 'failed'] += 1
+
+        return status, body
+
+
+class _HTTPServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _RequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    def do_GET(self):
+        pow_server = self.server.pow_server
+
+        if self.path == '/health':
+            self._send_json(200, pow_server.health())
+        elif self.path == '/metrics':
+            self._send(
+                200,
+                pow_server.prometheus().encode('utf-8'),
+                'text/plain; version=0.0.4',
+            )
+        else:
+            self._send_json(404, {'error': 'Not found.'})
+
+    def do_POST(self):
+        start = time.time()
+
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+
+        if length < 0 or length > MAX_BODY_SIZE:
+            self._send_json(413, {'error': 'Request too large.'})
+            return
+
+        try:
+            payload = json.loads(self.rfile.read(length).decode('utf-8'))
+        except ValueError:
+            payload = None
+
+        if not isinstance(payload, dict):
+            self._send_json(400, {'error': 'Invalid JSON request.'})
+            return
+
+        status, body = self.server.pow_server.handle_command(payload)
+        body['duration'] = int((time.time() - start) * 1000)
+        self._send_json(status, body)
+
+    def _send_json(self, status, body):
+        self._send(
+            status,
+            json.dumps(body).encode('utf-8'),
+            'application/json',
+        )
+
+    def _send(self, status, content, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        if status == 503:
+            self.send_header('Retry-After', '1')
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        logger.debug('%s - %s', self.address_string(), format % args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PyOTA-PoW server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=14265)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--max-queue', type=int, default=None)
+    parser.add_argument('--backend', default=None)
+    parser.add_argument('--max-mwm', type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    with PowServer(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        max_queue=args.max_queue,
+        backend=args.backend,
+        max_mwm=args.max_mwm,
+    ) as server:
+        logger.info('Listening on {0}:{1}'.format(*server.address))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,328 @@
+"""
+Field layout of raw transaction trytes.
+
+Lets the attach path read and patch the few fields it cares about
+directly in the tryte string, without parsing (and hashing) a PyOTA
+:py:class:`iota.Transaction`. :py:class:`BundleBuffer` keeps a whole
+bundle in one ``bytearray``, with :py:class:`TransactionView` objects
+to access single transactions.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from iota.exceptions import with_context
+
+TRYTE_ALPHABET = '9ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+TRANSACTION_LENGTH = 2673
+
+# (offset, length) of every field, in trytes
+SIGNATURE_MESSAGE_FRAGMENT = (0, 2187)
+ADDRESS = (2187, 81)
+VALUE = (2268, 27)
+LEGACY_TAG = (2295, 27)
+TIMESTAMP = (2322, 9)
+CURRENT_INDEX = (2331, 9)
+LAST_INDEX = (2340, 9)
+BUNDLE_HASH = (2349, 81)
+TRUNK_TRANSACTION_HASH = (2430, 81)
+BRANCH_TRANSACTION_HASH = (2511, 81)
+TAG = (2592, 27)
+ATTACHMENT_TIMESTAMP = (2619, 9)
+ATTACHMENT_TIMESTAMP_LOWER_BOUND = (2628, 9)
+ATTACHMENT_TIMESTAMP_UPPER_BOUND = (2637, 9)
+NONCE = (2646, 27)
+
+_TRYTE_VALUES = {
+    tryte: value if value <= 13 else value - 27
+    for value, tryte in enumerate(TRYTE_ALPHABET)
+}
+
+def int_to_trytes(value, length):
+    """
+    Encodes an integer in `length` trytes of balanced ternary, least
+    significant tryte first, as PyOTA does.
+    """
+    value = int(value)
+    trytes = []
+    for _ in range(length):
+        digit = value % 27
+        if digit > 13:
+            digit -= 27
+        trytes.append(TRYTE_ALPHABET[digit % 27])
+        value = (value - digit) // 27
+
+    if value:
+        raise with_context(
+            exc=ValueError('Value does not fit in {length} trytes.'.format(
+                length=length,
+            )),
+
+            context={
+                'length': length,
+            },
+        )
+
+    return ''.join(trytes)
+
+def trytes_to_int(trytes):
+    """
+    Decodes balanced ternary trytes, least significant tryte first.
+    """
+    value = 0
+    for tryte in reversed(trytes):
+        value = value * 27 + _TRYTE_VALUES[tryte]
+    return value
+
+def get_field(trytes, field):
+    """
+    Returns the trytes of a field, e.g. ``get_field(trytes, ADDRESS)``.
+    """
+    offset, length = field
+    return trytes[offset:offset + length]
+
+def get_int_field(trytes, field):
+    """
+    Returns the value of a numeric field.
+    """
+    return trytes_to_int(get_field(trytes, field))
+
+def set_fields(trytes, values):
+    """
+    Returns a copy of `trytes` with fields replaced.
+
+    :param values:
+        Dict of field to its new trytes (unicode string of the field's
+        length).
+    """
+    parts = []
+    position = 0
+    for (offset, length), value in sorted(values.items()):
+        if len(value) != length:
+            raise with_context(
+                exc=ValueError('Field must be {length} trytes long.'.format(
+                    length=length,
+                )),
+
+                context={
+                    'offset': offset,
+                    'value': value,
+                },
+            )
+        parts.append(trytes[position:offset])
+        parts.append(value)
+        position = offset + length
+    parts.append(trytes[position:])
+    return ''.join(parts)
+
+def _as_ascii(trytes):
+    """
+    Returns trytes as ASCII bytes, for writing into a buffer.
+    """
+    if isinstance(trytes, (bytes, bytearray, memoryview)):
+        return trytes
+    return '{0}'.format(trytes).encode('ascii')
+
+def _check_length(trytes, offset, length):
+    if len(trytes) != length:
+        raise with_context(
+            exc=ValueError('Field must be {length} trytes long.'.format(
+                length=length,
+            )),
+
+            context={
+                'offset': offset,
+                'value': trytes,
+            },
+        )
+
+def _field_property(field, numeric=False):
+    if numeric:
+        return property(
+            lambda self: self.get_int_field(field),
+            lambda self, value: self.set_field(
+                field, int_to_trytes(value, field[1])),
+        )
+    return property(
+        lambda self: self.get_field(field),
+        lambda self, value: self.set_field(field, value),
+    )
+
+class TransactionView(object):
+    """
+    One transaction inside a buffer of ASCII trytes (a ``bytearray``),
+    e.g. a slot of a :py:class:`BundleBuffer`.
+
+    Fields are read and written straight in the buffer; nothing is
+    parsed or allocated until a field is accessed. Text fields are
+    unicode strings, numeric fields ints.
+    """
+    __slots__ = ('buffer', 'offset')
+
+    def __init__(self, buffer, offset=0):
+        """
+        :param buffer:
+            ``bytearray`` holding the transaction at `offset`.
+        """
+        self.buffer = buffer
+        self.offset = offset
+
+    def get_field(self, field):
+        start = self.offset + field[0]
+        return self.buffer[start:start + field[1]].decode('ascii')
+
+    def get_int_field(self, field):
+        return trytes_to_int(self.get_field(field))
+
+    def set_field(self, field, trytes):
+        """
+        Overwrites a field with `trytes` (unicode string or ASCII bytes
+        of the field's length).
+        """
+        offset, length = field
+        _check_length(trytes, offset, length)
+        start = self.offset + offset
+        self.buffer[start:start + length] = _as_ascii(trytes)
+
+    @property
+    def trytes(self):
+        """
+        All trytes of the transaction, as a unicode string.
+        """
+        return self.get_field((0, TRANSACTION_LENGTH))
+
+    @trytes.setter
+    def trytes(self, trytes):
+        self.set_field((0, TRANSACTION_LENGTH), trytes)
+
+    address = _field_property(ADDRESS)
+    current_index = _field_property(CURRENT_INDEX, numeric=True)
+    last_index = _field_property(LAST_INDEX, numeric=True)
+    bundle_hash = _field_property(BUNDLE_HASH)
+    trunk_transaction_hash = _field_property(TRUNK_TRANSACTION_HASH)
+    branch_transaction_hash = _field_property(BRANCH_TRANSACTION_HASH)
+    attachment_timestamp = _field_property(ATTACHMENT_TIMESTAMP, numeric=True)
+    attachment_timestamp_lower_bound = _field_property(
+        ATTACHMENT_TIMESTAMP_LOWER_BOUND, numeric=True)
+    attachment_timestamp_upper_bound = _field_property(
+        ATTACHMENT_TIMESTAMP_UPPER_BOUND, numeric=True)
+    nonce = _field_property(NONCE)
+
+class BundleBuffer(object):
+    """
+    The transactions of one bundle in a single ``bytearray``, slot `i`
+    holding the transaction with ``current_index == i``.
+
+    Takes about 2.7 kB per transaction, instead of the dozens of
+    objects of a PyOTA :py:class:`iota.Bundle`. PyOTA objects are
+    only built at the API boundary, from :py:meth:`as_tryte_strings`.
+    """
+    __slots__ = ('buffer', 'last_index')
+
+    def __init__(self, bundle_trytes=None):
+        """
+        :param bundle_trytes:
+            Transaction trytes of the bundle, in any order.
+
+        :raises ValueError:
+            If the bundle is empty, incomplete, or has duplicate or
+            inconsistent indices or bundle hashes.
+        """
+        if bundle_trytes is None:
+            # Filled in by `copy()`
+            return
+
+        trytes_list = ['{0}'.format(trytes) for trytes in bundle_trytes]
+        if not trytes_list:
+            raise with_context(
+                exc=ValueError('Bundle is empty.'),
+
+                context={
+                    'bundle_trytes': trytes_list,
+                },
+            )
+
+        for trytes in trytes_list:
+            _check_length(trytes, 0, TRANSACTION_LENGTH)
+
+        self.last_index = len(trytes_list) - 1
+        if get_int_field(trytes_list[0], LAST_INDEX) != self.last_index:
+            raise with_context(
+                exc=ValueError('Bundle is incomplete.'),
+
+                context={
+                    'last_index': get_int_field(trytes_list[0], LAST_INDEX),
+                    'transactions': len(trytes_list),
+                },
+            )
+
+        self.buffer = bytearray(len(trytes_list) * TRANSACTION_LENGTH)
+
+        bundle_hash = None
+        seen = set()
+        for trytes in trytes_list:
+            current_index = get_int_field(trytes, CURRENT_INDEX)
+            last_index = get_int_field(trytes, LAST_INDEX)
+            txn_bundle_hash = get_field(trytes, BUNDLE_HASH)
+            if bundle_hash is None:
+                bundle_hash = txn_bundle_hash
+
+            if (last_index != self.last_index
+                    or txn_bundle_hash != bundle_hash
+                    or not 0 <= current_index <= last_index
+                    or current_index in seen):
+                raise with_context(
+                    exc=ValueError(
+                        'Transaction index is inconsistent in bundle.'),
+
+                    context={
+                        'current_index': current_index,
+                        'last_index': last_index,
+                        'transactions': len(trytes_list),
+                        'bundle_hash': txn_bundle_hash,
+                    },
+                )
+
+            seen.add(current_index)
+            self[current_index].trytes = trytes
+
+    def __len__(self):
+        return self.last_index + 1
+
+    def __getitem__(self, current_index):
+        if not 0 <= current_index <= self.last_index:
+            raise IndexError(current_index)
+        return TransactionView(self.buffer, current_index * TRANSACTION_LENGTH)
+
+    def head_first(self):
+        """
+        Returns views of the transactions in attachment order, head
+        (highest index) first.
+        """
+        return [self[i] for i in range(self.last_index, -1, -1)]
+
+    def copy(self):
+        """
+        Returns a copy with its own buffer, e.g. to attach a bundle
+        again without touching the original.
+        """
+        other = BundleBuffer()
+        other.buffer = bytearray(self.buffer)
+        other.last_index = self.last_index
+        return other
+
+    def as_tryte_strings(self, head_to_tail=False):
+        """
+        Returns the transaction trytes (unicode strings), in the same
+        order as PyOTA's :py:meth:`iota.Bundle.as_tryte_strings`.
+
+        :param head_to_tail:
+            If False (default), highest `current_index` first, the order
+            bundles are broadcast in. If True, ordered by
+            `current_index`.
+        """
+        indices = range(len(self))
+        if not head_to_tail:
+            indices = reversed(indices)
+        return [self[i].trytes for i in indices]
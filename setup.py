@@ -14,7 +14,24 @@ setup(
   package_dir={'pow': 'pow'},
   package_data={'pow': ['libccurl.so']},
 
-  install_requires = ['pyota'],
+  # `pow.async_interface` uses async/await
+  python_requires = '>=3.5',
+
+  install_requires = [
+    'pyota',
+  ],
+
+  extras_require = {
+    # Pure Python fallback backend, and batch hashing. `packbits` needs
+    # `bitorder`, added in 1.17.
+    'numpy': ['numpy >= 1.17'],
+    # Build dependency of the optional `cffi` backend
+    'cffi': ['cffi'],
+  },
+
+  entry_points = {
+    'console_scripts': ['pyota-pow = pow.cli:main'],
+  },
 
   tests_require = ['nose'],
   test_suite    = 'test',
@@ -25,7 +42,6 @@ setup(
   classifiers = [
     'Intended Audience :: Developers',
     'License :: OSI Approved :: MIT License',
-    'Programming Language :: Python :: 2.7',
     'Programming Language :: Python :: 3',
     'Programming Language :: Python :: 3.5',
     'Programming Language :: Python :: 3.6',
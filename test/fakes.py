@@ -0,0 +1,46 @@
+"""
+Fake PoW backend shared by the tests.
+"""
+
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from threading import Event, Lock
+from pow.backends import PowBackend
+
+# Every hash of `FakeBackend`. Not all 9s: PyOTA treats an all-9s
+# TransactionHash as empty, so the next transaction of a bundle would be
+# taken for the head. Its 5 trailing zero trits pass MWM up to 5.
+FAKE_HASH = 'A' * 80 + '9'
+
+
+class FakeBackend(PowBackend):
+    """
+    Returns the trytes as they are, every hash is `FAKE_HASH`.
+
+    The trytes of every search are recorded in `calls`. Searches block
+    while `gate` is clear.
+    """
+    name = 'fake'
+
+    def __init__(self, open_gate=True):
+        self.gate = Event()
+        if open_gate:
+            self.gate.set()
+        self.calls = []
+        self.interrupted = 0
+        self._lock = Lock()
+
+    def pow(self, trytes, mwm):
+        self.gate.wait(5)
+        with self._lock:
+            self.calls.append(trytes)
+        return trytes
+
+    def interrupt(self, exclusive=False, stop=None):
+        with self._lock:
+            self.interrupted += 1
+        return True
+
+    def digest(self, trytes):
+        return FAKE_HASH
@@ -0,0 +1,114 @@
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import asyncio
+from unittest import TestCase
+from iota import Bundle, ProposedBundle, ProposedTransaction, Address, \
+    TransactionHash
+from iota.transaction.validator import BundleValidator
+from pow import async_interface
+
+
+class AttachToTangleAsyncTestcase(TestCase):
+    """
+    Tests for the asyncio variant of attach_to_tangle.
+    """
+    def setUp(self):
+        self.attach = async_interface.attach_to_tangle_async
+
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+        self.trunk = TransactionHash(b'TRUNKTXHASH9TESTVALUEONLY')
+        self.branch = TransactionHash(b'BRANCHTXHASH9TESTVALUEONLY')
+
+    def tearDown(self):
+        self.loop.close()
+
+    def make_bundle(self, tag, size=2):
+        bundle = ProposedBundle([
+            ProposedTransaction(
+                address=Address(tag + (b'9' * (81 - len(tag)))),
+                value=0,
+            )
+            for _ in range(size)
+        ])
+        bundle.finalize()
+        return bundle.as_tryte_strings()
+
+    def assertValid(self, trytes):
+        validator = BundleValidator(Bundle.from_tryte_strings(trytes))
+        self.assertTrue(validator.is_valid(), validator.errors)
+
+    def test_attach(self):
+        """
+        Coroutine returns a valid bundle.
+        """
+        result = self.loop.run_until_complete(
+            self.attach(self.make_bundle(b'ASYNC'), self.trunk, self.branch, 9)
+        )
+        self.assertValid(result)
+
+    def test_concurrent_bundles(self):
+        """
+        Several bundles awaited at once.
+        """
+        bundles = [self.make_bundle(tag) for tag in [b'A', b'B', b'C', b'D']]
+
+        results = self.loop.run_until_complete(asyncio.gather(*[
+            self.attach(trytes, self.trunk, self.branch, 9)
+            for trytes in bundles
+        ]))
+
+        self.assertEqual(len(results), 4)
+        for result in results:
+            self.assertValid(result)
+
+    def test_event_loop_not_blocked(self):
+        """
+        Other callbacks keep running while a bundle is being powed.
+        """
+        ticks = []
+
+        def tick():
+            ticks.append(self.loop.call_later(0.001, tick))
+
+        tick()
+        self.loop.run_until_complete(
+            self.attach(self.make_bundle(b'TICK', 3), self.trunk, self.branch, 12)
+        )
+        ticks[-1].cancel()
+
+        self.assertGreater(len(ticks), 10)
+
+    def test_timeout(self):
+        """
+        Deadline for the whole bundle.
+        """
+        self.assertRaises(
+            asyncio.TimeoutError,
+            self.loop.run_until_complete,
+            self.attach(
+                self.make_bundle(b'SLOW', 5),
+                self.trunk,
+                self.branch,
+                14,
+                timeout=0.001,
+            ),
+        )
+
+    def test_cancel(self):
+        """
+        Cancelling the task stops the bundle.
+        """
+        task = self.loop.create_task(
+            self.attach(self.make_bundle(b'CANCEL', 5), self.trunk,
+                self.branch, 14)
+        )
+        self.loop.call_later(0.001, task.cancel)
+
+        self.assertRaises(
+            asyncio.CancelledError,
+            self.loop.run_until_complete,
+            task,
+        )
@@ -0,0 +1,186 @@
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from unittest import TestCase, skipUnless
+import os
+import shutil
+import tempfile
+from pow import backends, ccurl_interface
+from iota import Bundle, ProposedBundle, ProposedTransaction, Address, Tag, \
+    TransactionHash
+from iota.transaction.validator import BundleValidator
+
+from six import PY2
+
+if PY2:
+    from mock import patch
+else:
+    from unittest.mock import patch
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    from pow import _ccurl_cffi
+except ImportError:
+    _ccurl_cffi = None
+
+
+class BackendRegistryTestcase(TestCase):
+    """
+    Tests for backend lookup.
+    """
+    def test_builtin_backends_registered(self):
+        """
+        The ctypes backend is available wherever the tests run.
+        """
+        self.assertIn('ccurl', backends.available_backends())
+
+    def test_fastest_first(self):
+        """
+        Available backends are ordered by priority.
+        """
+        names = backends.available_backends()
+        priorities = [backends._registry[name].priority for name in names]
+        self.assertEqual(priorities, sorted(priorities, reverse=True))
+
+    def test_get_by_name(self):
+        """
+        Backends are looked up by name and reused.
+        """
+        backend = backends.get_backend('ccurl')
+        self.assertIsInstance(backend, backends.CcurlBackend)
+        self.assertIs(backends.get_backend('ccurl'), backend)
+
+    def test_instance_passthrough(self):
+        """
+        Backend instances are used as-is.
+        """
+        backend = backends.CcurlBackend()
+        self.assertIs(backends.get_backend(backend), backend)
+
+    def test_unknown_backend(self):
+        """
+        Asking for a backend that doesn't exist.
+        """
+        self.assertRaises(ValueError, backends.get_backend, 'quantum')
+
+
+@skipUnless(_ccurl_cffi, 'Needs python pow/_ccurl_cffi_build.py')
+class CffiBackendTestcase(TestCase):
+    """
+    Tests for the cffi backend.
+    """
+    def setUp(self):
+        self.backend = backends.CffiBackend()
+        self.trytes = (
+            ('9' * 2592) + 'CFFI9BACKEND'.ljust(27, '9') + ('9' * 54)
+        )
+
+    def test_pow(self):
+        powed = self.backend.pow(self.trytes, 9)
+
+        self.assertEqual(powed[:2646], self.trytes[:2646])
+        self.assertEqual(
+            self.backend.digest(powed),
+            ccurl_interface.get_hash_trytes(powed),
+        )
+        self.assertGreaterEqual(
+            ccurl_interface.count_trailing_zero_trits(
+                self.backend.digest(powed)
+            ),
+            9,
+        )
+
+    def test_loaded_library(self):
+        """
+        Calls the build `ccurl_interface` loaded, and follows it when
+        another one is loaded.
+        """
+        self.backend.digest(self.trytes)
+        self.assertEqual(self.backend._path, ccurl_interface.loaded_path)
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'libccurl.so')
+        shutil.copy(ccurl_interface.libccurl_path, path)
+
+        self.addCleanup(ccurl_interface.load_library)
+        ccurl_interface.load_library(path)
+        self.backend.digest(self.trytes)
+
+        self.assertEqual(self.backend._path, path)
+
+    def test_needs_ccurl(self):
+        """
+        Not available when the loader can't load a build, e.g. one
+        that fails the self-check.
+        """
+        with patch.object(backends.CcurlBackend, 'is_available',
+                return_value=False):
+            self.assertNotIn('cffi', backends.available_backends())
+
+
+@skipUnless(numpy, 'Needs numpy')
+class NumpyBackendTestcase(TestCase):
+    """
+    Tests for the pure NumPy backend.
+    """
+    def setUp(self):
+        self.backend = backends.get_backend('numpy')
+        self.trytes = (
+            ('9' * 2592) + 'NUMPY9BACKEND'.ljust(27, '9') + ('9' * 54)
+        )
+
+    def test_digest_matches_ccurl(self):
+        """
+        NumPy Curl-P-81 agrees with ccurl.
+        """
+        self.assertEqual(
+            self.backend.digest(self.trytes),
+            ccurl_interface.get_hash_trytes(self.trytes),
+        )
+
+    def test_pow(self):
+        """
+        Nonce found by NumPy is valid.
+        """
+        powed = self.backend.pow(self.trytes, 9)
+
+        self.assertEqual(powed[:2646], self.trytes[:2646])
+        self.assertGreaterEqual(
+            ccurl_interface.count_trailing_zero_trits(
+                ccurl_interface.get_hash_trytes(powed)
+            ),
+            9,
+        )
+
+    def test_attach_to_tangle(self):
+        """
+        Attach a whole bundle without ccurl.
+        """
+        bundle = ProposedBundle([
+            ProposedTransaction(
+                address=Address(b'NUMPY9BACKEND9TEST' + (b'9' * 63)),
+                tag=Tag(b'NUMPY9BACKEND'),
+                value=0,
+            ),
+            ProposedTransaction(
+                address=Address(b'NUMPY9BACKEND9TEST9TWO' + (b'9' * 59)),
+                value=0,
+            ),
+        ])
+        bundle.finalize()
+
+        powed = ccurl_interface.attach_to_tangle(
+            bundle.as_tryte_strings(),
+            TransactionHash(b'TRUNKTXHASH9TESTVALUEONLY'),
+            TransactionHash(b'BRANCHTXHASH9TESTVALUEONLY'),
+            mwm=5,
+            backend='numpy'
+        )
+
+        validator = BundleValidator(Bundle.from_tryte_strings(powed))
+        self.assertTrue(validator.is_valid(), validator.errors)
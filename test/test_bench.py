@@ -0,0 +1,89 @@
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from unittest import TestCase
+from bench.run_benchmarks import compare, percentile
+
+
+class PercentileTestcase(TestCase):
+    """
+    Tests for the nearest-rank percentile of the benchmark suite.
+    """
+    def test_nearest_rank(self):
+        values = [15, 20, 35, 40, 50]
+
+        self.assertEqual(percentile(values, 0.05), 15)
+        self.assertEqual(percentile(values, 0.3), 20)
+        self.assertEqual(percentile(values, 0.4), 20)
+        self.assertEqual(percentile(values, 0.5), 35)
+        self.assertEqual(percentile(values, 1.0), 50)
+
+    def test_exact_ranks(self):
+        """
+        A fraction that lands exactly on a rank picks that rank, whether
+        it is odd or even.
+        """
+        values = list(range(1, 11))
+
+        self.assertEqual(percentile([15, 20, 35, 40, 50], 0.6), 35)
+        self.assertEqual(percentile(values, 0.3), 3)
+        self.assertEqual(percentile(values, 0.7), 7)
+        self.assertEqual(percentile(list(range(1, 101)), 0.99), 99)
+        # 0.07 * 100 is a hair above 7
+        self.assertEqual(percentile(list(range(1, 101)), 0.07), 7)
+
+    def test_bounds(self):
+        self.assertEqual(percentile([3, 1, 2], 0), 1)
+        self.assertEqual(percentile([3, 1, 2], 0.99), 3)
+        self.assertEqual(percentile([7], 0.5), 7)
+
+
+class CompareTestcase(TestCase):
+    """
+    Tests for the regression gate against a baseline.
+    """
+    def results(self, **results):
+        return {'results': results}
+
+    def test_latency(self):
+        baseline = self.results(pow={'p50_ms': 100.0})
+
+        self.assertEqual(
+            compare(self.results(pow={'p50_ms': 119.0}), baseline, 0.2), [])
+        self.assertEqual(
+            compare(self.results(pow={'p50_ms': 130.0}), baseline, 0.2),
+            ['pow: p50 130.00 ms, baseline 100.00 ms (+30%)'],
+        )
+
+    def test_retries(self):
+        baseline = self.results(attach={'p50_ms': 100.0, 'retries': 1})
+
+        self.assertEqual(
+            compare(
+                self.results(attach={'p50_ms': 100.0, 'retries': 1}),
+                baseline,
+                0.2,
+            ),
+            [],
+        )
+        self.assertEqual(
+            compare(
+                self.results(attach={'p50_ms': 100.0, 'retries': 3}),
+                baseline,
+                0.2,
+            ),
+            ['attach: 3 retries, baseline 1'],
+        )
+
+    def test_new_benchmark(self):
+        """
+        Benchmarks missing from the baseline are not gated.
+        """
+        self.assertEqual(
+            compare(
+                self.results(hash={'p50_ms': 5.0}),
+                self.results(pow={'p50_ms': 1.0}),
+                0.2,
+            ),
+            [],
+        )
@@ -0,0 +1,223 @@
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from pow import ccurl_interface
+from pow.cache import PowCache
+from iota import TransactionHash
+
+from six import PY2
+
+if PY2:
+    from mock import MagicMock, patch
+else:
+    from unittest.mock import MagicMock, patch
+
+
+class PowCacheTestcase(TestCase):
+    """
+    Tests for the PoW result cache.
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_key_covers_all_inputs(self):
+        """
+        Changing any input changes the key.
+        """
+        key = PowCache.make_key(['AAA', 'BBB'], 'TRUNK', 'BRANCH', 14)
+
+        self.assertEqual(
+            key,
+            PowCache.make_key(['AAA', 'BBB'], 'TRUNK', 'BRANCH', 14),
+        )
+        self.assertNotEqual(
+            key,
+            PowCache.make_key(['AAA', 'BBC'], 'TRUNK', 'BRANCH', 14),
+        )
+        self.assertNotEqual(
+            key,
+            PowCache.make_key(['AAA', 'BBB'], 'BRANCH', 'TRUNK', 14),
+        )
+        self.assertNotEqual(
+            key,
+            PowCache.make_key(['AAA', 'BBB'], 'TRUNK', 'BRANCH', 9),
+        )
+
+    def test_lru_by_count(self):
+        """
+        Least recently used entry is evicted first.
+        """
+        cache = PowCache(max_entries=2)
+        cache.put('a', ['AAA'])
+        cache.put('b', ['BBB'])
+        cache.get('a')
+        cache.put('c', ['CCC'])
+
+        self.assertEqual(cache.get('a'), ['AAA'])
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), ['CCC'])
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_lru_by_bytes(self):
+        """
+        Total trytes are bounded.
+        """
+        cache = PowCache(max_entries=None, max_bytes=10)
+        cache.put('a', ['AAAA'])
+        cache.put('b', ['BBBB'])
+        cache.put('c', ['CCCC'])
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.stats()['bytes'], 8)
+        self.assertIsNone(cache.get('a'))
+
+    def test_counters(self):
+        """
+        Hits and misses are counted.
+        """
+        cache = PowCache()
+        cache.put('a', ['AAA'])
+        cache.get('a')
+        cache.get('a')
+        cache.get('b')
+
+        stats = cache.stats()
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_disk_tier(self):
+        """
+        Entries survive in the directory, evicted ones are deleted from
+        it.
+        """
+        cache = PowCache(max_entries=1, directory=self.directory)
+        cache.put('a', ['AAA', 'AAB'])
+        cache.put('b', ['BBB'])
+
+        self.assertEqual(os.listdir(self.directory), ['b.trytes'])
+        self.assertIsNone(cache.get('a'))
+
+        # New instance, e.g. after a restart
+        self.assertEqual(
+            PowCache(directory=self.directory).get('b'),
+            ['BBB'],
+        )
+
+    def test_disk_io_unlocked(self):
+        """
+        Files are read and written without holding the lock.
+        """
+        cache = PowCache(directory=self.directory)
+        locked = []
+
+        def check(method):
+            def wrapper(*args):
+                locked.append(cache._lock.locked())
+                return method(*args)
+            return wrapper
+
+        with patch.object(cache, '_write', check(cache._write)), \
+                patch.object(cache, '_read', check(cache._read)):
+            cache.put('a', ['AAA'])
+            cache.get('b')
+
+        self.assertEqual(locked, [False, False])
+
+        # Deleting evicted files, too
+        cache.max_entries = 1
+        with patch('pow.cache.os.remove', check(os.remove)):
+            cache.put('b', ['BBB'])
+
+        self.assertEqual(locked, [False, False, False])
+        self.assertEqual(os.listdir(self.directory), ['b.trytes'])
+
+    def test_directory_trimmed(self):
+        """
+        Files of an earlier run are bounded like the LRU, the newest
+        ones are kept.
+        """
+        cache = PowCache(max_entries=None, directory=self.directory)
+        for i, key in enumerate(['a', 'b', 'c']):
+            cache.put(key, [key.upper() * 3])
+            os.utime(cache._path(key), (1000 + i, 1000 + i))
+
+        cache = PowCache(max_entries=2, directory=self.directory)
+
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            ['b.trytes', 'c.trytes'],
+        )
+        self.assertEqual(len(cache), 2)
+
+        # 'b' is the least recently used
+        cache.put('d', ['DDD'])
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            ['c.trytes', 'd.trytes'],
+        )
+
+    def test_corrupt_file(self):
+        """
+        Truncated or corrupt files count as misses and are deleted.
+        """
+        for key, content in [('a', '12'), ('b', '')]:
+            with open(os.path.join(self.directory, key + '.trytes'), 'w') as f:
+                f.write(content)
+
+        cache = PowCache(directory=self.directory)
+
+        self.assertEqual(os.listdir(self.directory), [])
+
+        # Corrupted while running
+        cache.put('c', ['CCC'])
+        cache._entries.clear()
+        with open(cache._path('c'), 'w') as f:
+            f.write('garbage')
+
+        self.assertIsNone(cache.get('c'))
+        self.assertEqual(cache.stats()['misses'], 1)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_max_age(self):
+        """
+        Results older than `max_age` are powed again.
+        """
+        cache = PowCache(max_age=60)
+
+        with patch('pow.cache.time.time', MagicMock(return_value=1000)):
+            cache.put('a', ['AAA'])
+
+        with patch('pow.cache.time.time', MagicMock(return_value=1030)):
+            self.assertEqual(cache.get('a'), ['AAA'])
+
+        with patch('pow.cache.time.time', MagicMock(return_value=1061)):
+            self.assertIsNone(cache.get('a'))
+
+    def test_attach_to_tangle_hit(self):
+        """
+        Retried attach returns the cached bundle without PoW.
+        """
+        trytes = [
+            ('9' * 2592) + 'CACHE9TEST'.ljust(27, '9') + ('9' * 54)
+        ]
+        trunk = TransactionHash(b'TRUNKTXHASH9TESTVALUEONLY')
+        branch = TransactionHash(b'BRANCHTXHASH9TESTVALUEONLY')
+        cache = PowCache()
+
+        first = ccurl_interface.attach_to_tangle(
+            trytes, trunk, branch, 9, backend='ccurl', cache=cache)
+
+        with patch('pow.ccurl_interface.get_powed_tx_trytes') as mocked:
+            second = ccurl_interface.attach_to_tangle(
+                trytes, trunk, branch, 9, backend='ccurl', cache=cache)
+
+        self.assertFalse(mocked.called)
+        self.assertEqual(second, first)
+        self.assertEqual(cache.stats()['hits'], 1)
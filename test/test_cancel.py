@@ -0,0 +1,260 @@
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import time
+from threading import Event, Thread, Timer
+from unittest import TestCase
+from pow import ccurl_interface, estimate
+from pow.cancel import CancelToken, PowInterrupted, interruptible_pow
+from iota import Address, ProposedBundle, ProposedTransaction, \
+    TransactionHash
+from test.fakes import FakeBackend
+
+from six import PY2
+
+if PY2:
+    from mock import MagicMock, patch
+else:
+    from unittest.mock import MagicMock, patch
+
+
+class BlockingBackend(FakeBackend):
+    """
+    The first `free` searches succeed right away, the others wait to be
+    stopped.
+    """
+    name = 'blocking'
+
+    def __init__(self, free=0):
+        super(BlockingBackend, self).__init__()
+        self.free = free
+
+    def pow_partition(self, trytes, mwm, stop):
+        if self.free > 0:
+            self.free -= 1
+            return trytes
+        stop.wait(5)
+        return None if stop.is_set() else trytes
+
+
+class CancelTokenTestcase(TestCase):
+    """
+    Tests for cancellation and deadlines.
+    """
+    def test_cancel(self):
+        token = CancelToken()
+        calls = []
+        token.add_callback(lambda: calls.append(1))
+
+        self.assertFalse(token.cancelled)
+        token.cancel()
+
+        self.assertTrue(token.cancelled)
+        self.assertFalse(token.deadline_exceeded)
+        self.assertEqual(calls, [1])
+        self.assertRaises(PowInterrupted, token.check)
+
+    def test_deadline(self):
+        token = CancelToken.after(-1)
+
+        self.assertTrue(token.cancelled)
+        self.assertTrue(token.deadline_exceeded)
+        self.assertEqual(token.remaining(), 0)
+
+    def test_parent(self):
+        """
+        Child tokens follow their parent, and the earlier deadline.
+        """
+        parent = CancelToken(deadline=time.time() + 10)
+        child = CancelToken(deadline=time.time() + 100, parent=parent)
+        calls = []
+        child.add_callback(lambda: calls.append(1))
+
+        self.assertLess(child.remaining(), 11)
+
+        parent.cancel()
+
+        self.assertTrue(child.cancelled)
+        self.assertEqual(calls, [1])
+
+    def test_interrupt_running_search(self):
+        """
+        Cancelling stops the search and interrupts the backend.
+        """
+        backend = BlockingBackend()
+        token = CancelToken()
+        Timer(0.05, token.cancel).start()
+
+        started = time.time()
+        self.assertRaises(
+            PowInterrupted,
+            interruptible_pow,
+            backend,
+            '9' * 2673,
+            14,
+            token,
+        )
+
+        self.assertLess(time.time() - started, 2)
+        self.assertEqual(backend.interrupted, 1)
+
+    def test_deadline_running_search(self):
+        backend = BlockingBackend()
+
+        try:
+            interruptible_pow(backend, '9' * 2673, 14, CancelToken.after(0.05))
+        except PowInterrupted as e:
+            self.assertTrue(e.deadline_exceeded)
+        else:
+            self.fail('PowInterrupted not raised')
+
+    def test_attach_partial_progress(self):
+        """
+        The exception lists the transactions finished before the
+        deadline.
+        """
+        bundle = ProposedBundle([
+            ProposedTransaction(
+                address=Address(b'TESTVALUE9DONTUSEINPRODUCTION' + b'9' * 52),
+                value=0,
+            )
+            for _ in range(3)
+        ])
+        bundle.finalize()
+
+        try:
+            ccurl_interface.attach_to_tangle(
+                bundle.as_tryte_strings(),
+                TransactionHash('TRUNKTXHASH9TESTVALUEONLY'),
+                TransactionHash('BRANCHTXHASH9TESTVALUEONLY'),
+                mwm=3,
+                backend=BlockingBackend(free=1),
+                deadline=time.time() + 0.1,
+            )
+        except PowInterrupted as e:
+            self.assertTrue(e.deadline_exceeded)
+            # The head transaction is done
+            self.assertEqual(list(e.finished), [2])
+        else:
+            self.fail('PowInterrupted not raised')
+
+
+class NativeInterruptTestcase(TestCase):
+    """
+    ccurl's interrupt stops whichever search is running.
+    """
+    def test_exclusive(self):
+        """
+        Cancelling one job doesn't interrupt the searches of others.
+        """
+        lib = MagicMock()
+        waiting = Event()
+        done = Event()
+
+        def other_search():
+            waiting.set()
+            with ccurl_interface._native_search():
+                pass
+            done.set()
+
+        with patch.object(ccurl_interface, '_get_libccurl', return_value=lib):
+            with ccurl_interface._native_search():
+                self.assertTrue(ccurl_interface.interrupt_pow(exclusive=True))
+
+                Thread(target=other_search).start()
+                waiting.wait(5)
+                deadline = time.time() + 5
+                while (ccurl_interface._running_searches < 2
+                        and time.time() < deadline):
+                    time.sleep(0.01)
+
+                # The other search waits for its turn
+                self.assertFalse(done.is_set())
+                self.assertFalse(
+                    ccurl_interface.interrupt_pow(exclusive=True))
+                # Still available on request, e.g. for the losing
+                # partitions of a search
+                self.assertTrue(ccurl_interface.interrupt_pow())
+
+            self.assertTrue(done.wait(5))
+
+        self.assertEqual(lib.ccurl_pow_interrupt.call_count, 2)
+        self.assertEqual(ccurl_interface._running_searches, 0)
+
+    def test_owner(self):
+        """
+        A late interrupt, after the caller's search is over, doesn't hit
+        the search of another job.
+        """
+        lib = MagicMock()
+        mine, other = Event(), Event()
+
+        with patch.object(ccurl_interface, '_get_libccurl', return_value=lib):
+            with ccurl_interface._native_search(mine):
+                self.assertTrue(ccurl_interface.interrupt_pow(owner=mine))
+
+            with ccurl_interface._native_search(other):
+                self.assertFalse(ccurl_interface.interrupt_pow(owner=mine))
+
+            self.assertFalse(ccurl_interface.interrupt_pow(owner=mine))
+
+        self.assertEqual(lib.ccurl_pow_interrupt.call_count, 1)
+        self.assertIsNone(ccurl_interface._running_owner)
+
+    def test_cancel_after_search(self):
+        """
+        A job cancelled right after its search finished doesn't
+        interrupt the search of another job, which has started by then.
+        """
+        lib = MagicMock()
+        token = CancelToken()
+        running, release = Event(), Event()
+
+        def other_search():
+            with ccurl_interface._native_search(Event()):
+                running.set()
+                release.wait(5)
+
+        def pow_partition(trytes, mwm, stop):
+            result = ccurl_interface._ccurl_pow(trytes, mwm, stop=stop)
+            Thread(target=other_search).start()
+            running.wait(5)
+            token.cancel()
+            release.set()
+            return result
+
+        backend = MagicMock()
+        backend.pow_partition.side_effect = pow_partition
+        backend.interrupt.side_effect = \
+            lambda exclusive=False, stop=None: \
+                ccurl_interface.interrupt_pow(exclusive, stop)
+
+        with patch.object(ccurl_interface, '_get_libccurl', return_value=lib), \
+                patch.object(ccurl_interface, '_take_result'):
+            self.assertRaises(
+                PowInterrupted,
+                interruptible_pow, backend, b'TRYTES', 9, token,
+            )
+
+        self.assertTrue(backend.interrupt.called)
+        lib.ccurl_pow_interrupt.assert_not_called()
+
+
+class EstimateTestcase(TestCase):
+    """
+    Tests for PoW time estimates.
+    """
+    def test_estimate(self):
+        backend = BlockingBackend()
+        rate = estimate.calibrate(backend, mwm=5, samples=2)
+
+        self.assertGreater(rate, 0)
+        self.assertAlmostEqual(
+            estimate.estimate_pow_time(10, 9, backend),
+            10 * 3 ** 9 / rate,
+        )
+        self.assertAlmostEqual(
+            estimate.estimate_pow_time(20, 10, backend)
+                / estimate.estimate_pow_time(10, 9, backend),
+            6,
+        )
@@ -2,11 +2,16 @@ from __future__ import absolute_import, division, print_function, \
     unicode_literals
 
 from unittest import TestCase
-from pow import ccurl_interface
-from iota import Bundle, TransactionTrytes, TransactionHash
+from pow import ccurl_interface, transaction
+from pow.backends import get_backend
+from pow.parallel import seed_partition
+from iota import Bundle, Transaction, TransactionTrytes, TransactionHash
 from iota.transaction.validator import BundleValidator
 import time
 import copy
+import os
+import subprocess
+import sys
 
 from six import PY2
 
@@ -231,6 +236,15 @@ class CcurlPowTestcase(TestCase):
 
         self.assertTrue(validator.is_valid())
 
+    def test_result_order(self):
+        """
+        The result is head first, like `Bundle.as_tryte_strings()`.
+        """
+        self.assertEqual(
+            self.powed,
+            self.powed_bundle.as_tryte_strings(),
+        )
+
     def test_wrongly_ordered_bundle(self):
         """
         Supply bundle trytes in wrong order.
@@ -298,7 +312,9 @@ class CcurlPowTestcase(TestCase):
                 self.single_tx_bundle.as_tryte_strings(),
                 self.branch,
                 self.trunk,
-                mwm=14
+                mwm=14,
+                # The patched function belongs to the ctypes backend
+                backend='ccurl'
             )
 
     def test_timestamps(self):
@@ -318,4 +334,305 @@ class CcurlPowTestcase(TestCase):
             self.assertEqual(
                 txn.attachment_timestamp_upper_bound,
                 upper_bound
-            )
\ No newline at end of file
+            )
+
+    def test_attach_bundles_ordered(self):
+        """
+        Attach several bundles in parallel, results in input order.
+        """
+        bundles = [
+            self.bundle.as_tryte_strings(),
+            self.single_tx_bundle.as_tryte_strings(),
+        ]
+
+        results = ccurl_interface.attach_bundles_to_tangle(
+            bundles,
+            (self.trunk, self.branch),
+            mwm=9,
+            workers=2
+        )
+
+        self.assertEqual(len(results), 2)
+        for original, result in zip(bundles, results):
+            test_bundle = Bundle.from_tryte_strings(result)
+            self.assertEqual(len(test_bundle), len(original))
+            self.assertTrue(BundleValidator(test_bundle).is_valid())
+
+    def test_attach_bundles_as_completed(self):
+        """
+        Attach several bundles in parallel, results as they complete.
+        """
+        bundles = [self.single_tx_bundle.as_tryte_strings()] * 3
+        tips = [(self.trunk, self.branch)] * 3
+
+        results = dict(ccurl_interface.attach_bundles_to_tangle(
+            bundles,
+            tips,
+            mwm=9,
+            ordered=False
+        ))
+
+        self.assertEqual(sorted(results.keys()), [0, 1, 2])
+
+    def test_attach_bundles_wrong_tips(self):
+        """
+        Number of tip pairs doesn't match number of bundles.
+        """
+        self.assertRaises(
+            ValueError,
+            ccurl_interface.attach_bundles_to_tangle,
+            [self.single_tx_bundle.as_tryte_strings()] * 2,
+            [(self.trunk, self.branch)],
+            mwm=9
+        )
+
+    def test_count_trailing_zero_trits(self):
+        """
+        Trailing zero trits are counted on the hash trytes.
+        """
+        count = ccurl_interface.count_trailing_zero_trits
+
+        self.assertEqual(count('ABC'), 1)  # 'C' = 3 = [0, 1, 0]
+        self.assertEqual(count('AB9'), 4)  # 'B' = 2 = [-1, 1, 0]
+        self.assertEqual(count('XA99'), 8)  # 'A' = 1 = [1, 0, 0]
+        self.assertEqual(count('QE'), 0)  # 'E' = 5 = [-1, -1, 1]
+        self.assertEqual(count('999'), 9)
+
+    def test_native_hash_matches_pyota(self):
+        """
+        Hashes computed by ccurl agree with PyOTA's Curl.
+        """
+        for txn in self.powed_bundle:
+            self.assertEqual(
+                ccurl_interface.get_hash_trytes(
+                    txn.as_tryte_string().__str__()
+                ),
+                txn.hash.__str__()
+            )
+
+    def test_pow_trytes_into_shared_buffer(self):
+        """
+        Powed trytes are written into a preallocated bundle buffer.
+        """
+        trytes = [
+            txn.as_tryte_string().__str__().encode('ascii')
+            for txn in self.bundle
+        ]
+        buffer_ = bytearray(b''.join(trytes))
+        view = memoryview(buffer_)
+
+        for i, original in enumerate(trytes):
+            offset = i * 2673
+            # ccurl misses the nonce of some transactions every time,
+            # those get another start, like `attach_to_tangle` does
+            for attempt in range(5):
+                buffer_[offset:offset + 2673] = seed_partition(
+                    original.decode('ascii'), attempt).encode('ascii')
+                written = ccurl_interface.pow_trytes_into(
+                    view[offset:offset + 2673],
+                    9,
+                    buffer_,
+                    offset
+                )
+                self.assertEqual(written, 2673)
+
+                hash_ = ccurl_interface.hash_trytes(
+                    bytes(buffer_[offset:offset + 2673]))
+                if ccurl_interface.count_trailing_zero_trits(
+                        hash_.decode('ascii')) >= 9:
+                    break
+            else:
+                self.fail('No nonce found for transaction {0}.'.format(i))
+
+            self.assertEqual(len(hash_), 81)
+            self.assertEqual(hash_[-3:], b'999')
+
+        for i, original in enumerate(trytes):
+            powed = bytes(buffer_[i * 2673:(i + 1) * 2673])
+            # Only the nonce is touched by ccurl
+            self.assertEqual(powed[:2646], original[:2646])
+
+    def test_pow_trytes_bytes(self):
+        """
+        Bytes in, bytes out.
+        """
+        trytes = self.single_tx_bundle.as_tryte_strings()[0].__str__()
+
+        powed = ccurl_interface.pow_trytes(trytes.encode('ascii'), 9)
+
+        self.assertIsInstance(powed, bytes)
+        self.assertEqual(
+            ccurl_interface.get_hash_trytes(powed.decode('ascii')),
+            ccurl_interface.hash_trytes(powed).decode('ascii')
+        )
+
+    def test_hash_trytes_into_too_small(self):
+        """
+        Output buffer doesn't have room for the result.
+        """
+        trytes = self.single_tx_bundle.as_tryte_strings()[0].__str__()
+
+        self.assertRaises(
+            ValueError,
+            ccurl_interface.hash_trytes_into,
+            trytes.encode('ascii'),
+            bytearray(81),
+            1
+        )
+
+    def test_library_loaded_lazily(self):
+        """
+        Importing the module doesn't load ccurl or configure logging.
+        """
+        output = subprocess.check_output([
+            sys.executable,
+            '-c',
+            'import logging; '
+            'from pow import ccurl_interface; '
+            'print(ccurl_interface._libccurl is None, '
+            'len(logging.getLogger().handlers))',
+        ])
+
+        self.assertEqual(output.split(), [b'True', b'0'])
+
+    def test_load_library_wrong_path(self):
+        """
+        Loading a library that doesn't exist fails loudly, and leaves
+        the loaded one in place.
+        """
+        lib = ccurl_interface._get_libccurl()
+
+        self.assertRaises(
+            OSError,
+            ccurl_interface.load_library,
+            '/nonexistent/libccurl.so'
+        )
+        self.assertIs(ccurl_interface._get_libccurl(), lib)
+
+    def test_iter_attach_to_tangle(self):
+        """
+        Transactions fed head first are yielded head first, and form a
+        valid bundle.
+        """
+        attached = list(ccurl_interface.iter_attach_to_tangle(
+            iter(reversed(self.bundle.as_tryte_strings())),
+            self.branch,
+            self.trunk,
+            mwm=14
+        ))
+
+        self.assertEqual(
+            [a.current_index for a in attached],
+            list(reversed(range(len(self.bundle.transactions)))),
+        )
+        for a in attached:
+            self.assertEqual(a.hash, Transaction.from_tryte_string(a.trytes).hash)
+            self.assertGreaterEqual(a.seconds, 0)
+
+        test_bundle = Bundle.from_tryte_strings(
+            [a.trytes for a in reversed(attached)])
+        validator = BundleValidator(test_bundle)
+        if not validator.is_valid():
+            raise ValueError(
+                'Bundle failed validation:\n{errors}'.format(
+                errors='\n'.join(('  - ' + e) for e in validator.errors),),
+            )
+
+        self.assertTrue(validator.is_valid())
+
+    def test_iter_attach_to_tangle_out_of_order(self):
+        """
+        Transactions in index order are buffered until the head comes.
+        """
+        attached = ccurl_interface.iter_attach_to_tangle(
+            self.bundle.as_tryte_strings(),
+            self.branch,
+            self.trunk,
+            mwm=14
+        )
+
+        test_bundle = Bundle.from_tryte_strings([a.trytes for a in attached])
+        self.assertTrue(BundleValidator(test_bundle).is_valid())
+
+    def test_iter_attach_to_tangle_incomplete(self):
+        """
+        Missing transactions are detected once the input is exhausted.
+        """
+        attached = ccurl_interface.iter_attach_to_tangle(
+            self.bundle.as_tryte_strings()[1:],
+            self.branch,
+            self.trunk,
+            mwm=14
+        )
+
+        self.assertRaises(ValueError, list, attached)
+
+    def test_attach_transaction_view(self):
+        """
+        Fields are patched in the buffer slot of the transaction, the
+        other slots stay as they are.
+        """
+        # Ordered by `current_index`, like the slots
+        trytes = [
+            '{0}'.format(t)
+            for t in self.bundle.as_tryte_strings(head_to_tail=True)
+        ]
+        bundle = transaction.BundleBuffer(trytes)
+        head = bundle[bundle.last_index]
+
+        hash_ = ccurl_interface.attach_transaction_view(
+            head,
+            None,
+            self.trunk,
+            self.branch,
+            14,
+            get_backend(),
+        )
+
+        txn = Transaction.from_tryte_string(head.trytes)
+        self.assertEqual(txn.hash, hash_)
+        self.assertEqual(txn.trunk_transaction_hash, self.trunk)
+        self.assertEqual(txn.branch_transaction_hash, self.branch)
+        self.assertEqual(txn.attachment_timestamp_upper_bound, 3812798742493)
+        self.assertNotEqual(head.trytes, trytes[-1])
+        self.assertEqual(
+            bundle.as_tryte_strings(head_to_tail=True)[:-1], trytes[:-1])
+
+
+class LoadLibraryTestcase(TestCase):
+    """
+    Tests for loading and self-checking the ccurl library.
+    """
+    def setUp(self):
+        patches = [
+            patch.object(ccurl_interface, '_libccurl', None),
+            patch.object(ccurl_interface, 'loaded_path', None),
+            patch.dict(os.environ),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+        os.environ.pop(ccurl_interface.LIBCCURL_PATH_ENV, None)
+
+    def test_path_override(self):
+        os.environ[ccurl_interface.LIBCCURL_PATH_ENV] = '/opt/libccurl.so'
+
+        with patch.object(ccurl_interface, '_open_library') as open_library:
+            lib = ccurl_interface._get_libccurl()
+
+        open_library.assert_called_once_with('/opt/libccurl.so')
+        self.assertIs(lib, open_library.return_value)
+        self.assertEqual(ccurl_interface.loaded_path, '/opt/libccurl.so')
+
+    def test_self_check(self):
+        """
+        The shipped library hashes the test vector correctly, a wrong
+        known answer is caught.
+        """
+        ccurl_interface.load_library()
+        self.assertEqual(
+            ccurl_interface.loaded_path, ccurl_interface.libccurl_path)
+
+        with patch.object(ccurl_interface, '_SELF_CHECK_HASH', b'9' * 81):
+            self.assertRaises(OSError, ccurl_interface.load_library)
@@ -0,0 +1,133 @@
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from pow import cli
+from iota import Address, ProposedBundle, ProposedTransaction, Tag, \
+    TransactionHash
+from test.fakes import FakeBackend
+
+
+class CliTestcase(TestCase):
+    """
+    Tests for the file processing command line tool.
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.input = os.path.join(self.directory, 'bundles.txt')
+        self.output = os.path.join(self.directory, 'attached.txt')
+
+        with io.open(self.input, 'wb') as f:
+            for label in [b'FIRST', b'SECOND', b'THIRD', b'FOURTH']:
+                bundle = ProposedBundle([
+                    ProposedTransaction(
+                        address=Address(
+                            b'TESTVALUE9DONTUSEINPRODUCTION' + b'9' * 52),
+                        tag=Tag(label),
+                        value=0,
+                    )
+                    for _ in range(2)
+                ])
+                bundle.finalize()
+                f.write(','.join(
+                    '{0}'.format(trytes) for trytes in bundle.as_tryte_strings()
+                ).encode('ascii') + b'\n')
+            # Blank lines are skipped, but counted
+            f.write(b'\n')
+
+        self.trunk = TransactionHash('TRUNKTXHASH9TESTVALUEONLY')
+        self.branch = TransactionHash('BRANCHTXHASH9TESTVALUEONLY')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read_output(self):
+        with io.open(self.output, 'rb') as f:
+            return dict(
+                (int(line.split(b'\t')[0]), cli.parse_record(line))
+                for line in f.read().splitlines()
+            )
+
+    def test_records(self):
+        records = list(cli.iter_records(self.input))
+
+        self.assertEqual([n for n, _ in records], [0, 1, 2, 3])
+        self.assertEqual(len(cli.parse_record(records[0][1])), 2)
+
+    def test_run(self):
+        backend = FakeBackend()
+        attached, failed = cli.run_file(
+            self.input, self.output, self.trunk, self.branch,
+            mwm=1, workers=2, backend=backend)
+
+        self.assertEqual((attached, failed), (4, []))
+        self.assertEqual(len(backend.calls), 8)
+
+        results = self.read_output()
+        self.assertEqual(sorted(results), [0, 1, 2, 3])
+        for bundle_trytes in results.values():
+            self.assertEqual(cli.verify_bundle(bundle_trytes, 1, backend), [])
+
+    def test_resume(self):
+        """
+        A second run only does the records missing from the checkpoint,
+        and drops output written after it.
+        """
+        cli.run_file(
+            self.input, self.output, self.trunk, self.branch,
+            mwm=1, workers=1, backend=FakeBackend())
+
+        # Pretend the run crashed after the first two results, in the
+        # middle of writing the third
+        with io.open(self.output, 'rb') as f:
+            lines = f.read().splitlines(True)
+        with io.open(self.output, 'wb') as f:
+            f.write(b''.join(lines[:2]) + lines[2][:100])
+
+        checkpoint_path = self.output + '.checkpoint'
+        with io.open(checkpoint_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        state['output_size'] = len(b''.join(lines[:2]))
+        state['done'] = [
+            [n, n] for n in [int(line.split(b'\t')[0]) for line in lines[:2]]
+        ]
+        with io.open(checkpoint_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(state))
+
+        backend = FakeBackend()
+        attached, _ = cli.run_file(
+            self.input, self.output, self.trunk, self.branch,
+            mwm=1, workers=1, backend=backend)
+
+        self.assertEqual(attached, 2)
+        self.assertEqual(len(backend.calls), 4)
+        self.assertEqual(sorted(self.read_output()), [0, 1, 2, 3])
+
+    def test_checkpoint_other_input(self):
+        checkpoint = cli.Checkpoint(self.output + '.checkpoint', 10)
+        checkpoint.done = set([0, 1, 2, 5])
+        checkpoint.save()
+
+        self.assertEqual(
+            cli.Checkpoint.load(checkpoint.path, 10).done,
+            set([0, 1, 2, 5]),
+        )
+        self.assertRaises(ValueError, cli.Checkpoint.load, checkpoint.path, 11)
+
+    def test_verify_broken_chain(self):
+        cli.run_file(
+            self.input, self.output, self.trunk, self.branch,
+            mwm=1, backend=FakeBackend())
+        bundle_trytes = self.read_output()[0]
+
+        class OtherHashes(FakeBackend):
+            def digest(self, trytes):
+                return 'A' * 81
+
+        self.assertEqual(
+            len(cli.verify_bundle(bundle_trytes, 1, OtherHashes())), 1)
@@ -0,0 +1,117 @@
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from unittest import TestCase, skipUnless
+from pow import ccurl_interface
+
+try:
+    import numpy as np
+    from pow import curl
+except ImportError:
+    np = None
+
+
+@skipUnless(np, 'Needs numpy')
+class VectorizedCurlTestcase(TestCase):
+    """
+    Tests for NumPy Curl-P-81 and batch verification.
+    """
+    def setUp(self):
+        self.trytes = [
+            ('9' * 2592) + tag.ljust(27, '9') + ('9' * 54)
+            for tag in ['BATCH', 'VERIFY', 'CURL', 'NUMPY']
+        ]
+
+    def test_known_vector(self):
+        """
+        Absorb/squeeze of a single hash, test vector from PyOTA.
+        """
+        trits = curl.trytes_to_trits(
+            'EMIDYNHBWMBCXVDEFOFWINXTERALUKYYPPHKP9JJ'
+            'FGJEIUY9MUDVNFZHMMWZUYUSWAIOWEVTHNWMHANBH'
+        )
+        low, high = curl.new_state()
+        low, high = curl.absorb(low, high, *curl.to_planes(trits[np.newaxis]))
+        hash_trits = curl.from_planes(low[:243], high[:243], 1)[0]
+
+        self.assertEqual(
+            curl.trits_to_trytes(hash_trits).tobytes(),
+            b'AQBOPUMJMGVHFOXSMUAGZNACKUTISDPBSILMRAGI'
+            b'GRXXS9JJTLIKZUW9BCJWKSTFBDSBLNVEEGVGAMSSM',
+        )
+
+    def test_trits_round_trip(self):
+        """
+        Trytes -> trits -> trytes.
+        """
+        trytes = b'9ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+        self.assertEqual(
+            curl.trits_to_trytes(curl.trytes_to_trits(trytes)).tobytes(),
+            trytes,
+        )
+
+    def test_hash_transactions(self):
+        """
+        Batch hashes agree with ccurl.
+        """
+        hashes = curl.hash_transactions(self.trytes)
+
+        self.assertEqual(hashes.shape, (4, 81))
+        for trytes, hash_ in zip(self.trytes, hashes):
+            self.assertEqual(
+                hash_.tobytes().decode('ascii'),
+                ccurl_interface.get_hash_trytes(trytes),
+            )
+
+    def test_verify_mwm(self):
+        """
+        Mask flags exactly the transactions with enough weight.
+        """
+        batch = list(self.trytes)
+        batch[1] = ccurl_interface.get_powed_tx_trytes(batch[1], 9)
+        batch[3] = ccurl_interface.get_powed_tx_trytes(batch[3], 9)
+
+        # More transactions than one chunk, to exercise chunking
+        hashes, mask = curl.verify_mwm(batch * 40, 9, chunk_size=64)
+
+        self.assertEqual(mask.tolist(), [False, True, False, True] * 40)
+        self.assertEqual(
+            hashes[1].tobytes().decode('ascii'),
+            ccurl_interface.get_hash_trytes(batch[1]),
+        )
+
+    def test_wrong_length(self):
+        """
+        Rows must be one transaction long.
+        """
+        self.assertRaises(ValueError, curl.verify_mwm, ['ABC'], 9)
+
+    def test_midstate_cache(self):
+        """
+        Reattached transactions reuse the signature midstate and hash
+        the same as without the cache.
+        """
+        cache = curl.midstate_cache
+        curl.midstate_cache = curl.MidstateCache(max_entries=2)
+        try:
+            original = self.trytes[0]
+            # Same signature fragment, different trunk
+            reattached = original[:2430] + ('A' * 81) + original[2511:]
+
+            first = curl.digest_transaction(original)
+            second = curl.digest_transaction(reattached)
+
+            self.assertEqual(curl.midstate_cache.misses, 1)
+            self.assertEqual(curl.midstate_cache.hits, 1)
+            self.assertEqual(
+                [first, second],
+                [h.tobytes() for h in curl.hash_transactions(
+                    [original, reattached])],
+            )
+
+            # Bounded
+            for i in range(3):
+                curl.digest_transaction(('A' * i).ljust(2673, '9'))
+            self.assertEqual(len(curl.midstate_cache), 2)
+        finally:
+            curl.midstate_cache = cache
@@ -0,0 +1,259 @@
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import time
+from multiprocessing import cpu_count
+from threading import Event, Lock
+from unittest import TestCase
+from pow import transaction
+from pow.backends import PowBackend
+from pow.distributed import PowCoordinator, PowWorker
+
+
+def digest(trytes):
+    return 'A' * 80 + '9'
+
+
+class FakeBackend(PowBackend):
+    """
+    Returns the trytes as they are. Searches block while `gate` is
+    clear, partition 0 blocks until stopped.
+    """
+    name = 'fake'
+
+    def __init__(self, open_gate=True):
+        self.gate = Event()
+        if open_gate:
+            self.gate.set()
+        self.calls = 0
+        self.stopped = 0
+        self._lock = Lock()
+
+    def pow(self, trytes, mwm):
+        with self._lock:
+            self.calls += 1
+        self.gate.wait(5)
+        return trytes
+
+    def pow_partition(self, trytes, mwm, stop):
+        if trytes[2648:2655] == '9' * 7:
+            stop.wait(5)
+            with self._lock:
+                self.stopped += 1
+            return None
+        return trytes
+
+    def digest(self, trytes):
+        return digest(trytes)
+
+
+class EvilBackend(FakeBackend):
+    """
+    Changes the address of every transaction.
+    """
+    def pow(self, trytes, mwm):
+        return 'A' + trytes[1:]
+
+
+class BrokenBackend(FakeBackend):
+    """
+    Fails every nonce search.
+    """
+    def pow_partition(self, trytes, mwm, stop):
+        with self._lock:
+            self.calls += 1
+        raise RuntimeError('Broken.')
+
+
+class DistributedTestcase(TestCase):
+    """
+    Tests for the coordinator and workers, on localhost.
+    """
+    def setUp(self):
+        self.coordinator = PowCoordinator(
+            port=0, digest=digest, heartbeat_timeout=0.5).start()
+        self.workers = []
+        self.trunk = 'TRUNK'.ljust(81, '9')
+        self.branch = 'BRANCH'.ljust(81, '9')
+
+    def tearDown(self):
+        for worker in self.workers:
+            worker.stop()
+        self.coordinator.shutdown()
+
+    def start_worker(self, backend, **kwargs):
+        kwargs.setdefault('capacity', 1)
+        kwargs.setdefault('heartbeat_interval', 0.05)
+        worker = PowWorker(*self.coordinator.address, backend=backend,
+            **kwargs).start()
+        self.workers.append(worker)
+
+        deadline = time.time() + 5
+        while (len(self.coordinator.workers()) < len(self.workers)
+                and time.time() < deadline):
+            time.sleep(0.01)
+        return worker
+
+    def wait_calls(self, backend, calls=1):
+        deadline = time.time() + 5
+        while backend.calls < calls and time.time() < deadline:
+            time.sleep(0.01)
+
+    def bundle(self, label, size=2):
+        return [
+            transaction.set_fields('9' * transaction.TRANSACTION_LENGTH, {
+                transaction.TAG: label.ljust(27, '9'),
+                transaction.BUNDLE_HASH: label.ljust(81, '9'),
+                transaction.CURRENT_INDEX: transaction.int_to_trytes(i, 9),
+                transaction.LAST_INDEX: transaction.int_to_trytes(size - 1, 9),
+            })
+            for i in range(size)
+        ]
+
+    def test_bundles(self):
+        """
+        Bundles are spread over the workers and chained correctly.
+        """
+        self.start_worker(FakeBackend())
+        self.start_worker(FakeBackend())
+
+        futures = [
+            self.coordinator.submit_bundle(
+                self.bundle(label), self.trunk, self.branch, 1)
+            for label in ['FIRST', 'SECOND', 'THIRD', 'FOURTH']
+        ]
+
+        for future in futures:
+            attached = future.result(5)
+            # Head first, like `attach_to_tangle` returns them
+            self.assertEqual(len(attached), 2)
+            self.assertEqual(
+                [transaction.get_int_field(t, transaction.CURRENT_INDEX)
+                    for t in attached],
+                [1, 0],
+            )
+            self.assertEqual(
+                transaction.get_field(
+                    attached[0], transaction.TRUNK_TRANSACTION_HASH),
+                self.trunk,
+            )
+            self.assertEqual(
+                transaction.get_field(
+                    attached[1], transaction.TRUNK_TRANSACTION_HASH),
+                digest(attached[0]),
+            )
+
+        self.assertEqual(
+            sum(w['completed'] for w in self.coordinator.workers()), 4)
+
+    def test_transaction_slices(self):
+        """
+        The first slice with a nonce wins, the others are stopped.
+        """
+        backend = FakeBackend()
+        self.start_worker(backend)
+        self.start_worker(backend)
+
+        trytes = self.bundle('SLICE', size=1)[0]
+        powed = self.coordinator.submit_transaction(trytes, 1).result(5)
+
+        self.assertEqual(powed[:2646], trytes[:2646])
+
+        deadline = time.time() + 5
+        while backend.stopped < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(backend.stopped, 1)
+
+    def test_dead_worker(self):
+        """
+        Tasks of a worker that stops sending heartbeats are reassigned.
+        """
+        stuck = FakeBackend(open_gate=False)
+        self.start_worker(stuck, prefetch=0, heartbeat_interval=60)
+
+        future = self.coordinator.submit_bundle(
+            self.bundle('DEAD'), self.trunk, self.branch, 1)
+        self.wait_calls(stuck)
+
+        self.start_worker(FakeBackend())
+
+        self.assertEqual(len(future.result(5)), 2)
+        stuck.gate.set()
+
+    def test_work_stealing(self):
+        """
+        An idle worker takes over tasks queued on a busy one.
+        """
+        busy = FakeBackend(open_gate=False)
+        self.start_worker(busy, prefetch=2)
+
+        futures = [
+            self.coordinator.submit_bundle(
+                self.bundle(label, size=1), self.trunk, self.branch, 1)
+            for label in ['BLOCKED', 'QUEUED', 'ALSOQUEUED']
+        ]
+        self.wait_calls(busy)
+
+        self.start_worker(FakeBackend())
+
+        for future in futures[1:]:
+            future.result(5)
+        self.assertFalse(futures[0].done())
+
+        busy.gate.set()
+        futures[0].result(5)
+
+    def test_invalid_result(self):
+        """
+        Results that don't check out are rejected.
+        """
+        self.coordinator.max_attempts = 2
+        self.start_worker(EvilBackend())
+
+        future = self.coordinator.submit_bundle(
+            self.bundle('EVIL'), self.trunk, self.branch, 1)
+
+        self.assertRaises(ValueError, future.result, 5)
+
+    def test_failing_slices(self):
+        """
+        A nonce search whose slices keep failing fails, instead of
+        handing out new slices forever.
+        """
+        self.coordinator.max_attempts = 3
+        backend = BrokenBackend()
+        self.start_worker(backend)
+        self.start_worker(backend)
+
+        future = self.coordinator.submit_transaction(
+            self.bundle('BROKEN', size=1)[0], 1)
+
+        self.assertRaises(ValueError, future.result, 5)
+
+        # No more slices handed out, once those already sent are done
+        time.sleep(0.2)
+        calls = backend.calls
+        time.sleep(0.2)
+        self.assertEqual(backend.calls, calls)
+
+
+class PowWorkerTestcase(TestCase):
+    """
+    Tests for the worker defaults.
+    """
+    def test_default_capacity(self):
+        """
+        ccurl workers take one task at a time, and interrupt it when it
+        is won elsewhere.
+        """
+        backend = FakeBackend()
+        backend.name = 'ccurl'
+        worker = PowWorker('localhost', backend=backend)
+
+        self.assertEqual(worker.capacity, 1)
+        self.assertTrue(worker.interrupt_native)
+
+        worker = PowWorker('localhost', backend=FakeBackend())
+
+        self.assertEqual(worker.capacity, cpu_count())
+        self.assertEqual(worker.interrupt_native, cpu_count() == 1)
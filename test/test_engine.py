@@ -0,0 +1,160 @@
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import time
+from unittest import TestCase
+from threading import Event, Lock, Thread
+from pow import ccurl_interface
+from pow.engine import PowEngine
+from pow.parallel import seed_partition
+from test.fakes import FAKE_HASH
+
+from six import PY2
+
+if PY2:
+    from mock import MagicMock, patch
+else:
+    from unittest.mock import MagicMock, patch
+
+
+class PowEngineTestcase(TestCase):
+    """
+    Tests for the threaded PoW engine.
+    """
+    def setUp(self):
+        # Unique trytes for each transaction, otherwise we'd get the
+        # same nonce back every time.
+        self.trytes = [
+            ('9' * 2592) + tag.ljust(27, '9') + ('9' * 54)
+            for tag in ['ENGINE', 'TEST', 'THREADS', 'CONCURRENT']
+        ]
+        self.engine = PowEngine(workers=4, backend='ccurl')
+
+    def tearDown(self):
+        self.engine.shutdown()
+
+    def assertPowed(self, powed, mwm):
+        hash_ = ccurl_interface.get_hash_trytes(powed)
+        self.assertEqual(hash_[-(mwm // 3):], '9' * (mwm // 3))
+
+    def test_map(self):
+        """
+        Results come back in input order, each one correctly powed.
+        """
+        results = self.engine.map(self.trytes, 9)
+
+        self.assertEqual(len(results), len(self.trytes))
+        for original, powed in zip(self.trytes, results):
+            # Only attachment fields and nonce may change
+            self.assertEqual(powed[:2646], original[:2646])
+            self.assertPowed(powed, 9)
+
+    def test_concurrent_submitters(self):
+        """
+        Several application threads submit to the same engine.
+        """
+        results = {}
+
+        def submitter(trytes):
+            results[trytes] = self.engine.submit(trytes, 9).result()
+
+        threads = [Thread(target=submitter, args=(t,)) for t in self.trytes]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(results), len(self.trytes))
+        for powed in results.values():
+            self.assertPowed(powed, 9)
+
+    def test_gil_released(self):
+        """
+        Python code keeps running while a nonce search is in progress.
+        """
+        future = self.engine.submit(self.trytes[0], 14)
+
+        iterations = 0
+        while not future.done():
+            iterations += 1
+
+        self.assertPowed(future.result(), 14)
+        self.assertGreater(iterations, 1000)
+
+    def test_missed_nonce(self):
+        """
+        ccurl misses the nonce of some transactions every time, those
+        are searched again with another seed.
+        """
+        trytes = self.trytes[0]
+
+        def get_hash_trytes(powed):
+            # No trailing zeros unless seeded
+            return 'M' * 81 if powed == trytes else FAKE_HASH
+
+        with patch.object(ccurl_interface, 'get_powed_tx_trytes',
+                    side_effect=lambda t, mwm: t), \
+                patch.object(ccurl_interface, 'get_hash_trytes',
+                    side_effect=get_hash_trytes):
+            self.assertEqual(
+                self.engine.submit(trytes, 3).result(),
+                seed_partition(trytes, 1),
+            )
+
+            with patch.object(ccurl_interface, 'get_hash_trytes',
+                    return_value='M' * 81):
+                self.assertRaises(
+                    ValueError, self.engine.submit(trytes, 3).result)
+
+
+class NativeSearchTestcase(TestCase):
+    """
+    ccurl keeps its search state in globals, so searches take turns.
+    """
+    def setUp(self):
+        self.lib = MagicMock()
+        patches = [
+            patch.object(ccurl_interface, '_get_libccurl',
+                return_value=self.lib),
+            patch.object(ccurl_interface, '_take_result',
+                side_effect=lambda pointer, length, target=None: pointer),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_one_at_a_time(self):
+        lock = Lock()
+        running = [0]
+        overlaps = []
+
+        def ccurl_pow(trytes, mwm):
+            with lock:
+                running[0] += 1
+                overlaps.append(running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+            return trytes
+        self.lib.ccurl_pow.side_effect = ccurl_pow
+
+        threads = [
+            Thread(target=ccurl_interface._ccurl_pow, args=(b'TX', 9))
+            for _ in range(4)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(overlaps, [1, 1, 1, 1])
+
+    def test_stopped_while_waiting(self):
+        """
+        A search stopped before its turn doesn't call ccurl.
+        """
+        stop = Event()
+        stop.set()
+
+        self.assertIsNone(ccurl_interface._ccurl_pow(b'TX', 9, stop=stop))
+        self.assertFalse(self.lib.ccurl_pow.called)
@@ -0,0 +1,79 @@
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import os
+from unittest import TestCase, skipUnless
+from pow import ccurl_interface
+
+STATM = '/proc/self/statm'
+
+def get_rss():
+    """
+    Returns the resident set size of this process in bytes.
+    """
+    with open(STATM) as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf(str('SC_PAGE_SIZE'))
+
+
+@skipUnless(os.path.exists(STATM), 'Needs /proc/self/statm')
+class NativeMemoryTestcase(TestCase):
+    """
+    Soak tests: buffers returned by ccurl must not leak.
+    """
+    def setUp(self):
+        self.trytes = (
+            ('9' * 2592) + 'MEMORY9SOAK9TEST'.ljust(27, '9') + ('9' * 54)
+        )
+
+    def assertFlat(self, func, calls, max_growth):
+        # Warm up, so that allocator pools and Python caches settle
+        for _ in range(calls // 10):
+            func()
+
+        before = get_rss()
+        for _ in range(calls):
+            func()
+        growth = get_rss() - before
+
+        self.assertLess(
+            growth,
+            max_growth,
+            'RSS grew by {0} bytes over {1} calls'.format(growth, calls),
+        )
+
+    def test_pow_does_not_leak(self):
+        """
+        RSS stays flat over thousands of PoW calls.
+        """
+        # Leaking 2674 bytes per call would add up to ~13 MB
+        self.assertFlat(
+            lambda: ccurl_interface.get_powed_tx_trytes(self.trytes, 1),
+            5000,
+            2 * 1024 * 1024,
+        )
+
+    def test_bytes_pow_does_not_leak(self):
+        """
+        Same for the bytes API writing into a preallocated buffer.
+        """
+        trytes = self.trytes.encode('ascii')
+        out = bytearray(len(trytes))
+
+        self.assertFlat(
+            lambda: ccurl_interface.pow_trytes_into(trytes, 1, out),
+            5000,
+            2 * 1024 * 1024,
+        )
+
+    def test_digest_does_not_leak(self):
+        """
+        RSS stays flat over thousands of hash calls.
+        """
+        # Leaking 82 bytes (plus malloc overhead) per call would add
+        # up to ~0.5 MB
+        self.assertFlat(
+            lambda: ccurl_interface.get_hash_trytes(self.trytes),
+            5000,
+            256 * 1024,
+        )
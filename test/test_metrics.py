@@ -0,0 +1,189 @@
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from unittest import TestCase
+from pow import ccurl_interface, metrics
+from pow.backends import PowBackend
+from iota import Address, ProposedBundle, ProposedTransaction, \
+    TransactionHash
+
+
+class FakeBackend(PowBackend):
+    """
+    Returns the trytes as-is, hashes to the queued hashes.
+    """
+    name = 'fake'
+
+    def __init__(self, hashes):
+        self.hashes = list(hashes)
+
+    def pow(self, trytes, mwm):
+        return trytes
+
+    def digest(self, trytes):
+        return self.hashes.pop(0)
+
+
+class MetricsTestcase(TestCase):
+    """
+    Tests for the PoW instrumentation hooks.
+    """
+    def setUp(self):
+        bundle = ProposedBundle([
+            ProposedTransaction(
+                address=Address(b'TESTVALUE9DONTUSEINPRODUCTION' + b'9' * 52),
+                value=0,
+            ),
+        ])
+        bundle.finalize()
+        self.bundle_trytes = bundle.as_tryte_strings()
+
+        self.trunk = TransactionHash('TRUNKTXHASH9TESTVALUEONLY')
+        self.branch = TransactionHash('BRANCHTXHASH9TESTVALUEONLY')
+
+        self.records = []
+        metrics.register_observer(self.records.append)
+
+    def tearDown(self):
+        metrics.unregister_observer(self.records.append)
+
+    def test_record_per_transaction(self):
+        """
+        Every transaction is reported, retries included.
+        """
+        backend = FakeBackend(['A' * 81, '9' * 81])
+
+        ccurl_interface.attach_to_tangle(
+            self.bundle_trytes,
+            self.trunk,
+            self.branch,
+            mwm=3,
+            backend=backend,
+        )
+
+        self.assertEqual(len(self.records), 1)
+
+        record = self.records[0]
+        self.assertEqual(record.backend, 'fake')
+        self.assertEqual(record.mwm, 3)
+        self.assertEqual(record.current_index, 0)
+        self.assertEqual(record.retries, 1)
+        self.assertGreaterEqual(record.pow_seconds, 0)
+        self.assertGreaterEqual(record.hash_seconds, 0)
+        self.assertGreaterEqual(record.overhead_seconds, 0)
+
+    def test_failed_transaction_reported(self):
+        """
+        Transactions that exhaust their retries are reported as well.
+        """
+        backend = FakeBackend(['A' * 81] * 5)
+
+        self.assertRaises(
+            ValueError,
+            ccurl_interface.attach_to_tangle,
+            self.bundle_trytes,
+            self.trunk,
+            self.branch,
+            mwm=3,
+            backend=backend,
+        )
+
+        self.assertEqual(len(self.records), 1)
+        self.assertEqual(self.records[0].retries, 5)
+
+    def test_no_observer(self):
+        """
+        Nothing is reported after unregistering.
+        """
+        metrics.unregister_observer(self.records.append)
+
+        ccurl_interface.attach_to_tangle(
+            self.bundle_trytes,
+            self.trunk,
+            self.branch,
+            mwm=3,
+            backend=FakeBackend(['9' * 81]),
+        )
+
+        self.assertEqual(self.records, [])
+
+    def test_failing_observer(self):
+        """
+        A broken observer doesn't break the attach.
+        """
+        def broken(record):
+            raise RuntimeError('broken')
+
+        metrics.register_observer(broken)
+        try:
+            ccurl_interface.attach_to_tangle(
+                self.bundle_trytes,
+                self.trunk,
+                self.branch,
+                mwm=3,
+                backend=FakeBackend(['9' * 81]),
+            )
+        finally:
+            metrics.unregister_observer(broken)
+
+        self.assertEqual(len(self.records), 1)
+
+
+class MetricsAggregatorTestcase(TestCase):
+    """
+    Tests for the in-process aggregator.
+    """
+    def record(self, mwm=9, retries=0, pow_seconds=0.2):
+        return metrics.TransactionMetrics(
+            backend='ccurl',
+            mwm=mwm,
+            current_index=0,
+            retries=retries,
+            pow_seconds=pow_seconds,
+            hash_seconds=0.001,
+            overhead_seconds=0.002,
+        )
+
+    def test_snapshot(self):
+        aggregator = metrics.MetricsAggregator()
+        aggregator(self.record(retries=1))
+        aggregator(self.record())
+        aggregator(self.record(mwm=14))
+
+        snapshot = aggregator.snapshot()
+
+        self.assertEqual(sorted(snapshot), [('ccurl', 9), ('ccurl', 14)])
+        self.assertEqual(snapshot[('ccurl', 9)]['transactions'], 2)
+        self.assertEqual(snapshot[('ccurl', 9)]['retries'], 1)
+        # 3 attempts of 3^9 hashes in 0.4 seconds
+        self.assertAlmostEqual(
+            snapshot[('ccurl', 9)]['hash_rate'],
+            3 * 3 ** 9 / 0.4,
+        )
+
+    def test_prometheus(self):
+        aggregator = metrics.MetricsAggregator()
+        aggregator(self.record(pow_seconds=0.2))
+        aggregator(self.record(pow_seconds=3))
+
+        text = aggregator.to_prometheus()
+
+        self.assertIn('# TYPE pyota_pow_transactions_total counter', text)
+        self.assertIn(
+            'pyota_pow_transactions_total{backend="ccurl",mwm="9"} 2',
+            text,
+        )
+        self.assertIn(
+            'pyota_pow_duration_seconds_bucket'
+            '{backend="ccurl",mwm="9",le="0.25"} 1',
+            text,
+        )
+        self.assertIn(
+            'pyota_pow_duration_seconds_bucket'
+            '{backend="ccurl",mwm="9",le="+Inf"} 2',
+            text,
+        )
+        self.assertIn(
+            'pyota_pow_duration_seconds_count{backend="ccurl",mwm="9"} 2',
+            text,
+        )
@@ -0,0 +1,100 @@
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from threading import Event
+from unittest import TestCase, skipUnless
+from pow import ccurl_interface
+from pow.backends import PowBackend
+from pow.parallel import PartitionedBackend, seed_partition
+
+try:
+    import numpy as np
+    from pow import curl
+except ImportError:
+    np = None
+
+
+class StoppableBackend(PowBackend):
+    """
+    Only partition 0 finds a nonce, the others wait to be stopped.
+    """
+    name = 'stoppable'
+
+    def __init__(self):
+        self.stopped = []
+        self.interrupted = False
+
+    def pow_partition(self, trytes, mwm, stop):
+        if trytes == seed_partition(trytes, 0):
+            return trytes
+        stop.wait(5)
+        self.stopped.append(stop.is_set())
+        return None
+
+    def interrupt(self):
+        self.interrupted = True
+        return True
+
+
+class PartitionedBackendTestcase(TestCase):
+    """
+    Tests for splitting a nonce search across workers.
+    """
+    def setUp(self):
+        self.trytes = ('9' * 2592) + 'PARALLEL'.ljust(27, '9') + ('9' * 54)
+
+    def test_seed_partition(self):
+        """
+        Partitions get distinct trytes, only the seed trytes change.
+        """
+        seeded = [seed_partition(self.trytes, i) for i in range(100)]
+
+        self.assertEqual(len(set(seeded)), 100)
+        for trytes in seeded:
+            self.assertEqual(len(trytes), len(self.trytes))
+            self.assertEqual(trytes[:2648], self.trytes[:2648])
+            self.assertEqual(trytes[2655:], self.trytes[2655:])
+
+    def test_seed_partition_out_of_range(self):
+        self.assertRaises(ValueError, seed_partition, self.trytes, -1)
+
+    def test_losers_stopped(self):
+        """
+        The first result wins, the other partitions are stopped.
+        """
+        inner = StoppableBackend()
+
+        with PartitionedBackend(inner, workers=4) as backend:
+            result = backend.pow(self.trytes, 9)
+
+        self.assertEqual(result, seed_partition(self.trytes, 0))
+        # Partitions that hadn't started yet are cancelled instead
+        self.assertTrue(all(inner.stopped))
+        self.assertTrue(inner.interrupted)
+
+    @skipUnless(np, 'Needs numpy')
+    def test_numpy(self):
+        """
+        Nonce found by the partitioned NumPy search is valid, and the
+        partition seed is kept.
+        """
+        with PartitionedBackend('numpy', workers=4) as backend:
+            powed = backend.pow(self.trytes, 9)
+
+        self.assertEqual(powed[:2646], self.trytes[:2646])
+        self.assertGreaterEqual(
+            ccurl_interface.count_trailing_zero_trits(
+                curl.digest_transaction(powed).decode('ascii'),
+            ),
+            9,
+        )
+
+    @skipUnless(np, 'Needs numpy')
+    def test_numpy_stop(self):
+        """
+        NumPy search gives up once stopped.
+        """
+        stop = Event()
+        stop.set()
+
+        self.assertIsNone(curl.search_nonce(self.trytes, 20, stop=stop))
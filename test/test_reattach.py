@@ -0,0 +1,121 @@
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from threading import Lock
+from unittest import TestCase
+from pow.reattach import PreparedBundle, prepare_bundles, promote, \
+    reattach_bundles
+from iota import Address, Bundle, ProposedBundle, ProposedTransaction, Tag, \
+    Transaction
+from test.fakes import FAKE_HASH, FakeBackend
+
+
+class ReattachTestcase(TestCase):
+    """
+    Tests for bulk reattachment and promotion.
+    """
+    def setUp(self):
+        self.bundles = []
+        for label in [b'FIRST', b'SECOND', b'THIRD']:
+            bundle = ProposedBundle([
+                ProposedTransaction(
+                    address=Address(
+                        b'TESTVALUE9DONTUSEINPRODUCTION' + b'9' * 52),
+                    tag=Tag(label),
+                    value=0,
+                )
+                for _ in range(2)
+            ])
+            bundle.finalize()
+            self.bundles.append(bundle.as_tryte_strings())
+
+        self.tip_calls = 0
+        self._lock = Lock()
+
+    def tip_provider(self):
+        with self._lock:
+            self.tip_calls += 1
+            # A distinct, valid pair of hashes per call
+            return {
+                'trunkTransaction':
+                    ('TRUNK' + 'A' * self.tip_calls).ljust(81, '9'),
+                'branchTransaction':
+                    ('BRANCH' + 'A' * self.tip_calls).ljust(81, '9'),
+            }
+
+    def test_prepared_bundle_order(self):
+        """
+        Transactions are kept head first, whatever the input order.
+        """
+        prepared = PreparedBundle(reversed(self.bundles[0]))
+
+        self.assertEqual(len(prepared), 2)
+        self.assertEqual(
+            [Transaction.from_tryte_string(t).current_index
+                for t in prepared.transactions],
+            [1, 0],
+        )
+
+    def test_prepared_bundle_incomplete(self):
+        self.assertRaises(ValueError, PreparedBundle, self.bundles[0][:1])
+        self.assertRaises(
+            ValueError,
+            PreparedBundle,
+            [self.bundles[0][0], self.bundles[1][1]],
+        )
+
+    def test_reattach(self):
+        """
+        Bundles are chained and attached to tips from the provider.
+        """
+        prepared = prepare_bundles(self.bundles)
+        results = reattach_bundles(
+            prepared,
+            self.tip_provider,
+            mwm=1,
+            share_tips=2,
+            workers=1,
+            backend=FakeBackend(),
+        )
+
+        # Three bundles, two per tip pair
+        self.assertEqual(self.tip_calls, 2)
+        self.assertEqual(len(results), 3)
+
+        for original, attached in zip(self.bundles, results):
+            bundle = Bundle.from_tryte_strings(attached)
+            head = bundle.transactions[1]
+            tail = bundle.transactions[0]
+
+            self.assertEqual(tail.tag, Transaction.from_tryte_string(
+                original[0]).tag)
+            self.assertTrue(
+                str(head.trunk_transaction_hash).startswith('TRUNK'))
+            self.assertEqual(str(tail.trunk_transaction_hash), FAKE_HASH)
+
+        # Prepared bundles can be attached again
+        again = reattach_bundles(
+            prepared, ('TRUNK', 'BRANCH'), mwm=1, backend=FakeBackend())
+        self.assertEqual(len(again), 3)
+
+    def test_promote(self):
+        tails = ['TAIL' + '9' * 77, 'OTHERTAIL' + '9' * 72]
+        results = dict(promote(
+            tails,
+            self.tip_provider,
+            mwm=1,
+            tag=b'PROMOTE',
+            ordered=False,
+            backend=FakeBackend(),
+        ))
+
+        self.assertEqual(sorted(results), [0, 1])
+        for index, tail in enumerate(tails):
+            self.assertEqual(len(results[index]), 1)
+            txn = Transaction.from_tryte_string(results[index][0])
+
+            self.assertEqual(txn.value, 0)
+            self.assertEqual(str(txn.trunk_transaction_hash), tail)
+            self.assertTrue(
+                str(txn.branch_transaction_hash).startswith('BRANCH'))
+            self.assertEqual(txn.tag, Tag(b'PROMOTE'))
@@ -0,0 +1,205 @@
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import time
+from unittest import TestCase
+from pow.scheduler import HashRateEstimator, PowScheduler, SchedulerFull, \
+    PRIORITY_BULK, PRIORITY_INTERACTIVE, PRIORITY_NORMAL
+from iota import Address, ProposedBundle, ProposedTransaction, Tag, \
+    TransactionHash
+from test.fakes import FakeBackend
+
+
+class PowSchedulerTestcase(TestCase):
+    """
+    Tests for the PoW job scheduler.
+    """
+    def setUp(self):
+        self.backend = FakeBackend(open_gate=False)
+
+    def served(self):
+        """
+        Labels of the transactions powed, in order.
+        """
+        return [trytes.lstrip('9') for trytes in self.backend.calls]
+
+    def trytes(self, label):
+        return label.rjust(2673, '9')
+
+    def wait_running(self, scheduler):
+        """
+        Waits until the single worker picked up a job.
+        """
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            with scheduler._condition:
+                if any(
+                    job.running
+                    for tenants in scheduler._queues.values()
+                    for jobs in tenants.values()
+                    for job in jobs
+                ):
+                    return
+            time.sleep(0.01)
+
+    def test_priority(self):
+        """
+        Interactive jobs jump ahead of queued bulk jobs.
+        """
+        with PowScheduler(workers=1, backend=self.backend) as scheduler:
+            futures = [scheduler.submit_transaction(
+                self.trytes('BLOCKER'), 1, PRIORITY_BULK)]
+            self.wait_running(scheduler)
+
+            futures += [
+                scheduler.submit_transaction(
+                    self.trytes('BULK'), 1, PRIORITY_BULK),
+                scheduler.submit_transaction(
+                    self.trytes('NORMAL'), 1, PRIORITY_NORMAL),
+                scheduler.submit_transaction(
+                    self.trytes('URGENT'), 1, PRIORITY_INTERACTIVE),
+            ]
+            self.backend.gate.set()
+
+            for future in futures:
+                future.result()
+
+        self.assertEqual(
+            self.served(),
+            ['BLOCKER', 'URGENT', 'NORMAL', 'BULK'],
+        )
+
+    def test_weighted_fairness(self):
+        """
+        Tenants share the workers in proportion to their weights.
+        """
+        with PowScheduler(
+            workers=1,
+            backend=self.backend,
+            tenant_weights={'A': 2},
+        ) as scheduler:
+            futures = [scheduler.submit_transaction(self.trytes('BLOCKER'), 1)]
+            self.wait_running(scheduler)
+
+            for _ in range(6):
+                futures.append(scheduler.submit_transaction(
+                    self.trytes('A'), 1, tenant='A'))
+                futures.append(scheduler.submit_transaction(
+                    self.trytes('B'), 1, tenant='B'))
+            self.backend.gate.set()
+
+            for future in futures:
+                future.result()
+
+        served = self.served()[1:7]
+        self.assertEqual(served.count('A'), 4)
+        self.assertEqual(served.count('B'), 2)
+
+    def test_idle_tenants_forgotten(self):
+        """
+        Tenants without queued jobs don't keep state.
+        """
+        self.backend.gate.set()
+        with PowScheduler(workers=1, backend=self.backend) as scheduler:
+            for tenant in ['A', 'B', 'C']:
+                scheduler.submit_transaction(
+                    self.trytes(tenant), 1, tenant=tenant).result()
+
+            self.assertEqual(scheduler._virtual_time, {})
+
+    def test_admission(self):
+        """
+        Jobs over the backlog limit are rejected, unless only lower
+        priority jobs are in the way.
+        """
+        # One transaction at MWM 5 is estimated to take a second
+        estimator = HashRateEstimator(initial_rate=3 ** 5)
+
+        with PowScheduler(
+            workers=1,
+            backend=self.backend,
+            max_backlog_seconds=2.5,
+            estimator=estimator,
+        ) as scheduler:
+            futures = [
+                scheduler.submit_transaction(
+                    self.trytes('BULK'), 5, PRIORITY_BULK),
+                scheduler.submit_transaction(
+                    self.trytes('BULK'), 5, PRIORITY_BULK),
+            ]
+
+            self.assertRaises(
+                SchedulerFull,
+                scheduler.submit_transaction,
+                self.trytes('BULK'),
+                5,
+                PRIORITY_BULK,
+            )
+
+            futures.append(scheduler.submit_transaction(
+                self.trytes('URGENT'), 5, PRIORITY_INTERACTIVE))
+
+            self.backend.gate.set()
+            for future in futures:
+                future.result()
+
+    def test_transaction_checked(self):
+        """
+        The hash of a single transaction job is checked against the MWM,
+        with a new nonce start for every try.
+        """
+        self.backend.gate.set()
+        self.backend.digest = lambda trytes: 'M' * 81
+
+        with PowScheduler(workers=1, backend=self.backend) as scheduler:
+            future = scheduler.submit_transaction(self.trytes('TX'), 1)
+
+            self.assertRaises(ValueError, future.result, 5)
+
+        self.assertEqual(len(self.backend.calls), 5)
+        self.assertEqual(len(set(self.backend.calls)), 5)
+
+    def test_bundle_preempted_between_transactions(self):
+        """
+        An interactive job runs between the transactions of a bulk
+        bundle.
+        """
+        bundle = ProposedBundle([
+            ProposedTransaction(
+                address=Address(b'TESTVALUE9DONTUSEINPRODUCTION' + b'9' * 52),
+                tag=Tag(b'BULK'),
+                value=0,
+            )
+            for _ in range(3)
+        ])
+        bundle.finalize()
+
+        trunk = TransactionHash('TRUNKTXHASH9TESTVALUEONLY')
+        branch = TransactionHash('BRANCHTXHASH9TESTVALUEONLY')
+
+        with PowScheduler(workers=1, backend=self.backend) as scheduler:
+            bulk = scheduler.submit(
+                bundle.as_tryte_strings(), trunk, branch, 1, PRIORITY_BULK)
+            self.wait_running(scheduler)
+
+            urgent = scheduler.submit_transaction(
+                self.trytes('URGENT'), 1, PRIORITY_INTERACTIVE)
+            self.backend.gate.set()
+
+            self.assertEqual(len(bulk.result()), 3)
+            urgent.result()
+
+        # Second PoW call, right after the bundle's head transaction
+        self.assertEqual(self.served()[1], 'URGENT')
+
+    def test_error(self):
+        """
+        Backend errors end up in the future.
+        """
+        class FailingBackend(FakeBackend):
+            def pow(self, trytes, mwm):
+                raise ValueError('PoW failed.')
+
+        with PowScheduler(workers=1, backend=FailingBackend()) as scheduler:
+            future = scheduler.submit_transaction(self.trytes('FAIL'), 1)
+            self.assertRaises(ValueError, future.result)
@@ -0,0 +1,192 @@
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+import json
+import time
+from threading import Event, Thread
+from unittest import TestCase
+from pow.server import PowServer
+
+from six import PY2
+from six.moves.urllib.error import HTTPError
+from six.moves.urllib.request import Request, urlopen
+
+if PY2:
+    from mock import MagicMock, patch
+else:
+    from unittest.mock import MagicMock, patch
+
+
+class PowServerTestcase(TestCase):
+    """
+    Tests for the attachToTangle server.
+    """
+    def setUp(self):
+        self.server = PowServer(port=0, workers=1, max_queue=0).start()
+        self.url = 'http://{0}:{1}'.format(*self.server.address)
+
+        self.trunk = 'TRUNKTXHASH9TESTVALUEONLY'.ljust(81, '9')
+        self.branch = 'BRANCHTXHASH9TESTVALUEONLY'.ljust(81, '9')
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def request(self, payload, path='/'):
+        """
+        Returns status and decoded body of a request.
+        """
+        if payload is None:
+            request = Request(self.url + path)
+        else:
+            request = Request(
+                self.url + path,
+                data=json.dumps(payload).encode('utf-8'),
+                headers={'Content-Type': 'application/json'},
+            )
+        try:
+            response = urlopen(request)
+        except HTTPError as e:
+            response = e
+
+        body = response.read().decode('utf-8')
+        if response.headers.get('Content-Type') == 'application/json':
+            body = json.loads(body)
+        return response.code, body
+
+    def attach_payload(self):
+        return {
+            'command': 'attachToTangle',
+            'trunkTransaction': self.trunk,
+            'branchTransaction': self.branch,
+            'minWeightMagnitude': 14,
+            'trytes': ['TRYTES'],
+        }
+
+    def test_attach_to_tangle(self):
+        """
+        Request is handed to `attach_to_tangle`.
+        """
+        attach = MagicMock(return_value=['POWED'])
+        with patch('pow.ccurl_interface.attach_to_tangle', attach):
+            status, body = self.request(self.attach_payload())
+
+        self.assertEqual(status, 200)
+        self.assertEqual(body['trytes'], ['POWED'])
+        self.assertIn('duration', body)
+
+        args = attach.call_args[0]
+        self.assertEqual(args[0], ['TRYTES'])
+        self.assertEqual('{0}'.format(args[1]), self.trunk)
+        self.assertEqual('{0}'.format(args[2]), self.branch)
+        self.assertEqual(args[3], 14)
+
+    def test_unknown_command(self):
+        status, body = self.request({'command': 'getNodeInfo'})
+
+        self.assertEqual(status, 400)
+        self.assertEqual(body['error'], 'Command [getNodeInfo] is unknown')
+
+    def test_invalid_mwm(self):
+        payload = self.attach_payload()
+        payload['minWeightMagnitude'] = '14'
+
+        status, body = self.request(payload)
+
+        self.assertEqual(status, 400)
+
+    def test_invalid_bundle(self):
+        """
+        Errors of `attach_to_tangle` come back as 400.
+        """
+        attach = MagicMock(side_effect=ValueError('Bad bundle.'))
+        with patch('pow.ccurl_interface.attach_to_tangle', attach):
+            status, body = self.request(self.attach_payload())
+
+        self.assertEqual(status, 400)
+        self.assertEqual(body['error'], 'Bad bundle.')
+
+    def test_queue_full(self):
+        """
+        Requests beyond the queue size are rejected with 503.
+        """
+        release = Event()
+
+        def slow_attach(*args):
+            release.wait(5)
+            return ['POWED']
+
+        results = []
+        with patch('pow.ccurl_interface.attach_to_tangle', slow_attach):
+            first = Thread(
+                target=lambda: results.append(
+                    self.request(self.attach_payload())),
+            )
+            first.start()
+
+            # Wait for the first request to occupy the only slot
+            deadline = time.time() + 5
+            while (self.server.health()['pending'] == 0
+                    and time.time() < deadline):
+                time.sleep(0.01)
+
+            status, body = self.request(self.attach_payload())
+            release.set()
+            first.join()
+
+        self.assertEqual(status, 503)
+        self.assertEqual(results[0][0], 200)
+        self.assertEqual(self.server.health()['rejected'], 1)
+
+    def test_health_and_metrics(self):
+        status, body = self.request(None, '/health')
+
+        self.assertEqual(status, 200)
+        self.assertEqual(body['status'], 'ok')
+        self.assertEqual(body['workers'], 1)
+
+        status, body = self.request(None, '/metrics')
+
+        self.assertEqual(status, 200)
+        self.assertIn('pyota_pow_server_requests_pending 0', body)
+
+
+class PowServerBackendTestcase(TestCase):
+    """
+    The server only loads libccurl for the ccurl backends.
+    """
+    def setUp(self):
+        from pow.backends import NumpyBackend
+        if not NumpyBackend.is_available():
+            self.skipTest('numpy is not installed')
+
+    def test_without_libccurl(self):
+        from pow import ccurl_interface
+
+        attach = MagicMock(return_value=['POWED'])
+        with patch.dict('os.environ', {
+                    ccurl_interface.LIBCCURL_PATH_ENV: '/nonexistent.so',
+                }), \
+                patch.object(ccurl_interface, '_libccurl', None), \
+                patch.object(ccurl_interface, '_pow_initialized', False), \
+                patch('pow.ccurl_interface.attach_to_tangle', attach):
+            server = PowServer(port=0, workers=1, backend='numpy').start()
+            try:
+                request = Request(
+                    'http://{0}:{1}/'.format(*server.address),
+                    data=json.dumps({
+                        'command': 'attachToTangle',
+                        'trunkTransaction': '9' * 81,
+                        'branchTransaction': '9' * 81,
+                        'minWeightMagnitude': 9,
+                        'trytes': ['TRYTES'],
+                    }).encode('utf-8'),
+                    headers={'Content-Type': 'application/json'},
+                )
+                status = urlopen(request).code
+            finally:
+                server.shutdown()
+
+            self.assertIsNone(ccurl_interface._libccurl)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(attach.call_args[0][4].name, 'numpy')
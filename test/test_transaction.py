@@ -0,0 +1,168 @@
+from __future__ import absolute_import, division, print_function, \
+    unicode_literals
+
+from unittest import TestCase
+from pow import transaction
+from iota import Address, ProposedBundle, ProposedTransaction, Tag, \
+    Transaction
+
+
+class TransactionLayoutTestcase(TestCase):
+    """
+    Tests for the raw transaction tryte layout.
+    """
+    def setUp(self):
+        bundle = ProposedBundle([
+            ProposedTransaction(
+                address=Address(b'TESTVALUE9DONTUSEINPRODUCTION' + b'9' * 52),
+                tag=Tag(b'LAYOUT'),
+                value=0,
+            )
+            for _ in range(3)
+        ])
+        bundle.finalize()
+        self.trytes = [
+            '{0}'.format(trytes) for trytes in bundle.as_tryte_strings()
+        ]
+
+    def test_int_round_trip(self):
+        for value in [0, 1, -1, 13, 14, -14, 1234567890123, -42]:
+            trytes = transaction.int_to_trytes(value, 9)
+            self.assertEqual(len(trytes), 9)
+            self.assertEqual(transaction.trytes_to_int(trytes), value)
+
+    def test_upper_bound(self):
+        self.assertEqual(
+            transaction.int_to_trytes((3 ** 27 - 1) // 2, 9),
+            'MMMMMMMMM',
+        )
+        self.assertEqual(transaction.int_to_trytes(0, 9), '999999999')
+
+    def test_int_overflow(self):
+        self.assertRaises(ValueError, transaction.int_to_trytes, 3 ** 27, 9)
+
+    def test_fields_match_pyota(self):
+        """
+        Fields read from raw trytes agree with PyOTA's parser.
+        """
+        trytes = self.trytes[1]
+        txn = Transaction.from_tryte_string(trytes)
+
+        self.assertEqual(
+            transaction.get_int_field(trytes, transaction.CURRENT_INDEX),
+            txn.current_index,
+        )
+        self.assertEqual(
+            transaction.get_int_field(trytes, transaction.LAST_INDEX),
+            txn.last_index,
+        )
+        self.assertEqual(
+            transaction.get_field(trytes, transaction.BUNDLE_HASH),
+            '{0}'.format(txn.bundle_hash),
+        )
+        self.assertEqual(
+            transaction.get_field(trytes, transaction.TAG),
+            '{0}'.format(txn.tag),
+        )
+
+    def test_set_fields(self):
+        """
+        Patched fields are parsed back by PyOTA.
+        """
+        patched = transaction.set_fields(self.trytes[0], {
+            transaction.ATTACHMENT_TIMESTAMP:
+                transaction.int_to_trytes(1234567, 9),
+            transaction.TRUNK_TRANSACTION_HASH: 'A' * 81,
+        })
+        txn = Transaction.from_tryte_string(patched)
+
+        self.assertEqual(len(patched), transaction.TRANSACTION_LENGTH)
+        self.assertEqual(txn.attachment_timestamp, 1234567)
+        self.assertEqual('{0}'.format(txn.trunk_transaction_hash), 'A' * 81)
+
+    def test_set_fields_wrong_length(self):
+        self.assertRaises(
+            ValueError,
+            transaction.set_fields,
+            self.trytes[0],
+            {transaction.TAG: 'SHORT'},
+        )
+
+
+class BundleBufferTestcase(TestCase):
+    """
+    Tests for the bytearray backed bundle representation.
+    """
+    def setUp(self):
+        bundle = ProposedBundle([
+            ProposedTransaction(
+                address=Address(b'TESTVALUE9DONTUSEINPRODUCTION' + b'9' * 52),
+                tag=Tag(b'BUFFER'),
+                value=0,
+            )
+            for _ in range(3)
+        ])
+        bundle.finalize()
+        # Ordered by `current_index`
+        self.trytes = [
+            '{0}'.format(trytes)
+            for trytes in bundle.as_tryte_strings(head_to_tail=True)
+        ]
+
+    def test_slots_by_index(self):
+        """
+        Transactions end up in the slot of their index, whatever the
+        input order.
+        """
+        buffer = transaction.BundleBuffer(reversed(self.trytes))
+
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(len(buffer.buffer), 3 * transaction.TRANSACTION_LENGTH)
+        self.assertEqual(
+            buffer.as_tryte_strings(head_to_tail=True), self.trytes)
+        # Head first by default, like PyOTA
+        self.assertEqual(buffer.as_tryte_strings(), self.trytes[::-1])
+        self.assertEqual(
+            [txn.current_index for txn in buffer.head_first()],
+            [2, 1, 0],
+        )
+
+    def test_view_fields(self):
+        """
+        Fields written through a view are parsed back by PyOTA.
+        """
+        buffer = transaction.BundleBuffer(self.trytes)
+        view = buffer[1]
+        view.attachment_timestamp = 1234567
+        view.trunk_transaction_hash = 'A' * 81
+
+        txn = Transaction.from_tryte_string(buffer.as_tryte_strings()[1])
+
+        self.assertEqual(txn.attachment_timestamp, 1234567)
+        self.assertEqual('{0}'.format(txn.trunk_transaction_hash), 'A' * 81)
+        self.assertEqual(view.bundle_hash, '{0}'.format(txn.bundle_hash))
+        # Other slots are untouched
+        self.assertEqual(buffer[0].trytes, self.trytes[0])
+        self.assertEqual(buffer[2].trytes, self.trytes[2])
+
+    def test_copy(self):
+        buffer = transaction.BundleBuffer(self.trytes)
+        other = buffer.copy()
+        other[0].nonce = 'N' * 27
+
+        self.assertEqual(buffer[0].trytes, self.trytes[0])
+        self.assertEqual(other[0].nonce, 'N' * 27)
+
+    def test_invalid_bundles(self):
+        self.assertRaises(ValueError, transaction.BundleBuffer, [])
+        self.assertRaises(
+            ValueError, transaction.BundleBuffer, self.trytes[:2])
+        self.assertRaises(
+            ValueError,
+            transaction.BundleBuffer,
+            [self.trytes[0], self.trytes[0], self.trytes[2]],
+        )
+
+    def test_view_wrong_length(self):
+        view = transaction.BundleBuffer(self.trytes)[0]
+        self.assertRaises(ValueError, view.set_field, transaction.NONCE, 'A')